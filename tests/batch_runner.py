@@ -0,0 +1,252 @@
+"""
+Bulk prompt runner: streams a JSONL file of chat requests through the API.
+
+Each input line is a JSON object. A line with `messages` is sent as the request body
+(its `model` overrides --model; `id`, if present, is carried to the output). With
+--prompt-field NAME, the NAME field of a line is sent as a single user message instead,
+so any JSONL of texts can be used as prompts.
+
+Lines are read lazily into a bounded queue that --concurrency workers drain, so memory
+stays flat however long the input is and a slow API makes the reader wait rather than
+pile up requests. Requests go through the suite's rate-limit scheduler. Every result
+(text, status, latency, TTFT, tokens or error) is appended to the output JSONL as soon as
+it completes, in completion order, tagged with its input line number.
+
+Runs are resumable: lines already in the output are skipped on the next run (failed ones
+too, unless --retry-errors, whose new result then supersedes the old one), so an
+interrupted nightly run picks up where it stopped.
+
+Examples:
+    python tests/batch_runner.py prompts.jsonl results.jsonl --concurrency 16
+    python tests/batch_runner.py prompts.jsonl results.jsonl --fake --stream --endpoint compat
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+
+import httpx
+from benchmark import ENDPOINTS, completion_tokens
+from fake_llama_api import FakeLlamaAPI
+from rate_limit import AsyncScheduledTransport, RequestScheduler
+from sse import SSEParser
+from stream_accumulator import StreamAccumulator
+from stream_probe import StreamProbe, frame_text
+
+
+@dataclass
+class BatchConfig:
+    """Where and how to send the batch."""
+
+    base_url: str
+    api_key: str
+    model: str
+    endpoint: str = "native"
+    stream: bool = False
+    concurrency: int = 8
+    max_tokens: int | None = None
+    prompt_field: str | None = None
+    retry_errors: bool = False
+    timeout: float = 600.0
+
+
+def response_text(body):
+    """Return the generated text of a non-streaming native or compat response body."""
+    if "choices" in body:
+        return body["choices"][0]["message"].get("content") or ""
+    return body.get("completion_message", {}).get("content", {}).get("text", "")
+
+
+def completed_lines(path, retry_errors=False):
+    """Return the input line numbers already in an output file.
+
+    A last line cut short by an interrupted run is dropped from the file, so the next
+    record starts on a line of its own.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        good_until = 0
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            good_until += len(line)
+            if record.get("error") is None or not retry_errors:
+                done.add(record["line"])
+        f.truncate(good_until)
+    return done
+
+
+def build_payload(config, record):
+    """Return the request body for one input record."""
+    if config.prompt_field:
+        if config.prompt_field not in record:
+            raise ValueError(f"No {config.prompt_field!r} field")
+        payload = {"messages": [{"role": "user", "content": str(record[config.prompt_field])}]}
+    elif "messages" in record:
+        payload = {key: value for key, value in record.items() if key != "id"}
+    else:
+        raise ValueError("No 'messages' (use --prompt-field to send a field as the prompt)")
+    payload.setdefault("model", config.model)
+    payload["stream"] = config.stream
+    if config.max_tokens:
+        payload.setdefault("max_tokens", config.max_tokens)
+    return payload
+
+
+async def send(client, config, line_number, line):
+    """Send the request of one input line and return its result record."""
+    result = {"line": line_number, "id": None, "status": None, "error": None}
+    try:
+        record = json.loads(line)
+        result["id"] = record.get("id") if isinstance(record, dict) else None
+        payload = build_payload(config, record)
+    except (json.JSONDecodeError, ValueError, TypeError, AttributeError) as e:
+        result["error"] = f"Invalid input line: {e}"
+        return result
+
+    url = f"{config.base_url}{ENDPOINTS[config.endpoint]}"
+    headers = {"Authorization": f"Bearer {config.api_key}", "Content-Type": "application/json"}
+    if config.stream:
+        headers["Accept"] = "text/event-stream"
+    probe = StreamProbe(str(line_number))
+    probe.start(url)
+    try:
+        async with client.stream("POST", url, headers=headers, content=json.dumps(payload)) as r:
+            probe.headers()
+            result["status"] = r.status_code
+            if r.status_code == 200 and config.stream:
+                parser = SSEParser()
+                text = StreamAccumulator()
+                async for chunk in r.aiter_bytes():
+                    for event in parser.feed(chunk):
+                        if event.is_done:
+                            continue
+                        delta = frame_text(event.json())
+                        probe.frame(delta, event.size)
+                        text.append(delta)
+                result["text"] = text.text()
+                result["tokens"] = probe.token_frames
+            else:
+                body = await r.aread()
+                if r.status_code == 200:
+                    body = json.loads(body)
+                    result["text"] = response_text(body)
+                    result["tokens"] = completion_tokens(body)
+                else:
+                    result["error"] = f"HTTP {r.status_code}: {body.decode(errors='replace')}"
+    except (httpx.HTTPError, ValueError) as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    except (LookupError, TypeError, AttributeError) as e:
+        result["error"] = f"Unexpected response body: {type(e).__name__}: {e}"
+    probe.done()
+    summary = probe.summary()
+    result["latency"] = summary["done"]
+    result["ttft"] = summary["ttft"]
+    return result
+
+
+async def run_batch(config, input_path, output_path, scheduler=None):
+    """Run every not-yet-completed line of input_path; return (completed, failed, skipped)."""
+    done = completed_lines(output_path, config.retry_errors)
+    queue = asyncio.Queue(maxsize=config.concurrency * 2)
+    counts = {"completed": 0, "failed": 0, "skipped": 0}
+    limits = httpx.Limits(
+        max_connections=config.concurrency, max_keepalive_connections=config.concurrency
+    )
+    transport = AsyncScheduledTransport(
+        scheduler or RequestScheduler(max_concurrency=config.concurrency),
+        httpx.AsyncHTTPTransport(limits=limits),
+    )
+
+    async def read():
+        with open(input_path, encoding="utf-8") as f:
+            for line_number, line in enumerate(f, 1):
+                if line_number in done or not line.strip():
+                    counts["skipped"] += line_number in done
+                    continue
+                # Blocks once the workers fall behind: this is the backpressure.
+                await queue.put((line_number, line))
+        for _ in range(config.concurrency):
+            await queue.put(None)
+
+    async def work(client, output):
+        while (item := await queue.get()) is not None:
+            result = await send(client, config, *item)
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            counts["completed"] += 1
+            counts["failed"] += result["error"] is not None
+
+    timeout = httpx.Timeout(config.timeout, connect=10)
+    async with httpx.AsyncClient(transport=transport, timeout=timeout) as client:
+        with open(output_path, "a", encoding="utf-8") as output:
+            await asyncio.gather(read(), *(work(client, output) for _ in range(config.concurrency)))
+    return counts["completed"], counts["failed"], counts["skipped"]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", help="JSONL file of chat requests")
+    parser.add_argument("output", help="JSONL file results are appended to")
+    parser.add_argument("--endpoint", choices=tuple(ENDPOINTS), default="native")
+    parser.add_argument("--stream", action="store_true", help="request SSE streaming")
+    parser.add_argument("--concurrency", type=int, default=8, help="max requests in flight")
+    parser.add_argument("--rate-limit", type=float, help="max requests per second")
+    parser.add_argument("--max-tokens", type=int, help="max_tokens for requests without one")
+    parser.add_argument("--prompt-field", help="send this field of each line as the prompt")
+    parser.add_argument(
+        "--retry-errors", action="store_true", help="rerun lines whose result was an error"
+    )
+    parser.add_argument("--model", default=os.environ.get("LLAMA_MODEL", "Llama-3.3-8B-Instruct"))
+    parser.add_argument(
+        "--base-url", default=os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+    )
+    parser.add_argument("--fake", action="store_true", help="spin up and target the stand-in")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fake = FakeLlamaAPI().start() if args.fake else None
+    api_key = fake.api_key if fake else os.environ.get("LLAMA_API_KEY")
+    if api_key is None:
+        sys.exit("LLAMA_API_KEY environment variable not set (or use --fake)")
+
+    config = BatchConfig(
+        base_url=fake.base_url if fake else args.base_url,
+        api_key=api_key,
+        model=args.model,
+        endpoint=args.endpoint,
+        stream=args.stream,
+        concurrency=args.concurrency,
+        max_tokens=args.max_tokens,
+        prompt_field=args.prompt_field,
+        retry_errors=args.retry_errors,
+    )
+    scheduler = RequestScheduler(rate=args.rate_limit, max_concurrency=args.concurrency)
+    try:
+        started = time.perf_counter()
+        completed, failed, skipped = asyncio.run(
+            run_batch(config, args.input, args.output, scheduler)
+        )
+        elapsed = time.perf_counter() - started
+    finally:
+        if fake:
+            fake.stop()
+    print(
+        f"{completed} lines in {elapsed:.1f}s ({failed} failed), {skipped} already done; "
+        f"rate limiting: {scheduler.summary()}"
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+"""
+Load generator for /v1/chat/completions and /compat/v1/chat/completions.
+
+Closed loop (default): --concurrency workers each send their next request as soon as
+the previous one completes. Open loop (--rate R): R requests per second are scheduled
+whether or not earlier ones have completed, with at most --concurrency in flight;
+latency is measured from the scheduled send time, so queueing shows up in the
+percentiles instead of being hidden by a slow server.
+
+Reports throughput, error and 429 rates and p50/p90/p99 latency and TTFT per endpoint.
+Given a RequestScheduler, requests are paced and 429/503 responses retried through it;
+the CLI sends without one, so rate limiting shows up in the report.
+
+Examples:
+    python tests/benchmark.py --fake --duration 10 --concurrency 8 --stream
+    python tests/benchmark.py --endpoint compat --rate 5 --duration 60
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+import httpx
+from fake_llama_api import COMPAT_PATH, NATIVE_PATH, FakeLlamaAPI
+from rate_limit import AsyncScheduledTransport
+from stream_probe import StreamProbe, percentile
+
+ENDPOINTS = {"native": NATIVE_PATH, "compat": COMPAT_PATH}
+
+
+@dataclass
+class BenchmarkConfig:
+    """What to send, where, and how hard."""
+
+    base_url: str
+    api_key: str
+    model: str
+    endpoints: tuple[str, ...] = ("native", "compat")
+    stream: bool = False
+    concurrency: int = 4
+    rate: float | None = None
+    duration: float = 10.0
+    max_tokens: int | None = None
+    prompt: str = "Hello, how are you?"
+    timeout: float = 120.0
+
+
+@dataclass
+class RequestResult:
+    """Outcome of one benchmark request, times in seconds."""
+
+    endpoint: str
+    status: int | None
+    error: str | None
+    latency: float
+    ttft: float | None
+    tokens: int
+    queued: float = 0.0
+    bytes: int = 0
+
+
+def completion_tokens(body):
+    """Return the completion token count reported in a non-streaming response body."""
+    if "usage" in body:
+        return body["usage"].get("completion_tokens", 0)
+    for metric in body.get("metrics", []):
+        if metric.get("metric") == "num_completion_tokens":
+            return metric.get("value", 0)
+    return 0
+
+
+async def send_request(client, config, endpoint, scheduled, messages=None):
+    """Send one chat completion and measure it from the `scheduled` perf_counter() time.
+
+    `messages` replaces the single user message made of config.prompt.
+    """
+    url = f"{config.base_url}{ENDPOINTS[endpoint]}"
+    payload = {
+        "model": config.model,
+        "messages": messages or [{"role": "user", "content": config.prompt}],
+        "stream": config.stream,
+    }
+    if config.max_tokens:
+        payload["max_tokens"] = config.max_tokens
+    headers = {"Authorization": f"Bearer {config.api_key}", "Content-Type": "application/json"}
+    if config.stream:
+        headers["Accept"] = "text/event-stream"
+
+    queued = time.perf_counter() - scheduled
+    probe = StreamProbe(endpoint)
+    probe.start(url, at=scheduled)
+    status = error = None
+    tokens = size = 0
+    try:
+        async with client.stream("POST", url, headers=headers, content=json.dumps(payload)) as r:
+            probe.headers()
+            status = r.status_code
+            if status == 200 and config.stream:
+                async for line in r.aiter_lines():
+                    if line:
+                        probe.sse_line(line)
+                probe.done()
+                tokens = probe.token_frames
+            else:
+                body = await r.aread()
+                probe.done()
+                if status == 200:
+                    tokens = completion_tokens(json.loads(body))
+                else:
+                    error = f"HTTP {status}"
+            size = r.num_bytes_downloaded
+    except httpx.HTTPError as e:
+        probe.done()
+        error = f"{type(e).__name__}: {e}"
+
+    summary = probe.summary()
+    return RequestResult(
+        endpoint, status, error, summary["done"], summary["ttft"], tokens, round(queued, 6), size
+    )
+
+
+def new_client(config, scheduler=None, limits=None):
+    """Return an AsyncClient for config, sending through scheduler when given one."""
+    transport = (
+        httpx.AsyncHTTPTransport() if limits is None else httpx.AsyncHTTPTransport(limits=limits)
+    )
+    if scheduler is not None:
+        transport = AsyncScheduledTransport(scheduler, transport)
+    return httpx.AsyncClient(transport=transport, timeout=httpx.Timeout(config.timeout, connect=10))
+
+
+async def run_benchmark(config, scheduler=None):
+    """Drive the endpoints for config.duration seconds and return every RequestResult."""
+    results = []
+    endpoints = itertools.cycle(config.endpoints)
+    limits = httpx.Limits(
+        max_connections=config.concurrency, max_keepalive_connections=config.concurrency
+    )
+    async with new_client(config, scheduler, limits) as client:
+        deadline = time.perf_counter() + config.duration
+
+        if config.rate is None:
+
+            async def worker():
+                while time.perf_counter() < deadline:
+                    scheduled = time.perf_counter()
+                    results.append(await send_request(client, config, next(endpoints), scheduled))
+
+            await asyncio.gather(*(worker() for _ in range(config.concurrency)))
+        else:
+            semaphore = asyncio.Semaphore(config.concurrency)
+
+            async def arrival(endpoint, scheduled):
+                async with semaphore:
+                    results.append(await send_request(client, config, endpoint, scheduled))
+
+            tasks = []
+            start = time.perf_counter()
+            for index in itertools.count():
+                scheduled = start + index / config.rate
+                if scheduled >= deadline:
+                    break
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                tasks.append(asyncio.create_task(arrival(next(endpoints), scheduled)))
+            await asyncio.gather(*tasks)
+    return results
+
+
+def summarize(results, elapsed):
+    """Aggregate results per endpoint (and overall) into report rows."""
+    groups = {"all": results}
+    for result in results:
+        groups.setdefault(result.endpoint, []).append(result)
+
+    rows = {}
+    for name, group in groups.items():
+        ok = [result for result in group if result.error is None]
+        latencies = [result.latency for result in ok]
+        ttfts = [result.ttft for result in ok if result.ttft is not None]
+        rows[name] = {
+            "requests": len(group),
+            "ok": len(ok),
+            "error_rate": round(1 - len(ok) / len(group), 4) if group else 0.0,
+            "rate_limited": sum(result.status == 429 for result in group),
+            "throughput_rps": round(len(ok) / elapsed, 3),
+            "tokens_per_second": round(sum(result.tokens for result in ok) / elapsed, 2),
+            **{f"latency_p{q}": percentile(latencies, q) for q in (50, 90, 99)},
+            **{f"ttft_p{q}": percentile(ttfts, q) for q in (50, 90, 99)},
+            "queued_p99": percentile([result.queued for result in group], 99),
+        }
+    return rows
+
+
+def format_report(rows):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    lines = [
+        f"{'endpoint':<8} {'reqs':>6} {'ok':>6} {'err%':>6} {'429':>5} {'req/s':>8} "
+        f"{'tok/s':>8}  {'latency p50/p90/p99 ms':>22}  {'ttft p50/p90/p99 ms':>20}"
+    ]
+    for name, row in rows.items():
+        latency = "/".join(ms(row[f"latency_p{q}"]) for q in (50, 90, 99))
+        ttft = "/".join(ms(row[f"ttft_p{q}"]) for q in (50, 90, 99))
+        lines.append(
+            f"{name:<8} {row['requests']:>6} {row['ok']:>6} {row['error_rate'] * 100:>6.1f} "
+            f"{row['rate_limited']:>5} {row['throughput_rps']:>8.2f} "
+            f"{row['tokens_per_second']:>8.1f}  {latency:>22}  {ttft:>20}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--endpoint", choices=("native", "compat", "both"), default="both", help="default: both"
+    )
+    parser.add_argument("--stream", action="store_true", help="request SSE streaming")
+    parser.add_argument("--concurrency", type=int, default=4, help="max requests in flight")
+    parser.add_argument(
+        "--rate", type=float, help="open loop: requests per second (default: closed loop)"
+    )
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--max-tokens", type=int, help="max_tokens for each request")
+    parser.add_argument("--model", default=os.environ.get("LLAMA_MODEL", "Llama-3.3-8B-Instruct"))
+    parser.add_argument(
+        "--base-url", default=os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+    )
+    parser.add_argument("--fake", action="store_true", help="spin up and target the stand-in")
+    parser.add_argument(
+        "--fake-chunk-delay", type=float, default=0.0, help="stand-in delay between frames"
+    )
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fake = FakeLlamaAPI(chunk_delay=args.fake_chunk_delay).start() if args.fake else None
+    api_key = fake.api_key if fake else os.environ.get("LLAMA_API_KEY")
+    if api_key is None:
+        sys.exit("LLAMA_API_KEY environment variable not set (or use --fake)")
+
+    config = BenchmarkConfig(
+        base_url=fake.base_url if fake else args.base_url,
+        api_key=api_key,
+        model=args.model,
+        endpoints=("native", "compat") if args.endpoint == "both" else (args.endpoint,),
+        stream=args.stream,
+        concurrency=args.concurrency,
+        rate=args.rate,
+        duration=args.duration,
+        max_tokens=args.max_tokens,
+    )
+    try:
+        started = time.perf_counter()
+        results = asyncio.run(run_benchmark(config))
+        elapsed = time.perf_counter() - started
+    finally:
+        if fake:
+            fake.stop()
+
+    rows = summarize(results, elapsed)
+    loop = f"open loop at {config.rate} req/s" if config.rate else "closed loop"
+    print(
+        f"{config.base_url} model={config.model} stream={config.stream} {loop}, "
+        f"concurrency {config.concurrency}, {elapsed:.1f}s"
+    )
+    print(format_report(rows))
+    if args.json:
+        config_dict = {**asdict(config), "api_key": None}
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config_dict, "elapsed": elapsed, "results": rows}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Record/replay cassettes for Llama API traffic.
+
+CassetteProxy is a local server placed between the suite and the API, so raw `requests`
+calls, the OpenAI SDK and ChatOpenAI are all served the same way just by pointing their
+base URL at it. Requests are keyed on (method, path, normalized headers, body); responses
+are stored with every streamed chunk and its offset, so SSE replays keep their original
+inter-chunk timing.
+
+Modes:
+- record: serve hits from the cassette, forward misses (and expired entries) upstream and
+  append them
+- replay: serve hits only, misses are answered with 502; the cassette is never written
+- refresh: forward everything upstream and replace the stored entries
+
+The cassette is a JSONL file that is only appended to while recording; when the proxy
+stops it is compacted, dropping superseded and expired entries. Rate limiting (429) and
+server errors (5xx) are relayed but never recorded, so a transient failure isn't replayed
+forever.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import requests
+from http_server import LocalHTTPServer
+
+MODES = ("record", "replay", "refresh")
+
+# Headers that change what the API answers; everything else (auth, user agent, SDK
+# telemetry) is left out of the key so recordings are shareable.
+KEY_HEADERS = ("accept", "content-type")
+
+# Hop-by-hop headers the proxy must not forward upstream.
+HOP_HEADERS = {"host", "connection", "keep-alive", "content-length", "transfer-encoding"}
+
+
+def is_transient(status):
+    """Return whether a response with `status` says nothing lasting about the request."""
+    return status == 429 or status >= 500
+
+
+def request_key(method, path, headers, body):
+    """Return the cassette key of a request: a hash of its response-relevant parts."""
+    normalized = {
+        name: " ".join(headers[name].lower().split()) for name in KEY_HEADERS if name in headers
+    }
+    try:
+        body = json.dumps(json.loads(body), sort_keys=True, separators=(",", ":"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        body = body.decode("latin-1")
+    material = json.dumps([method.upper(), path, normalized, body])
+    return hashlib.sha256(material.encode()).hexdigest()
+
+
+class Cassette:
+    """JSONL store of recorded responses, one entry per request key.
+
+    Args:
+        path: The JSONL file; it is created on first write.
+        max_age: Seconds after which an entry is considered expired, None to keep forever.
+    """
+
+    def __init__(self, path, max_age=None):
+        self.path = Path(path)
+        self.max_age = max_age
+        self.entries = {}
+        if self.path.exists():
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        # Later lines supersede earlier ones for the same key.
+                        self.entries[entry["key"]] = entry
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def is_expired(self, entry):
+        return self.max_age is not None and time.time() - entry["recorded_at"] > self.max_age
+
+    def put(self, entry):
+        self.entries[entry["key"]] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def compact(self):
+        """Rewrite the file with only the latest unexpired entry per key."""
+        self.entries = {
+            key: entry for key, entry in self.entries.items() if not self.is_expired(entry)
+        }
+        if not self.path.exists():
+            return
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+class CassetteProxy(LocalHTTPServer):
+    """Local server recording upstream responses to, or replaying them from, a cassette.
+
+    Args:
+        cassette: The Cassette to read and write.
+        upstream_url: Base URL requests are forwarded to when recording.
+        mode: One of MODES.
+        speed: Replay speed multiplier for recorded timing, 0 replays without delays.
+        timeout: Upstream request timeout in seconds.
+    """
+
+    def __init__(self, cassette, upstream_url, mode="replay", *, speed=1.0, timeout=120):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode {mode!r}, expected one of {MODES}")
+        super().__init__()
+        self.cassette = cassette
+        self.upstream_url = upstream_url.rstrip("/")
+        self.mode = mode
+        self.speed = speed
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._session = requests.Session()
+
+    def stop(self):
+        super().stop()
+        self._session.close()
+        if self.mode != "replay":
+            self.cassette.compact()
+
+    async def _dispatch(self, request, writer):
+        key = request_key(request.method, request.path, request.headers, request.body)
+        entry = None if self.mode == "refresh" else self.cassette.get(key)
+        if entry is not None and self.mode == "record" and self.cassette.is_expired(entry):
+            entry = None
+        if entry is not None:
+            self.hits += 1
+            await self._replay(writer, request, entry)
+            return
+        self.misses += 1
+        if self.mode == "replay":
+            message = f"No cassette entry for {request.method} {request.path} (key {key[:12]})"
+            body = json.dumps({"error": {"message": message, "type": "cassette_miss"}})
+            await self._send(writer, request, 502, "application/json", body.encode())
+            return
+        await self._record(writer, request, key)
+
+    async def _replay(self, writer, request, entry):
+        response = entry["response"]
+        await self._pause(response["headers_after"])
+        chunks = [
+            (offset, text.encode("utf-8", "surrogateescape")) for offset, text in response["chunks"]
+        ]
+        if not response["content_type"].startswith("text/event-stream"):
+            body = b"".join(chunk for _, chunk in chunks)
+            await self._send(writer, request, response["status"], response["content_type"], body)
+            return
+
+        async def paced():
+            previous = 0.0
+            for offset, chunk in chunks:
+                await self._pause(offset - previous)
+                previous = offset
+                yield chunk
+
+        headers = {"Content-Type": response["content_type"], "Cache-Control": "no-cache"}
+        await self._send_chunked(writer, request, response["status"], headers, paced())
+
+    async def _pause(self, seconds):
+        if self.speed and seconds > 0:
+            await asyncio.sleep(seconds / self.speed)
+
+    async def _record(self, writer, request, key):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+        headers = {
+            name: value for name, value in request.headers.items() if name not in HOP_HEADERS
+        }
+
+        def fetch():
+            # Runs on an executor thread; hands the response, then each chunk, to the loop.
+            try:
+                with self._session.request(
+                    request.method,
+                    self.upstream_url + request.path,
+                    headers=headers,
+                    data=request.body,
+                    stream=True,
+                    timeout=self.timeout,
+                ) as response:
+                    loop.call_soon_threadsafe(queue.put_nowait, response)
+                    for chunk in response.iter_content(chunk_size=None):
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+            except requests.RequestException as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+
+        started = time.monotonic()
+        fetching = loop.run_in_executor(None, fetch)
+        response = await queue.get()
+        if isinstance(response, requests.RequestException):
+            await fetching
+            body = json.dumps({"error": {"message": f"Upstream request failed: {response}"}})
+            await self._send(writer, request, 502, "application/json", body.encode())
+            return
+        headers_at = time.monotonic()
+        content_type = response.headers.get("Content-Type", "application/octet-stream")
+
+        async def relay():
+            chunks = []
+            while (chunk := await queue.get()) is not None:
+                if isinstance(chunk, requests.RequestException):
+                    raise ConnectionError(f"Upstream stream failed: {chunk}")
+                chunks.append((round(time.monotonic() - headers_at, 6), chunk))
+                yield chunk
+            await fetching
+            # Stored before the response completes, so a client that has read the whole
+            # response can rely on the entry being in the cassette.
+            if not is_transient(response.status_code):
+                self._store(key, request, response, round(headers_at - started, 6), chunks)
+
+        if content_type.startswith("text/event-stream"):
+            headers = {"Content-Type": content_type, "Cache-Control": "no-cache"}
+            await self._send_chunked(writer, request, response.status_code, headers, relay())
+        else:
+            body = b"".join([chunk async for chunk in relay()])
+            await self._send(writer, request, response.status_code, content_type, body)
+
+    def _store(self, key, request, response, headers_after, chunks):
+        self.recorded += 1
+        self.cassette.put({
+            "key": key,
+            "recorded_at": time.time(),
+            "request": {
+                "method": request.method,
+                "path": request.path,
+                "headers": {
+                    name: request.headers[name] for name in KEY_HEADERS if name in request.headers
+                },
+                "body": request.body.decode("utf-8", "surrogateescape"),
+            },
+            "response": {
+                "status": response.status_code,
+                "content_type": response.headers.get("Content-Type", "application/octet-stream"),
+                "headers_after": headers_after,
+                "chunks": [
+                    (offset, chunk.decode("utf-8", "surrogateescape")) for offset, chunk in chunks
+                ],
+            },
+        })
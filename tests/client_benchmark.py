@@ -0,0 +1,249 @@
+"""
+Client-stack overhead benchmark: raw requests vs the OpenAI SDK vs ChatOpenAI.
+
+One recorded compat stream (from the offline stand-in, or the first compat stream of a
+cassette with --cassette) is served by a replay server in a separate process, byte for
+byte and without delays, to every stack:
+- requests: a keep-alive session, SSEParser and json.loads, as test_streaming.py does
+- openai: `OpenAI.chat.completions.create(stream=True)`, as test_openai_streaming.py does
+- langchain: `ChatOpenAI.stream()`, as the LangChain standard tests do
+
+Since the server is out of process, thread CPU time and tracemalloc only see the client.
+Each stack is timed over --requests requests, then traced with tracemalloc over a few
+more, and the report gives per request latency p50/p99, CPU time and peak allocations,
+CPU per chunk, latency added relative to the requests stack and the share of one core
+the stack would use at --rate requests per second.
+
+Examples:
+    python tests/client_benchmark.py --requests 200 --tokens 500
+    python tests/client_benchmark.py --cassette tests/cassettes/llama_api.jsonl --rate 50
+"""
+
+import argparse
+import json
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+from fake_llama_api import COMPAT_PATH
+from http_server import LocalHTTPServer
+from sse import iter_events
+from sse_benchmark import cassette_streams, record_stream
+from stream_probe import frame_text, percentile
+
+MODEL = "replayed-model"
+MESSAGES = [{"role": "user", "content": "Hello, how are you?"}]
+
+
+class ReplayServer(LocalHTTPServer):
+    """Answers every POST with the same recorded SSE stream."""
+
+    def __init__(self, chunks, host="127.0.0.1", port=0):
+        super().__init__(host, port)
+        self.chunks = chunks
+
+    async def _dispatch(self, request, writer):
+        async def replay():
+            for chunk in self.chunks:
+                yield chunk
+
+        headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        await self._send_chunked(writer, request, 200, headers, replay())
+
+
+def serve(stream_path, port):
+    """Serve a stream saved as a JSON list of latin-1 strings until terminated."""
+    with open(stream_path, encoding="utf-8") as f:
+        chunks = [chunk.encode("latin-1") for chunk in json.load(f)]
+    with ReplayServer(chunks, port=port) as server:
+        print(f"Replaying {len(chunks)} chunks on {server.base_url}", flush=True)
+        threading.Event().wait()
+
+
+def requests_stack(base_url):
+    import requests
+
+    session = requests.Session()
+    url = f"{base_url}{COMPAT_PATH}"
+    headers = {"Authorization": "Bearer replay", "Accept": "text/event-stream"}
+    payload = {"model": MODEL, "messages": MESSAGES, "stream": True}
+
+    def run():
+        text = []
+        with session.post(url, headers=headers, json=payload, stream=True) as response:
+            for event in iter_events(response.iter_content(chunk_size=None)):
+                if not event.is_done:
+                    text.append(frame_text(event.json()))
+        return "".join(text)
+
+    return run
+
+
+def openai_stack(base_url):
+    from openai import OpenAI
+
+    client = OpenAI(api_key="replay", base_url=f"{base_url}/compat/v1")
+
+    def run():
+        stream = client.chat.completions.create(model=MODEL, messages=MESSAGES, stream=True)
+        return "".join(chunk.choices[0].delta.content or "" for chunk in stream if chunk.choices)
+
+    return run
+
+
+def langchain_stack(base_url):
+    from langchain_openai import ChatOpenAI
+
+    chat = ChatOpenAI(model=MODEL, api_key="replay", base_url=f"{base_url}/compat/v1")
+
+    def run():
+        return "".join(chunk.content for chunk in chat.stream(MESSAGES))
+
+    return run
+
+
+STACKS = {"requests": requests_stack, "openai": openai_stack, "langchain": langchain_stack}
+
+
+@dataclass
+class StackResult:
+    """Measurements of one client stack over the replayed stream."""
+
+    stack: str
+    requests: int
+    chunks: int
+    text: str
+    latencies: list
+    cpu: list
+    peak_allocations: list
+
+    def row(self, baseline_latency=None, rate=10.0):
+        cpu = sum(self.cpu) / len(self.cpu)
+        latency_p50 = percentile(self.latencies, 50)
+        return {
+            "requests": self.requests,
+            "latency_p50": latency_p50,
+            "latency_p99": percentile(self.latencies, 99),
+            "added_latency": (
+                round(latency_p50 - baseline_latency, 6) if baseline_latency is not None else None
+            ),
+            "cpu_per_request": round(cpu, 6),
+            "cpu_per_chunk": round(cpu / self.chunks, 9),
+            "peak_kib": round(max(self.peak_allocations) / 1024, 1),
+            "core_share": round(cpu * rate, 4),
+        }
+
+
+def measure(name, run, chunks, requests, traced):
+    """Time `run` for `requests` requests, then trace allocations for `traced` more."""
+    text = run()  # warm up: imports, connection, SDK caches
+    latencies, cpu, peaks = [], [], []
+    for _ in range(requests):
+        started, started_cpu = time.perf_counter(), time.thread_time()
+        run()
+        cpu.append(time.thread_time() - started_cpu)
+        latencies.append(time.perf_counter() - started)
+    for _ in range(traced):
+        tracemalloc.start()
+        try:
+            run()
+            peaks.append(tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+    return StackResult(name, requests, chunks, text, latencies, cpu, peaks or [0])
+
+
+def run_benchmark(chunks, stacks=tuple(STACKS), requests=50, traced=5):
+    """Replay `chunks` to each stack from a server subprocess; return {stack: StackResult}."""
+    frames = sum(1 for event in iter_events(chunks) if not event.is_done)
+    with tempfile.TemporaryDirectory() as work_dir:
+        stream_path = Path(work_dir) / "replayed-stream.json"
+        stream_path.write_text(json.dumps([chunk.decode("latin-1") for chunk in chunks]))
+        server = subprocess.Popen(
+            [sys.executable, __file__, "--serve", str(stream_path)],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        try:
+            base_url = re.search(r"http://\S+", server.stdout.readline()).group()
+            return {
+                name: measure(name, STACKS[name](base_url), frames, requests, traced)
+                for name in stacks
+            }
+        finally:
+            server.terminate()
+            server.wait(timeout=10)
+
+
+def report(results, rate):
+    baseline = results.get("requests")
+    baseline_latency = percentile(baseline.latencies, 50) if baseline else None
+    return {name: result.row(baseline_latency, rate) for name, result in results.items()}
+
+
+def format_report(rows, rate):
+    lines = [
+        f"{'stack':<10} {'reqs':>5} {'p50 ms':>8} {'p99 ms':>8} {'added ms':>9} "
+        f"{'cpu ms/req':>10} {'cpu us/chunk':>12} {'peak KiB':>9} {f'core @{rate:g}/s':>12}"
+    ]
+    for name, row in rows.items():
+        added = "-" if row["added_latency"] is None else f"{row['added_latency'] * 1000:.2f}"
+        lines.append(
+            f"{name:<10} {row['requests']:>5} {row['latency_p50'] * 1000:>8.2f} "
+            f"{row['latency_p99'] * 1000:>8.2f} {added:>9} {row['cpu_per_request'] * 1000:>10.2f} "
+            f"{row['cpu_per_chunk'] * 1e6:>12.1f} {row['peak_kib']:>9.1f} "
+            f"{row['core_share'] * 100:>11.1f}%"
+        )
+    return "\n".join(lines)
+
+
+def recorded_compat_stream(cassette=None, tokens=200):
+    """Return the byte chunks of a compat stream from a cassette or the stand-in."""
+    if cassette is None:
+        return record_stream(COMPAT_PATH, tokens)
+    for chunks in cassette_streams(cassette):
+        if b"chat.completion.chunk" in b"".join(chunks):
+            return chunks
+    raise SystemExit(f"No compat stream in {cassette}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50, help="timed requests per stack")
+    parser.add_argument("--traced", type=int, default=5, help="requests traced for allocations")
+    parser.add_argument("--tokens", type=int, default=200, help="length of the recorded stream")
+    parser.add_argument("--cassette", help="replay the first compat stream of this cassette")
+    parser.add_argument(
+        "--stack", action="append", choices=tuple(STACKS), help="stacks to run (default: all)"
+    )
+    parser.add_argument("--rate", type=float, default=10.0, help="req/s for the core share")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--serve", metavar="STREAM", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, default=0, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.serve:
+        serve(args.serve, args.port)
+        return
+
+    chunks = recorded_compat_stream(args.cassette, args.tokens)
+    results = run_benchmark(chunks, tuple(args.stack or STACKS), args.requests, args.traced)
+    texts = {result.text for result in results.values()}
+    if len(texts) > 1:
+        print("Warning: the stacks did not all read the same text")
+    rows = report(results, args.rate)
+    print(f"{len(chunks)} chunks, {sum(len(chunk) for chunk in chunks)} bytes per response")
+    print(format_report(rows, args.rate))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,454 @@
+import json
 import os
+import time
+from pathlib import Path
 
+import httpx
 import pytest
+import requests
+from benchmark import ENDPOINTS
+from cassette import Cassette, CassetteProxy
+from fake_llama_api import FakeLlamaAPI
+from network_timing import AsyncTimedTransport, NetworkTimingPlugin, TimedTransport
+from perf_history import append_records, build_record, new_run_id
+from preflight import Preflight
+from rate_limit import (
+    AsyncScheduledTransport,
+    RequestScheduler,
+    ScheduledAdapter,
+    ScheduledTransport,
+)
+from stream_probe import StreamProbe
+
+try:
+    # Not public API: without it, -m still deselects the SDK modules' tests, but only after
+    # importing them (pytest is pinned below the next major release in pyproject.toml).
+    from _pytest.mark.expression import Expression
+except ImportError:
+    Expression = None
+
+DEFAULT_CASSETTE = Path(__file__).parent / "cassettes" / "llama_api.jsonl"
+
+# Test modules that can't help importing a client SDK stack at import time, and the markers
+# their `pytestmark` sets; they are not even imported when -m rules those markers out.
+# Every other test needing an SDK imports it inside the test and is marked `sdk` plus its
+# stack, so that `-m "not sdk"` deselects it.
+SDK_MODULES = {
+    "test_langchain_standard.py": ("sdk", "langchain"),
+}
+
+# Fixtures that point a test at the API; tests using them wait for the preflight verdict.
+API_FIXTURES = {"api_base_url", "api_key", "auth_headers"}
+
+# Set from the command line options in pytest_configure.
+_config = None
+_api_mode = "live"
+_fake_api = None
+_cassette_proxy = None
+_perf_run = None
+# (path, status, seconds) of the raw HTTP requests made by the running test.
+_exchanges = []
+_call_reports = {}
+_scheduler = None
+_langchain_http_clients = None
+_prefix_cache_reports = []
+_network_timing = None
+_preflight = None
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--llama-api",
+        choices=("live", "fake", "record", "replay", "refresh"),
+        default=os.environ.get("LLAMA_API_MODE", "live"),
+        help="Run against the live Llama API, the in-process stand-in, or through a cassette "
+        "that records, replays or refreshes live responses (default: live, or LLAMA_API_MODE)",
+    )
+    parser.addoption(
+        "--cassette",
+        default=os.environ.get("LLAMA_API_CASSETTE", str(DEFAULT_CASSETTE)),
+        help="JSONL cassette used by the record/replay/refresh modes",
+    )
+    parser.addoption(
+        "--cassette-max-age",
+        type=float,
+        default=float(os.environ.get("LLAMA_API_CASSETTE_MAX_AGE", 7)),
+        help="Days after which recorded responses expire and are re-recorded (default: 7)",
+    )
+    parser.addoption(
+        "--http-pool-size",
+        type=int,
+        default=int(os.environ.get("LLAMA_HTTP_POOL_SIZE", 10)),
+        help="Keep-alive connections per host in the shared HTTP clients (default: 10)",
+    )
+    parser.addoption(
+        "--rate-limit",
+        type=float,
+        default=float(os.environ["LLAMA_RATE_LIMIT"]) if "LLAMA_RATE_LIMIT" in os.environ else None,
+        metavar="RPS",
+        help="Pace requests to at most RPS per second per API key and endpoint "
+        "(default: unpaced, or LLAMA_RATE_LIMIT)",
+    )
+    parser.addoption(
+        "--max-concurrency",
+        type=int,
+        default=int(os.environ.get("LLAMA_MAX_CONCURRENCY", 16)),
+        help="Requests in flight per API key and endpoint; halved on every 429/503 and grown "
+        "back on success (default: 16)",
+    )
+    parser.addoption(
+        "--max-retries",
+        type=int,
+        default=int(os.environ.get("LLAMA_MAX_RETRIES", 3)),
+        help="Times a 429/503 response is retried after its Retry-After (default: 3)",
+    )
+    parser.addoption(
+        "--request-timeout",
+        type=float,
+        default=float(os.environ.get("LLAMA_REQUEST_TIMEOUT", 600)),
+        metavar="SECONDS",
+        help="Read timeout of every request the suite's HTTP clients send: how long the API "
+        "may go silent before the request fails (default: 600, or LLAMA_REQUEST_TIMEOUT)",
+    )
+    parser.addoption(
+        "--preflight",
+        choices=("fail", "skip", "off"),
+        default=os.environ.get("LLAMA_PREFLIGHT", "fail"),
+        help="Probe each endpoint once before the first test that needs the API and fail, or "
+        "skip, the tests needing an endpoint that rejects the key or is down (default: fail, "
+        "or LLAMA_PREFLIGHT; only in the live and refresh modes)",
+    )
+    parser.addoption(
+        "--preflight-timeout",
+        type=float,
+        default=15.0,
+        metavar="SECONDS",
+        help="Timeout of each preflight probe (default: 15)",
+    )
+    parser.addoption(
+        "--http2",
+        action="store_true",
+        help="Negotiate HTTP/2 in the shared httpx client used by the OpenAI SDK tests "
+        "(needs the h2 package); the requests session is HTTP/1.1 only",
+    )
+    parser.addoption(
+        "--concurrent-matrix",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Run the streaming quirk matrix as one asyncio test with up to N requests in "
+        "flight, instead of the serial tests in test_streaming.py (default: 0, serial)",
+    )
+    parser.addoption(
+        "--sdk-free-run",
+        action="store_true",
+        help='Also run the whole suite again with -m "not sdk" and check that it imports no '
+        "client SDK (slow; default: skipped)",
+    )
+    parser.addoption(
+        "--prefix-cache-probe",
+        type=int,
+        default=0,
+        metavar="N",
+        help="Probe each endpoint for prompt-prefix caching with N shared-prefix and N "
+        "randomized streamed requests (default: 0, skipped)",
+    )
+    parser.addoption(
+        "--stream-metrics",
+        default=os.environ.get("LLAMA_STREAM_METRICS"),
+        metavar="PATH",
+        help="Append the TTFT and inter-chunk timings of each streaming test to this JSONL file",
+    )
+    parser.addoption(
+        "--network-timing",
+        action="store_true",
+        help="Break every HTTP request down into DNS/connect/TLS/TTFB/transfer, attach it to "
+        "the test reports and list the slowest phases at the end of the session",
+    )
+    parser.addoption(
+        "--network-timing-json",
+        metavar="PATH",
+        help="Write the --network-timing results to PATH (default: next to the --junitxml "
+        "file, if any)",
+    )
+    parser.addoption(
+        "--perf-history",
+        default=os.environ.get("LLAMA_PERF_HISTORY"),
+        metavar="PATH",
+        help="Append compact per-test metrics of this run to this JSONL history; compare runs "
+        "with `python tests/perf_history.py compare PATH`",
+    )
+
+
+def pytest_configure(config):
+    global _config, _api_mode, _perf_run, _scheduler, _network_timing
+    _config = config
+    _api_mode = config.getoption("--llama-api")
+    _scheduler = RequestScheduler(
+        rate=config.getoption("--rate-limit"),
+        max_concurrency=config.getoption("--max-concurrency"),
+        max_retries=config.getoption("--max-retries"),
+    )
+    if config.getoption("--perf-history"):
+        _perf_run = new_run_id()
+    if config.getoption("--network-timing"):
+        _network_timing = NetworkTimingPlugin(network_timing_path(config))
+        _network_timing.install()
+        config.pluginmanager.register(_network_timing, "network_timing")
+    if config.getoption("--http2"):
+        try:
+            import h2  # noqa: F401
+        except ImportError as e:
+            raise pytest.UsageError(
+                "--http2 needs the h2 package: pip install 'httpx[http2]'"
+            ) from e
+
+
+def network_timing_path(config):
+    """Helper function to choose where --network-timing results are written, if anywhere."""
+    path = config.getoption("--network-timing-json")
+    junit = config.getoption("xmlpath", None)
+    if path is None and junit:
+        junit = Path(junit)
+        path = str(junit.with_name(f"{junit.stem}.network-timing.json"))
+    return path
+
+
+def pytest_ignore_collect(collection_path, config):
+    markers = SDK_MODULES.get(collection_path.name)
+    expression = config.getoption("markexpr")
+    if not markers or not expression or Expression is None:
+        return None
+    # Only the markers this suite registers are known for sure; others (asyncio, ...) may or
+    # may not be on an item, so the module is skipped only if -m rules it out either way.
+    registered = {line.split(":")[0].strip() for line in config.getini("markers")}
+    compiled = Expression.compile(expression)
+    for unknown in (False, True):
+
+        def matcher(name, unknown=unknown, **kwargs):
+            return name in markers or (name not in registered and unknown)
+
+        if compiled.evaluate(matcher):
+            return None
+    return True
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--concurrent-matrix"):
+        skip = pytest.mark.skip(reason="covered by test_streaming_matrix_concurrently")
+        for item in items:
+            if item.get_closest_marker("streaming_matrix"):
+                item.add_marker(skip)
+
+
+def pytest_runtest_setup(item):
+    _exchanges.clear()
+    endpoints = api_endpoints(item)
+    if endpoints and (preflight := get_preflight()) is not None:
+        reason = preflight.reason(endpoints)
+        if reason is not None and _config.getoption("--preflight") == "skip":
+            pytest.skip(reason)
+        elif reason is not None:
+            pytest.fail(reason, pytrace=False)
+
+
+def api_endpoints(item):
+    """Helper function to tell which endpoints a test may call, () if it needs no API."""
+    if item.path.name not in SDK_MODULES and not API_FIXTURES.intersection(item.fixturenames):
+        return ()
+    # The SDK tests all go through the compat endpoint.
+    return ("compat",) if item.get_closest_marker("sdk") else tuple(ENDPOINTS)
+
+
+def pytest_runtest_logreport(report):
+    if _perf_run is None:
+        return
+    if report.when == "call":
+        _call_reports[report.nodeid] = report
+    elif report.when == "teardown" and report.nodeid in _call_reports:
+        # Recorded at teardown, once the stream_probe fixture has added its metrics.
+        call = _call_reports.pop(report.nodeid)
+        stream_metrics = dict(report.user_properties).get("stream_metrics")
+        record = build_record(
+            _perf_run,
+            _api_mode,
+            get_llama_model(),
+            report.nodeid,
+            call.outcome,
+            call.duration,
+            list(_exchanges),
+            json.loads(stream_metrics) if stream_metrics else None,
+        )
+        append_records(_config.getoption("--perf-history"), [record])
+
+
+def pytest_unconfigure(config):
+    if _network_timing is not None:
+        _network_timing.uninstall()
+    if _langchain_http_clients is not None:
+        _langchain_http_clients[0].close()
+    if _fake_api is not None:
+        _fake_api.stop()
+    if _cassette_proxy is not None:
+        _cassette_proxy.stop()
+
+
+def pytest_terminal_summary(terminalreporter):
+    if _scheduler is not None and (_scheduler.rate_limited or _scheduler.throttled_seconds):
+        summary = _scheduler.summary()
+        terminalreporter.write_line(
+            f"rate limiting: {summary['rate_limited']} of {summary['requests']} responses "
+            f"were 429/503, {summary['retries']} retried, "
+            f"{summary['throttled_seconds']}s spent throttled"
+        )
+    if _preflight is not None and _preflight.ran and _preflight.problems():
+        for verdict in _preflight.verdicts.values():
+            terminalreporter.write_line(f"preflight {verdict.describe()}")
+    for report in _prefix_cache_reports:
+        terminalreporter.write_line(report.describe())
+    if _cassette_proxy is not None:
+        terminalreporter.write_line(
+            f"cassette ({_cassette_proxy.mode}): {_cassette_proxy.hits} hits, "
+            f"{_cassette_proxy.misses} misses, {_cassette_proxy.recorded} recorded"
+        )
+
+
+def use_fake_llama_api():
+    """Helper function to tell whether the suite runs against the in-process stand-in."""
+    return _api_mode == "fake"
+
+
+def use_cassette():
+    """Helper function to tell whether the suite runs through a record/replay cassette."""
+    return _api_mode in ("record", "replay", "refresh")
+
+
+def get_fake_llama_api():
+    """Helper function to get the in-process stand-in server, starting it on first use."""
+    global _fake_api
+    if _fake_api is None:
+        _fake_api = FakeLlamaAPI().start()
+    return _fake_api
+
+
+def get_cassette_proxy():
+    """Helper function to get the cassette proxy, starting it on first use."""
+    global _cassette_proxy
+    if _cassette_proxy is None:
+        cassette = Cassette(
+            _config.getoption("--cassette"),
+            max_age=_config.getoption("--cassette-max-age") * 24 * 60 * 60,
+        )
+        _cassette_proxy = CassetteProxy(
+            cassette, get_live_api_base_url(), _api_mode, timeout=get_request_timeout()
+        ).start()
+    return _cassette_proxy
+
+
+def get_preflight():
+    """Helper function to get the session's API preflight, None where it doesn't apply."""
+    global _preflight
+    if _preflight is None:
+        api_key = os.environ.get("LLAMA_API_KEY")
+        if (
+            _api_mode not in ("live", "refresh")
+            or _config.getoption("--preflight") == "off"
+            or api_key is None
+        ):
+            return None
+        _preflight = Preflight(
+            get_live_api_base_url(),
+            api_key,
+            get_llama_model(),
+            _config.getoption("--preflight-timeout"),
+        )
+    return _preflight
+
+
+def get_request_timeout():
+    """Helper function to get the read timeout of the suite's HTTP clients, in seconds."""
+    return _config.getoption("--request-timeout")
+
+
+def get_request_scheduler():
+    """Helper function to get the rate-limit scheduler shared by all HTTP clients."""
+    return _scheduler
+
+
+class TimeoutAdapter(requests.adapters.HTTPAdapter):
+    """requests transport adapter that applies `timeout` to requests sent without one."""
+
+    def __init__(self, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class ScheduledTimeoutAdapter(ScheduledAdapter, TimeoutAdapter):
+    """ScheduledAdapter that applies `timeout` to requests sent without one."""
+
+
+def new_http_session(pool_size, scheduler=None, timeout=None):
+    """Helper function to build a requests session with a keep-alive pool of pool_size.
+
+    With a scheduler, requests are paced and 429/503 responses retried through it. With a
+    timeout, requests sent without one get it.
+    """
+    session = requests.Session()
+    pool = {"pool_connections": pool_size, "pool_maxsize": pool_size, "timeout": timeout}
+    if scheduler is None:
+        adapter = TimeoutAdapter(**pool)
+    else:
+        adapter = ScheduledTimeoutAdapter(scheduler, **pool)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def record_exchange(response, *args, **kwargs):
+    """Helper function (a requests response hook) to note a request for --perf-history."""
+    _exchanges.append((
+        requests.utils.urlparse(response.url).path,
+        response.status_code,
+        response.elapsed.total_seconds(),
+    ))
+
+
+def timed_transport(transport):
+    """Helper function to wrap an httpx transport for --network-timing, when enabled."""
+    if _network_timing is None:
+        return transport
+    if isinstance(transport, httpx.AsyncBaseTransport):
+        return AsyncTimedTransport(transport)
+    return TimedTransport(transport)
+
+
+def get_langchain_http_clients():
+    """Helper function to get the scheduled (sync, async) httpx clients for ChatOpenAI."""
+    global _langchain_http_clients
+    if _langchain_http_clients is None:
+        pool_size = _config.getoption("--http-pool-size")
+        limits = httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        timeout = httpx.Timeout(get_request_timeout(), connect=10)
+        _langchain_http_clients = (
+            httpx.Client(
+                transport=ScheduledTransport(
+                    _scheduler, timed_transport(httpx.HTTPTransport(limits=limits))
+                ),
+                timeout=timeout,
+            ),
+            httpx.AsyncClient(
+                transport=AsyncScheduledTransport(
+                    _scheduler, timed_transport(httpx.AsyncHTTPTransport(limits=limits))
+                ),
+                timeout=timeout,
+            ),
+        )
+    return _langchain_http_clients
 
 
 def get_llama_model():
@@ -8,9 +456,28 @@ def get_llama_model():
     return os.environ.get("LLAMA_MODEL", "Llama-3.3-8B-Instruct")
 
 
+def get_live_api_base_url():
+    """Helper function to get the live Llama API base URL from environment variables."""
+    return os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+
+
+def get_llama_api_base_url():
+    """Helper function to get the Llama API base URL for the selected mode."""
+    if use_fake_llama_api():
+        return get_fake_llama_api().base_url
+    if use_cassette():
+        return get_cassette_proxy().base_url
+    return get_live_api_base_url()
+
+
 def get_llama_api_key():
     """Helper function to get the Llama API key from environment variables."""
+    if use_fake_llama_api():
+        return get_fake_llama_api().api_key
     api_key = os.environ.get("LLAMA_API_KEY", None)
+    if api_key is None and _api_mode == "replay":
+        # Replayed responses never reach the API, any key will do.
+        return "cassette-replay"
     if api_key is None:
         pytest.skip("LLAMA_API_KEY environment variable not set")
     return api_key
@@ -19,7 +486,71 @@ def get_llama_api_key():
 @pytest.fixture
 def api_base_url():
     """Fixture to provide the Llama API base URL."""
-    return os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+    return get_llama_api_base_url()
+
+
+@pytest.fixture(scope="session")
+def http_session(pytestconfig):
+    """Fixture to provide a keep-alive requests session shared by all raw-HTTP tests."""
+    session = new_http_session(
+        pytestconfig.getoption("--http-pool-size"), _scheduler, (10, get_request_timeout())
+    )
+    session.hooks["response"].append(record_exchange)
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def prefix_cache_reports():
+    """Fixture to provide the list of prefix cache probe reports shown in the summary."""
+    return _prefix_cache_reports
+
+
+@pytest.fixture(scope="session")
+def http_client(pytestconfig):
+    """Fixture to provide a keep-alive httpx client shared by all OpenAI SDK tests."""
+    pool_size = pytestconfig.getoption("--http-pool-size")
+    transport = httpx.HTTPTransport(
+        http2=pytestconfig.getoption("--http2"),
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+    )
+    client = httpx.Client(
+        transport=ScheduledTransport(_scheduler, timed_transport(transport)),
+        timeout=httpx.Timeout(get_request_timeout(), connect=10),
+    )
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def stream_probe(request, pytestconfig):
+    """Fixture to provide a StreamProbe whose metrics are recorded when the test ends."""
+    probe = StreamProbe(request.node.nodeid)
+    yield probe
+    if not probe.started:
+        return
+    record = {
+        "test": request.node.nodeid,
+        "model": get_llama_model(),
+        "timestamp": time.time(),
+        **probe.summary(),
+    }
+    request.node.user_properties.append(("stream_metrics", json.dumps(record)))
+    path = pytestconfig.getoption("--stream-metrics")
+    if path:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def fake_api():
+    """Fixture to provide a stand-in API of its own with a small delay between streamed frames.
+
+    Unlike `--llama-api=fake`, this is a fresh server per test, for the tests of the
+    suite's tools that count the requests it served.
+    """
+    with FakeLlamaAPI(chunk_delay=0.001) as server:
+        yield server
 
 
 @pytest.fixture
@@ -0,0 +1,233 @@
+"""
+Context-length sweep: how latency, TTFT and client-side encoding scale with prompt size.
+
+For every --sizes x --turns combination a synthetic, deterministic conversation of about
+that many words (the unit the stand-in counts as prompt tokens) split over that many
+alternating user/assistant turns is built and sent --repeats times to each endpoint, the
+endpoint order alternating between repeats. Client-side JSON encoding of the payload is
+timed separately (best of a few runs), so its cost shows up even for sizes the API rejects
+as over the context limit. The report gives payload size, encode time and p50 latency and
+TTFT per point, a bar chart of latency, and a least-squares fit of latency and TTFT
+against size per endpoint (ms per 1k tokens). --csv writes the points for plotting.
+
+Examples:
+    python tests/context_sweep.py --sizes 256,4096,65536 --turns 1,16 --stream
+    python tests/context_sweep.py --fake --repeats 3 --csv sweep.csv
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+
+from benchmark import BenchmarkConfig, new_client, send_request
+from fake_llama_api import FakeLlamaAPI
+from stream_probe import percentile
+
+DEFAULT_SIZES = (128, 512, 2048, 8192, 32768)
+DEFAULT_TURNS = (1, 8)
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while river stones gather moss under "
+    "quiet autumn skies and distant bells ring for travellers who carry maps lanterns "
+    "bread letters seeds old coins and stories about mountains harbours markets gardens "
+    "libraries clocks bridges winter summer morning evening silver copper paper glass"
+).split()
+
+
+def synthetic_conversation(tokens, turns=1, seed=0):
+    """Return `turns` alternating messages, ending with a user turn, of `tokens` words."""
+    rng = random.Random(f"{seed}:{tokens}:{turns}")
+    turns = max(1, min(turns, tokens))
+    messages = []
+    for index in range(turns):
+        words = tokens // turns + (index < tokens % turns)
+        role = "user" if (turns - 1 - index) % 2 == 0 else "assistant"
+        messages.append({"role": role, "content": " ".join(rng.choices(WORDS, k=words))})
+    return messages
+
+
+def encode_time(payload, runs=5):
+    """Return (best seconds, bytes) of json.dumps(payload) over `runs` runs."""
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        body = json.dumps(payload)
+        best = min(best, time.perf_counter() - started)
+    return best, len(body.encode("utf-8"))
+
+
+@dataclass
+class SweepPoint:
+    """Every request sent for one context size, turn count and endpoint."""
+
+    tokens: int
+    turns: int
+    endpoint: str
+    payload_bytes: int
+    encode: float
+    results: list = field(default_factory=list)
+
+    def row(self):
+        ok = [result for result in self.results if result.error is None]
+        return {
+            "tokens": self.tokens,
+            "turns": self.turns,
+            "endpoint": self.endpoint,
+            "requests": len(self.results),
+            "ok": len(ok),
+            "payload_bytes": self.payload_bytes,
+            "encode": round(self.encode, 6),
+            "latency_p50": percentile([result.latency for result in ok], 50),
+            "ttft_p50": percentile([result.ttft for result in ok if result.ttft is not None], 50),
+            "errors": sorted({result.error for result in self.results if result.error}),
+        }
+
+
+async def run_sweep(config, sizes=DEFAULT_SIZES, turns=DEFAULT_TURNS, repeats=5, scheduler=None):
+    """Send every size/turns conversation `repeats` times per endpoint; return report rows.
+
+    Given a RequestScheduler, requests are paced and 429/503 responses retried through it.
+    """
+    points = []
+    async with new_client(config, scheduler) as client:
+        for endpoint in config.endpoints:
+            await send_request(client, config, endpoint, time.perf_counter())
+        for tokens in sizes:
+            for turn_count in turns:
+                messages = synthetic_conversation(tokens, turn_count)
+                payload = {"model": config.model, "messages": messages, "stream": config.stream}
+                encode, size = encode_time(payload)
+                sweep = {
+                    endpoint: SweepPoint(tokens, len(messages), endpoint, size, encode)
+                    for endpoint in config.endpoints
+                }
+                for repeat in range(repeats):
+                    order = config.endpoints if repeat % 2 == 0 else config.endpoints[::-1]
+                    for endpoint in order:
+                        result = await send_request(
+                            client, config, endpoint, time.perf_counter(), messages
+                        )
+                        sweep[endpoint].results.append(result)
+                points.extend(sweep.values())
+    return [point.row() for point in points]
+
+
+def scaling(rows, metric):
+    """Fit `metric` against size per endpoint; return {endpoint: (s per 1k tokens, intercept)}."""
+    fits = {}
+    for endpoint in dict.fromkeys(row["endpoint"] for row in rows):
+        points = [
+            (row["tokens"] / 1000, row[metric])
+            for row in rows
+            if row["endpoint"] == endpoint and row[metric] is not None
+        ]
+        if len({x for x, _ in points}) < 2:
+            continue
+        fits[endpoint] = statistics.linear_regression(*zip(*points, strict=True))
+    return fits
+
+
+def format_report(rows, width=30):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.1f}"
+
+    longest = max((row["latency_p50"] or 0 for row in rows), default=0)
+    lines = [
+        f"{'tokens':>7} {'turns':>5} {'endpoint':<8} {'ok':>5} {'KiB':>9} {'encode ms':>9} "
+        f"{'p50 ms':>8} {'ttft ms':>8}  latency"
+    ]
+    for row in rows:
+        bar = "#" * round(width * (row["latency_p50"] or 0) / longest) if longest else ""
+        lines.append(
+            f"{row['tokens']:>7} {row['turns']:>5} {row['endpoint']:<8} "
+            f"{row['ok']:>2}/{row['requests']:<2} {row['payload_bytes'] / 1024:>9.1f} "
+            f"{ms(row['encode']):>9} {ms(row['latency_p50']):>8} {ms(row['ttft_p50']):>8}  {bar}"
+        )
+    for metric in ("latency_p50", "ttft_p50", "encode"):
+        for endpoint, (slope, intercept) in scaling(rows, metric).items():
+            lines.append(
+                f"{metric} {endpoint}: {slope * 1000:+.3f} ms per 1k tokens "
+                f"(intercept {intercept * 1000:.1f} ms)"
+            )
+    for row in rows:
+        for error in row["errors"]:
+            lines.append(
+                f"{row['tokens']} tokens, {row['turns']} turns, {row['endpoint']}: {error}"
+            )
+    return "\n".join(lines)
+
+
+def int_list(value):
+    return tuple(int(item) for item in value.split(","))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--sizes", type=int_list, default=DEFAULT_SIZES, help="comma-separated prompt sizes"
+    )
+    parser.add_argument(
+        "--turns", type=int_list, default=DEFAULT_TURNS, help="comma-separated turn counts"
+    )
+    parser.add_argument("--repeats", type=int, default=5, help="requests per point and endpoint")
+    parser.add_argument(
+        "--endpoint", choices=("native", "compat", "both"), default="both", help="default: both"
+    )
+    parser.add_argument("--stream", action="store_true", help="request SSE streaming")
+    parser.add_argument(
+        "--max-tokens", type=int, default=16, help="max_tokens, small so prefill dominates"
+    )
+    parser.add_argument("--model", default=os.environ.get("LLAMA_MODEL", "Llama-3.3-8B-Instruct"))
+    parser.add_argument(
+        "--base-url", default=os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+    )
+    parser.add_argument("--fake", action="store_true", help="spin up and target the stand-in")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    parser.add_argument("--csv", metavar="PATH", help="also write the points as CSV")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fake = FakeLlamaAPI().start() if args.fake else None
+    api_key = fake.api_key if fake else os.environ.get("LLAMA_API_KEY")
+    if api_key is None:
+        sys.exit("LLAMA_API_KEY environment variable not set (or use --fake)")
+
+    config = BenchmarkConfig(
+        base_url=fake.base_url if fake else args.base_url,
+        api_key=api_key,
+        model=args.model,
+        endpoints=("native", "compat") if args.endpoint == "both" else (args.endpoint,),
+        stream=args.stream,
+        max_tokens=args.max_tokens,
+    )
+    try:
+        rows = asyncio.run(run_sweep(config, args.sizes, args.turns, args.repeats))
+    finally:
+        if fake:
+            fake.stop()
+
+    print(f"{config.base_url} model={config.model} stream={config.stream}")
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(rows, f, indent=2)
+    if args.csv:
+        if not rows:
+            sys.exit("No sweep points measured, nothing to write as CSV")
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=[key for key in rows[0] if key != "errors"])
+            writer.writeheader()
+            writer.writerows({key: row[key] for key in writer.fieldnames} for row in rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Paired comparison of the native and compat endpoints: what does the compat layer cost?
+
+The same payload is sent to /v1/chat/completions and /compat/v1/chat/completions, one
+after the other, --pairs times. The order alternates native-compat, compat-native, ...
+so drift in the API's load during the run hits both endpoints alike. Each pair gives one
+compat - native difference per metric (latency, TTFT when streaming, tokens per second
+and response bytes); the report gives the mean difference with a bootstrap confidence
+interval, relative to the native mean. A difference whose interval excludes zero is
+marked significant. Pairs where either request failed are dropped and counted.
+
+Examples:
+    python tests/endpoint_comparison.py --pairs 100 --stream
+    python tests/endpoint_comparison.py --fake --pairs 30 --json comparison.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+from benchmark import BenchmarkConfig, new_client, send_request
+from fake_llama_api import FakeLlamaAPI
+
+
+@dataclass
+class Comparison:
+    """The paired compat - native difference of one metric."""
+
+    metric: str
+    pairs: int
+    native: float
+    compat: float
+    difference: float
+    ci_low: float
+    ci_high: float
+    relative: float | None
+
+    @property
+    def significant(self):
+        return self.ci_low > 0 or self.ci_high < 0
+
+
+def bootstrap_interval(differences, confidence=0.95, resamples=2000, seed=0):
+    """Return the percentile bootstrap interval of the mean of `differences`."""
+    rng = random.Random(seed)
+    n = len(differences)
+    means = sorted(sum(rng.choices(differences, k=n)) / n for _ in range(resamples))
+    tail = (1 - confidence) / 2
+    return means[int(tail * resamples)], means[min(resamples - 1, int((1 - tail) * resamples))]
+
+
+def metrics(result):
+    """Return the compared metrics of one RequestResult (None when not applicable)."""
+    return {
+        "latency": result.latency,
+        "ttft": result.ttft,
+        "tokens_per_second": result.tokens / result.latency if result.latency else None,
+        "bytes": result.bytes,
+    }
+
+
+def compare_pairs(pairs, confidence=0.95):
+    """Turn [(native RequestResult, compat RequestResult)] into a Comparison per metric."""
+    comparisons = []
+    for metric in ("latency", "ttft", "tokens_per_second", "bytes"):
+        values = [(metrics(native)[metric], metrics(compat)[metric]) for native, compat in pairs]
+        values = [(n, c) for n, c in values if n is not None and c is not None]
+        if len(values) < 2:
+            continue
+        native_mean = statistics.fmean(n for n, _ in values)
+        differences = [c - n for n, c in values]
+        low, high = bootstrap_interval(differences, confidence)
+        difference = statistics.fmean(differences)
+        comparisons.append(
+            Comparison(
+                metric,
+                len(values),
+                native_mean,
+                statistics.fmean(c for _, c in values),
+                difference,
+                low,
+                high,
+                difference / native_mean if native_mean else None,
+            )
+        )
+    return comparisons
+
+
+async def run_pairs(config, pairs, scheduler=None):
+    """Send `pairs` interleaved native/compat requests; return (pairs, failed pairs).
+
+    Given a RequestScheduler, requests are paced and 429/503 responses retried through it.
+    """
+    results, failed = [], 0
+    async with new_client(config, scheduler) as client:
+        # Warm both endpoints' connections up so the first pair isn't paying for them.
+        for endpoint in ("native", "compat"):
+            await send_request(client, config, endpoint, time.perf_counter())
+        for index in range(pairs):
+            order = ("native", "compat") if index % 2 == 0 else ("compat", "native")
+            pair = {}
+            for endpoint in order:
+                pair[endpoint] = await send_request(client, config, endpoint, time.perf_counter())
+            if pair["native"].error or pair["compat"].error:
+                failed += 1
+                continue
+            results.append((pair["native"], pair["compat"]))
+    return results, failed
+
+
+def format_comparisons(comparisons, confidence):
+    lines = [
+        f"{'metric':<18} {'pairs':>5} {'native':>10} {'compat':>10} {'compat - native':>16} "
+        f"{f'{confidence:.0%} CI':>22} {'relative':>9}"
+    ]
+    for c in comparisons:
+        relative = "-" if c.relative is None else f"{c.relative * 100:+.1f}%"
+        interval = f"[{c.ci_low:+.4g}, {c.ci_high:+.4g}]"
+        lines.append(
+            f"{c.metric:<18} {c.pairs:>5} {c.native:>10.4g} {c.compat:>10.4g} "
+            f"{c.difference:>+16.4g} {interval:>22} {relative:>9}"
+            + ("  *" if c.significant else "")
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pairs", type=int, default=50, help="native/compat pairs to send")
+    parser.add_argument("--stream", action="store_true", help="request SSE streaming")
+    parser.add_argument("--max-tokens", type=int, help="max_tokens for each request")
+    parser.add_argument("--prompt", default="Hello, how are you?")
+    parser.add_argument("--confidence", type=float, default=0.95, help="interval confidence")
+    parser.add_argument("--model", default=os.environ.get("LLAMA_MODEL", "Llama-3.3-8B-Instruct"))
+    parser.add_argument(
+        "--base-url", default=os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+    )
+    parser.add_argument("--fake", action="store_true", help="spin up and target the stand-in")
+    parser.add_argument("--json", metavar="PATH", help="also write the comparison as JSON")
+    args = parser.parse_args(argv)
+
+    fake = FakeLlamaAPI().start() if args.fake else None
+    api_key = fake.api_key if fake else os.environ.get("LLAMA_API_KEY")
+    if api_key is None:
+        sys.exit("LLAMA_API_KEY environment variable not set (or use --fake)")
+    config = BenchmarkConfig(
+        base_url=fake.base_url if fake else args.base_url,
+        api_key=api_key,
+        model=args.model,
+        stream=args.stream,
+        max_tokens=args.max_tokens,
+        prompt=args.prompt,
+    )
+    try:
+        pairs, failed = asyncio.run(run_pairs(config, args.pairs))
+    finally:
+        if fake:
+            fake.stop()
+
+    comparisons = compare_pairs(pairs, args.confidence)
+    print(f"{config.base_url} model={config.model} stream={config.stream}: {len(pairs)} pairs")
+    if failed:
+        print(f"{failed} pairs dropped because a request failed")
+    print(format_comparisons(comparisons, args.confidence))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "pairs": len(pairs),
+                    "failed_pairs": failed,
+                    "comparisons": [
+                        {**asdict(c), "significant": c.significant} for c in comparisons
+                    ],
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+"""
+In-process stand-in for the Llama API, used to run the suite offline.
+
+The server runs an asyncio event loop on a background thread and implements
+/v1/chat/completions and /compat/v1/chat/completions with the quirks the suite encodes:
+- application/x-www-form-urlencoded (or any non-JSON) bodies are rejected with 400
+- stream=True without an explicit Accept header (missing or */*) is rejected with 400
+- streaming responses are text/event-stream, everything else is application/json
+- /v1 answers with the native `completion_message` shape, /compat/v1 with `choices`
+
+Select it for the suite with `pytest --llama-api=fake` (or LLAMA_API_MODE=fake), or run it
+standalone with `python tests/fake_llama_api.py --port 8080`.
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from http import HTTPStatus
+
+from http_server import LocalHTTPServer
+
+FAKE_API_KEY = "fake-llama-api-key"
+
+NATIVE_PATH = "/v1/chat/completions"
+COMPAT_PATH = "/compat/v1/chat/completions"
+
+# The canned reply, pre-split into "tokens" (words with their trailing space).
+REPLY_TEXT = "Hello! I'm doing well, thank you for asking. How can I help you today?"
+REPLY_TOKENS = [word + " " for word in REPLY_TEXT.split(" ")]
+REPLY_TOKENS[-1] = REPLY_TOKENS[-1].rstrip()
+
+
+class APIError(Exception):
+    """Raised while handling a request that the API would answer with an error status."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+@dataclass
+class Completion:
+    """Deterministic token stream for one chat completion request.
+
+    Without max_tokens the canned reply is produced once and finishes with "stop"; with
+    max_tokens the reply is cycled until the limit and finishes with "length", which lets
+    callers ask for arbitrarily long generations. Tokens are produced lazily.
+    """
+
+    max_tokens: int | None = None
+    stop: list[str] = field(default_factory=list)
+    finish_reason: str | None = None
+    completion_tokens: int = 0
+
+    def __iter__(self):
+        limit = self.max_tokens if self.max_tokens is not None else len(REPLY_TOKENS)
+        tail_length = max((len(stop) for stop in self.stop), default=0)
+        tail = ""
+        for index in range(limit):
+            token = REPLY_TOKENS[index % len(REPLY_TOKENS)]
+            window = tail + token
+            for stop in self.stop:
+                cut = window.find(stop)
+                if cut != -1:
+                    self.finish_reason = "stop"
+                    if cut > len(tail):
+                        self.completion_tokens += 1
+                        yield window[len(tail) : cut]
+                    return
+            self.completion_tokens += 1
+            yield token
+            tail = window[-tail_length:] if tail_length else ""
+        self.finish_reason = "length" if self.max_tokens is not None else "stop"
+
+    @classmethod
+    def from_payload(cls, payload):
+        max_tokens = payload.get("max_completion_tokens") or payload.get("max_tokens")
+        stop = payload.get("stop") or []
+        if isinstance(stop, str):
+            stop = [stop]
+        return cls(max_tokens=max_tokens, stop=stop)
+
+
+@dataclass
+class StreamRecord:
+    """What the stand-in sent for one streamed response, times from perf_counter()."""
+
+    path: str
+    frames: int = 0
+    finished: bool = False
+    ended_at: float | None = None
+
+    @property
+    def aborted(self):
+        """Whether the stream broke off before its last frame, e.g. on a client hang-up."""
+        return self.ended_at is not None and not self.finished
+
+
+def count_prompt_tokens(messages):
+    """Approximate the prompt size as the number of whitespace-separated words."""
+    total = 0
+    for message in messages:
+        content = message.get("content") or ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        total += len(str(content).split())
+    return total
+
+
+class FakeLlamaAPI(LocalHTTPServer):
+    """Local server emulating the Llama API chat completion endpoints.
+
+    Args:
+        host: Interface to bind.
+        port: Port to bind, 0 picks a free one.
+        api_key: The only bearer token accepted; anything else gets a 401.
+        chunk_delay: Seconds to sleep between streamed frames.
+
+    Every streamed response is recorded in `streams`, so tests can tell how far a stream
+    got before the client went away.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, *, api_key=FAKE_API_KEY, chunk_delay=0.0):
+        super().__init__(host, port)
+        self.api_key = api_key
+        self.chunk_delay = chunk_delay
+        self.streams = []
+        self._ids = itertools.count(1)
+
+    async def _dispatch(self, request, writer):
+        compat = request.path == COMPAT_PATH
+        try:
+            if request.path not in (NATIVE_PATH, COMPAT_PATH):
+                raise APIError(404, f"No route for {request.path}")
+            if request.method != "POST":
+                raise APIError(405, f"Method {request.method} not allowed")
+            self._check_auth(request)
+            payload = self._parse_payload(request)
+            stream = bool(payload.get("stream"))
+            if stream:
+                accept = request.headers.get("accept", "").strip()
+                if accept in ("", "*/*"):
+                    raise APIError(400, "Streaming requires an explicit Accept header")
+        except APIError as e:
+            await self._send_error(writer, request, e, compat)
+            return
+
+        completion = Completion.from_payload(payload)
+        if stream:
+            await self._send_stream(writer, request, payload, completion, compat)
+        else:
+            text = "".join(completion)
+            body = (self._compat_body if compat else self._native_body)(payload, completion, text)
+            await self._send(writer, request, 200, "application/json", json.dumps(body).encode())
+
+    def _check_auth(self, request):
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or token != self.api_key:
+            raise APIError(401, "Invalid or missing API key")
+
+    def _parse_payload(self, request):
+        content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            raise APIError(400, f"Unsupported Content-Type: {content_type or 'none'}")
+        try:
+            payload = json.loads(request.body)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise APIError(400, f"Invalid JSON body: {e}") from e
+        if not isinstance(payload, dict) or "model" not in payload or "messages" not in payload:
+            raise APIError(400, "Request body must include 'model' and 'messages'")
+        return payload
+
+    def _usage(self, payload, completion):
+        prompt_tokens = count_prompt_tokens(payload["messages"])
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion.completion_tokens,
+            "total_tokens": prompt_tokens + completion.completion_tokens,
+        }
+
+    def _native_metrics(self, payload, completion):
+        usage = self._usage(payload, completion)
+        return [
+            {"metric": f"num_{name}", "value": value, "unit": "tokens"}
+            for name, value in usage.items()
+        ]
+
+    def _native_body(self, payload, completion, text):
+        return {
+            "id": f"fake-{next(self._ids)}",
+            "completion_message": {
+                "role": "assistant",
+                "stop_reason": completion.finish_reason,
+                "content": {"type": "text", "text": text},
+            },
+            "metrics": self._native_metrics(payload, completion),
+        }
+
+    def _compat_body(self, payload, completion, text):
+        return {
+            "id": f"chatcmpl-{next(self._ids)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload["model"],
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": text},
+                    "finish_reason": completion.finish_reason,
+                }
+            ],
+            "usage": self._usage(payload, completion),
+        }
+
+    def _native_events(self, payload, completion):
+        response_id = f"fake-{next(self._ids)}"
+
+        def event(**fields):
+            return {"id": response_id, "event": fields}
+
+        yield event(event_type="start", delta={"type": "text", "text": ""})
+        for token in completion:
+            yield event(event_type="progress", delta={"type": "text", "text": token})
+        yield event(
+            event_type="complete",
+            delta={"type": "text", "text": ""},
+            stop_reason=completion.finish_reason,
+        )
+        yield event(event_type="metrics", metrics=self._native_metrics(payload, completion))
+
+    def _compat_events(self, payload, completion):
+        response_id = f"chatcmpl-{next(self._ids)}"
+        created = int(time.time())
+
+        def chunk(delta, finish_reason=None):
+            return {
+                "id": response_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": payload["model"],
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+
+        yield chunk({"role": "assistant", "content": ""})
+        for token in completion:
+            yield chunk({"content": token})
+        final = chunk({}, completion.finish_reason)
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            yield final
+            yield {**chunk({}), "choices": [], "usage": self._usage(payload, completion)}
+        else:
+            # Without stream_options, usage rides along on the finishing chunk.
+            yield {**final, "usage": self._usage(payload, completion)}
+
+    async def _send_stream(self, writer, request, payload, completion, compat):
+        events = (self._compat_events if compat else self._native_events)(payload, completion)
+        frames = (f"data: {json.dumps(event)}\n\n".encode() for event in events)
+        if compat:
+            frames = itertools.chain(frames, [b"data: [DONE]\n\n"])
+
+        record = StreamRecord(request.path)
+        self.streams.append(record)
+
+        async def paced(frames):
+            for index, frame in enumerate(frames):
+                if index and self.chunk_delay:
+                    await asyncio.sleep(self.chunk_delay)
+                yield frame
+                # Resumed once the frame is written, or never if the client hung up.
+                record.frames += 1
+
+        headers = {"Content-Type": "text/event-stream", "Cache-Control": "no-cache"}
+        try:
+            await self._send_chunked(writer, request, 200, headers, paced(frames))
+            record.finished = True
+        finally:
+            record.ended_at = time.perf_counter()
+
+    async def _send_error(self, writer, request, error, compat):
+        if compat:
+            body = {
+                "error": {
+                    "message": error.message,
+                    "type": "invalid_request_error",
+                    "code": error.status,
+                }
+            }
+        else:
+            body = {
+                "title": HTTPStatus(error.status).phrase,
+                "status": error.status,
+                "detail": error.message,
+            }
+        body = json.dumps(body).encode()
+        await self._send(writer, request, error.status, "application/json", body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the fake Llama API until interrupted.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--api-key", default=FAKE_API_KEY)
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = FakeLlamaAPI(args.host, args.port, api_key=args.api_key, chunk_delay=args.chunk_delay)
+    with server:
+        print(
+            f"Fake Llama API listening on {server.base_url} (API key: {server.api_key})", flush=True
+        )
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,405 @@
+"""
+SSE frame-size and chunk-coalescing analysis of streamed chat completions.
+
+Every streamed response is broken down frame by frame:
+- payload bytes: the frame's `data`, the JSON chunk
+- framing overhead: the share of the frame's wire bytes that is not payload, i.e. SSE
+  field names and line endings (the HTTP chunk headers around it are not counted)
+- tokens: words and punctuation marks in the text the frame carries, an estimate of the
+  model tokens (0 for frames without text, like `start` or the usage chunk)
+- frames per read: the frames completed by each read the client made on the connection,
+  which shows whether the server (or a proxy on the way) coalesces frames into fewer TCP
+  segments, or sends every token on its own
+
+Requests go through httpcore with a network backend that counts the reads on the socket
+(after TLS decryption), so the reads are what a proxy terminating the stream would see,
+not the HTTP chunks that requests or httpx hand out. Per endpoint the report gives a
+histogram of each metric over all frames (or reads) of all its streams and flags
+per-token framing: when the median frame carries at most one token, and the frames
+aren't coalesced into reads either, every token costs a frame, a JSON decode and a read
+to whatever relays the stream, and client-side coalescing is worth considering. A stream
+that ends inside a frame counts as failed.
+
+Given a RequestScheduler, as the tests pass in the suite's, requests are paced and
+429/503 responses retried through it.
+
+Examples:
+    python tests/frame_analysis.py --streams 5 --max-tokens 500
+    python tests/frame_analysis.py --fake --fake-chunk-delay 0 --json frames.json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+from dataclasses import dataclass, field
+
+import httpcore
+from benchmark import ENDPOINTS
+from fake_llama_api import FakeLlamaAPI
+from rate_limit import ScheduledConnectionPool
+from sse import SSEParser
+from stream_probe import frame_text
+
+# Upper bounds of the histogram buckets; the last bucket takes everything above.
+PAYLOAD_BOUNDS = (32, 64, 128, 256, 512, 1024, 4096)
+OVERHEAD_BOUNDS = (0.02, 0.05, 0.1, 0.2, 0.5)
+TOKEN_BOUNDS = (0, 1, 2, 4, 8, 16)
+READ_BOUNDS = (0, 1, 2, 4, 8, 16, 64)
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+
+def estimate_tokens(text):
+    """Return a rough token count of `text`: its words and punctuation marks."""
+    return len(_TOKEN.findall(text))
+
+
+class CountingStream(httpcore.NetworkStream):
+    """Network stream that logs the size of every read to its backend."""
+
+    def __init__(self, stream, backend):
+        self._stream = stream
+        self._backend = backend
+
+    def read(self, max_bytes, timeout=None):
+        data = self._stream.read(max_bytes, timeout)
+        self._backend.reads.append(len(data))
+        return data
+
+    def write(self, buffer, timeout=None):
+        self._stream.write(buffer, timeout)
+
+    def close(self):
+        self._stream.close()
+
+    def start_tls(self, ssl_context, server_hostname=None, timeout=None):
+        stream = self._stream.start_tls(ssl_context, server_hostname, timeout)
+        return CountingStream(stream, self._backend)
+
+    def get_extra_info(self, info):
+        return self._stream.get_extra_info(info)
+
+
+class CountingBackend(httpcore.NetworkBackend):
+    """httpcore network backend whose connections log their reads to `reads`."""
+
+    def __init__(self, backend=None):
+        self._backend = backend or httpcore.SyncBackend()
+        self.reads = []
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        stream = self._backend.connect_tcp(host, port, timeout, local_address, socket_options)
+        return CountingStream(stream, self)
+
+    def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        return CountingStream(
+            self._backend.connect_unix_socket(path, timeout, socket_options), self
+        )
+
+    def sleep(self, seconds):
+        self._backend.sleep(seconds)
+
+
+@dataclass(slots=True)
+class Frame:
+    """One SSE frame: its sizes, estimated tokens and the read that completed it."""
+
+    payload: int
+    wire: int
+    tokens: int
+    read: int
+
+    @property
+    def overhead(self):
+        return (self.wire - self.payload) / self.wire if self.wire else 0.0
+
+
+@dataclass
+class StreamFrames:
+    """The frames and reads of one streamed response."""
+
+    endpoint: str
+    frames: list = field(default_factory=list)
+    # Frames completed by each read that carried the body.
+    frames_per_read: list = field(default_factory=list)
+    error: str | None = None
+
+
+def analyze_events(endpoint, events, reads=None):
+    """Return the StreamFrames of `events`, given as (SSEEvent, index of the read) pairs.
+
+    `reads` are the byte counts of the connection's reads; without them (e.g. for
+    recorded chunks) every index counts as one read.
+    """
+    stream = StreamFrames(endpoint)
+    for event, read in events:
+        if event.is_done:
+            tokens = 0
+        else:
+            try:
+                tokens = estimate_tokens(frame_text(event.json()))
+            except json.JSONDecodeError:
+                tokens = 0
+        stream.frames.append(Frame(len(event.data.encode()), event.size, tokens, read))
+    if stream.frames:
+        first, last = stream.frames[0].read, stream.frames[-1].read
+        counts = dict.fromkeys(range(first, last + 1), 0)
+        for frame in stream.frames:
+            counts[frame.read] += 1
+        stream.frames_per_read = [
+            count for index, count in counts.items() if reads is None or reads[index]
+        ]
+    return stream
+
+
+def truncation(parser):
+    """Return the error of a stream whose body ended with `parser` inside a frame, or None."""
+    if not parser.pending_bytes:
+        return None
+    return f"stream ended inside a frame, {parser.pending_bytes} bytes unparsed"
+
+
+def analyze_chunks(endpoint, chunks):
+    """Return the StreamFrames of a body given as byte chunks, one chunk per read."""
+    parser = SSEParser()
+    events = [(event, index) for index, chunk in enumerate(chunks) for event in parser.feed(chunk)]
+    stream = analyze_events(endpoint, events)
+    stream.error = truncation(parser)
+    return stream
+
+
+def stream_frames(pool, backend, url, headers, payload, timeout=600.0):
+    """Send one streamed request through `pool`; return its StreamFrames."""
+    endpoint = next((name for name, path in ENDPOINTS.items() if url.endswith(path)), url)
+    backend.reads.clear()
+    parser = SSEParser()
+    events = []
+    with pool.stream(
+        "POST",
+        url,
+        headers={**headers, "Content-Type": "application/json", "Accept": "text/event-stream"},
+        content=json.dumps(payload).encode(),
+        extensions={"timeout": {"connect": 10.0, "read": timeout}},
+    ) as response:
+        if response.status != 200:
+            body = b"".join(response.iter_stream()).decode("utf-8", "replace")
+            return StreamFrames(endpoint, error=f"HTTP {response.status}: {body[:200]}")
+        for chunk in response.iter_stream():
+            events += [(event, len(backend.reads) - 1) for event in parser.feed(chunk)]
+    stream = analyze_events(endpoint, events, backend.reads)
+    stream.error = truncation(parser)
+    return stream
+
+
+def histogram(values, bounds):
+    """Return [(label, count)] of `values` in the buckets `bounds` (upper bounds, inclusive)."""
+    counts = [0] * (len(bounds) + 1)
+    for value in values:
+        counts[next((i for i, bound in enumerate(bounds) if value <= bound), len(bounds))] += 1
+    labels = [f"<={bound:g}" for bound in bounds] + [f">{bounds[-1]:g}"]
+    return list(zip(labels, counts, strict=True))
+
+
+@dataclass
+class FrameReport:
+    """The frames of every stream from one endpoint."""
+
+    endpoint: str
+    streams: list = field(default_factory=list)
+    # Flag per-token framing at or below this many tokens per frame (median).
+    max_tokens_per_frame: float = 1.0
+
+    @property
+    def frames(self):
+        return [frame for stream in self.streams for frame in stream.frames]
+
+    @property
+    def text_frames(self):
+        return [frame for frame in self.frames if frame.tokens]
+
+    @property
+    def frames_per_read(self):
+        return [count for stream in self.streams for count in stream.frames_per_read]
+
+    @property
+    def per_token_frames(self):
+        """Whether the median frame with text carries at most max_tokens_per_frame tokens."""
+        text = self.text_frames
+        if not text:
+            return None
+        return statistics.median(frame.tokens for frame in text) <= self.max_tokens_per_frame
+
+    @property
+    def coalescing_advised(self):
+        """Whether frames are per-token and arrive one per read, so nothing coalesces them."""
+        per_read = self.frames_per_read
+        if not self.per_token_frames or not per_read:
+            return False
+        return statistics.median(per_read) <= 1
+
+    def histograms(self):
+        frames, text = self.frames, self.text_frames
+        return {
+            "payload_bytes": histogram([frame.payload for frame in frames], PAYLOAD_BOUNDS),
+            "overhead": histogram([frame.overhead for frame in frames], OVERHEAD_BOUNDS),
+            "tokens_per_frame": histogram([frame.tokens for frame in text], TOKEN_BOUNDS),
+            "frames_per_read": histogram(self.frames_per_read, READ_BOUNDS),
+        }
+
+    def summary(self):
+        frames, text = self.frames, self.text_frames
+        ok = [stream for stream in self.streams if stream.error is None]
+        wire = sum(frame.wire for frame in frames)
+
+        def median(values):
+            return round(statistics.median(values), 3) if values else None
+
+        return {
+            "endpoint": self.endpoint,
+            "streams": len(self.streams),
+            "ok": len(ok),
+            "frames": len(frames),
+            "frames_per_stream": median([len(stream.frames) for stream in ok]),
+            "payload_bytes_p50": median([frame.payload for frame in frames]),
+            "overhead": round(1 - sum(frame.payload for frame in frames) / wire, 4)
+            if wire
+            else None,
+            "tokens_per_frame_p50": median([frame.tokens for frame in text]),
+            "frames_per_read_p50": median(self.frames_per_read),
+            "wire_bytes_per_token": round(wire / sum(frame.tokens for frame in text), 1)
+            if text
+            else None,
+            "per_token_frames": self.per_token_frames,
+            "coalescing_advised": self.coalescing_advised,
+            "errors": sorted({stream.error for stream in self.streams if stream.error}),
+            "histograms": self.histograms(),
+        }
+
+    def describe(self):
+        s = self.summary()
+        if s["coalescing_advised"]:
+            verdict = "one token per frame and per read: client-side coalescing advised"
+        elif s["per_token_frames"]:
+            verdict = "one token per frame, coalesced into reads"
+        elif s["per_token_frames"] is None:
+            verdict = "no text frames"
+        else:
+            verdict = "multi-token frames"
+        return (
+            f"{self.endpoint}: {s['frames']} frames in {s['ok']}/{s['streams']} streams, "
+            f"p50 {s['payload_bytes_p50']} payload bytes, {s['tokens_per_frame_p50']} tokens "
+            f"and {s['frames_per_read_p50']} frames per read, {s['overhead']} framing "
+            f"overhead, {s['wire_bytes_per_token']} wire bytes per token; {verdict}"
+        )
+
+
+def format_histogram(title, buckets, width=40):
+    total = sum(count for _, count in buckets)
+    largest = max((count for _, count in buckets), default=0)
+    lines = [f"  {title} ({total})"]
+    for label, count in buckets:
+        bar = "#" * round(width * count / largest) if largest else ""
+        lines.append(f"    {label:>8} {count:>7}  {bar}")
+    return lines
+
+
+def format_report(reports):
+    lines = []
+    for report in reports:
+        lines.append(report.describe())
+        for title, buckets in report.histograms().items():
+            lines += format_histogram(title, buckets)
+        lines += [f"  error: {error}" for error in report.summary()["errors"]]
+    return "\n".join(lines)
+
+
+def run_analysis(
+    base_url,
+    api_key,
+    model,
+    endpoints,
+    streams,
+    max_tokens,
+    prompt,
+    scheduler=None,
+    timeout=600.0,
+):
+    """Stream `streams` responses from each endpoint, alternating; return their FrameReports."""
+    backend = CountingBackend()
+    reports = {endpoint: FrameReport(endpoint) for endpoint in endpoints}
+    headers = {"Authorization": f"Bearer {api_key}"}
+    payload = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+        "stream": True,
+        "max_tokens": max_tokens,
+    }
+    with ScheduledConnectionPool(scheduler, network_backend=backend) as pool:
+        for _ in range(streams):
+            for endpoint in endpoints:
+                url = f"{base_url}{ENDPOINTS[endpoint]}"
+                try:
+                    stream = stream_frames(pool, backend, url, headers, payload, timeout)
+                except (
+                    httpcore.NetworkError,
+                    httpcore.ProtocolError,
+                    httpcore.TimeoutException,
+                ) as e:
+                    stream = StreamFrames(endpoint, error=f"{type(e).__name__}: {e}")
+                reports[endpoint].streams.append(stream)
+    return list(reports.values())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--streams", type=int, default=5, help="responses per endpoint")
+    parser.add_argument(
+        "--endpoint", choices=(*ENDPOINTS, "both"), default="both", help="default: both"
+    )
+    parser.add_argument("--max-tokens", type=int, default=300, help="length of each stream")
+    parser.add_argument(
+        "--request-timeout", type=float, default=600.0, help="read timeout of every request"
+    )
+    parser.add_argument("--prompt", default="Tell me a story about a lighthouse keeper.")
+    parser.add_argument("--model", default=os.environ.get("LLAMA_MODEL", "Llama-3.3-8B-Instruct"))
+    parser.add_argument(
+        "--base-url", default=os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+    )
+    parser.add_argument("--fake", action="store_true", help="spin up and target the stand-in")
+    parser.add_argument(
+        "--fake-chunk-delay", type=float, default=0.002, help="stand-in delay between frames"
+    )
+    parser.add_argument("--json", metavar="PATH", help="also write the summaries as JSON")
+    args = parser.parse_args(argv)
+
+    fake = FakeLlamaAPI(chunk_delay=args.fake_chunk_delay).start() if args.fake else None
+    api_key = fake.api_key if fake else os.environ.get("LLAMA_API_KEY")
+    if api_key is None:
+        sys.exit("LLAMA_API_KEY environment variable not set (or use --fake)")
+    endpoints = tuple(ENDPOINTS) if args.endpoint == "both" else (args.endpoint,)
+    try:
+        reports = run_analysis(
+            fake.base_url if fake else args.base_url,
+            api_key,
+            args.model,
+            endpoints,
+            args.streams,
+            args.max_tokens,
+            args.prompt,
+            timeout=args.request_timeout,
+        )
+    finally:
+        if fake:
+            fake.stop()
+
+    print(format_report(reports))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([report.summary() for report in reports], f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Minimal asyncio HTTP/1.1 server running on a background thread.
+
+It is the shared base of the local servers the suite talks to instead of the live API
+(see fake_llama_api.py). Subclasses implement `_dispatch` and answer with `_send` or
+`_send_chunked`; connections are kept alive unless the client asks otherwise.
+"""
+
+import asyncio
+import threading
+from dataclasses import dataclass
+from http import HTTPStatus
+
+
+@dataclass
+class Request:
+    """A parsed HTTP/1.1 request."""
+
+    method: str
+    path: str
+    headers: dict[str, str]
+    body: bytes = b""
+
+    @property
+    def keep_alive(self):
+        return self.headers.get("connection", "").lower() != "close"
+
+
+class LocalHTTPServer:
+    """Asyncio HTTP/1.1 server serving from a daemon thread.
+
+    Args:
+        host: Interface to bind.
+        port: Port to bind, 0 picks a free one.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.requests_served = 0
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._connections = set()
+
+    @property
+    def base_url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Start serving on a background thread and return self once listening."""
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run():
+            asyncio.set_event_loop(self._loop)
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle_connection, self.host, self.port)
+            )
+            self.port = self._server.sockets[0].getsockname()[1]
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        ready.wait()
+        return self
+
+    def stop(self):
+        """Stop the server and its event loop."""
+        if self._loop is None:
+            return
+
+        async def shutdown():
+            self._server.close()
+            for task in self._connections:
+                task.cancel()
+            await asyncio.gather(*self._connections, return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(shutdown(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    async def _handle_connection(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                self.requests_served += 1
+                await self._dispatch(request, writer)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Client hung up, or stop() is tearing down idle keep-alive connections.
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = request_line.split(" ", 2)
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = bytearray()
+            while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+            await reader.readuntil(b"\r\n")
+            body = bytes(body)
+        else:
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return Request(method, target.split("?", 1)[0], headers, body)
+
+    async def _dispatch(self, request, writer):
+        raise NotImplementedError
+
+    def _head(self, status, headers, keep_alive):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def _send(self, writer, request, status, content_type, body):
+        headers = {"Content-Type": content_type, "Content-Length": str(len(body))}
+        writer.write(self._head(status, headers, request.keep_alive) + body)
+        await writer.drain()
+
+    async def _send_chunked(self, writer, request, status, headers, chunks):
+        """Send `chunks` (an async iterable of bytes) with chunked transfer encoding."""
+        headers = {**headers, "Transfer-Encoding": "chunked"}
+        writer.write(self._head(status, headers, request.keep_alive))
+        async for chunk in chunks:
+            if chunk:
+                writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
@@ -0,0 +1,201 @@
+"""
+Import-time budget for the test modules, so that collecting the suite stays fast.
+
+conftest.py and then every tests/test_*.py module are imported one after the other in a
+fresh interpreter, as pytest does when it collects the suite, and the time each import
+adds is held against a budget: DEFAULT_BUDGET, or the module's entry in BUDGETS. The client
+SDK stacks in HEAVY_STACKS take seconds to import, so only the modules listed in
+conftest.SDK_MODULES, which `-m "not sdk"` keeps pytest from importing at all, may pull
+them in; they are imported last so that any other module (or conftest.py) that loads one
+is caught, and fails the check even within its budget.
+
+Tests that need an SDK import it inside the test and are marked `sdk`, which module
+imports can't check, so with --run the suite is also run for real with `-m "not sdk"`
+against the offline stand-in, in a fresh interpreter, and must not have loaded any of
+HEAVY_STACKS by the end. In the suite that check only runs with --sdk-free-run, which the
+nightly offline job passes: it takes as long as the suite itself.
+
+Examples:
+    python tests/import_budget.py
+    python tests/import_budget.py --budget 0.2 --json import_times.json
+    python tests/import_budget.py --run
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+TESTS = Path(__file__).parent
+
+HEAVY_STACKS = ("openai", "langchain_core", "langchain_openai", "langchain_tests")
+DEFAULT_BUDGET = 0.5
+BUDGETS = {
+    "conftest": 1.0,
+    "test_langchain_standard": 5.0,
+}
+
+# Run in the subprocess: import the modules in argv[1] in order, timing each.
+_MEASURE = """
+import json, sys, time
+heavy_stacks = json.loads(sys.argv[2])
+for module in json.loads(sys.argv[1]):
+    loaded = {name for name in heavy_stacks if name in sys.modules}
+    started = time.perf_counter()
+    try:
+        __import__(module)
+    except Exception as e:
+        print(json.dumps({"module": module, "error": f"{type(e).__name__}: {e}"}), flush=True)
+        continue
+    seconds = time.perf_counter() - started
+    heavy = [name for name in heavy_stacks if name in sys.modules and name not in loaded]
+    print(json.dumps({"module": module, "seconds": seconds, "heavy": heavy}), flush=True)
+"""
+
+# Run in the subprocess: run pytest with argv[2:] in-process, then list the heavy stacks
+# loaded by the end of the run.
+_RUN = """
+import json, sys
+import pytest
+code = pytest.main(sys.argv[2:])
+heavy = [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+print("\\nsdk-free run: " + json.dumps({"exit": int(code), "heavy": heavy}))
+"""
+SDK_FREE_ARGS = ("-m", "not sdk", "--llama-api=fake", "-p", "no:cacheprovider", "-q")
+
+
+@dataclass
+class ImportTime:
+    """The import time of one module, and the heavy stacks it loaded."""
+
+    module: str
+    seconds: float | None
+    budget: float
+    heavy: list
+    heavy_allowed: bool
+    error: str | None = None
+
+    @property
+    def violations(self):
+        if self.error:
+            return [f"{self.module} failed to import: {self.error}"]
+        problems = []
+        if self.seconds > self.budget:
+            problems.append(
+                f"{self.module} took {self.seconds:.3f}s to import, over its {self.budget}s budget"
+            )
+        if self.heavy and not self.heavy_allowed:
+            problems.append(f"{self.module} imports {', '.join(self.heavy)} at import time")
+        return problems
+
+
+def module_names(directory=TESTS, sdk_modules=()):
+    """Return conftest and the test modules in `directory`, those in `sdk_modules` last."""
+    names = sorted(path.stem for path in directory.glob("test_*.py"))
+    return ["conftest", *sorted(names, key=lambda name: f"{name}.py" in sdk_modules)]
+
+
+def measure(directory=TESTS, budget=DEFAULT_BUDGET):
+    """Import every module of module_names() in a fresh interpreter; return their ImportTimes."""
+    sys.path.insert(0, str(directory))
+    try:
+        from conftest import SDK_MODULES
+    finally:
+        sys.path.remove(str(directory))
+
+    modules = module_names(directory, SDK_MODULES)
+    process = subprocess.run(
+        [sys.executable, "-c", _MEASURE, json.dumps(modules), json.dumps(HEAVY_STACKS)],
+        cwd=directory,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        raise RuntimeError(f"measuring import times failed:\n{process.stderr}")
+    results = []
+    for line in process.stdout.splitlines():
+        measured = json.loads(line)
+        module = measured["module"]
+        results.append(
+            ImportTime(
+                module,
+                measured.get("seconds"),
+                BUDGETS.get(module, budget),
+                measured.get("heavy", []),
+                f"{module}.py" in SDK_MODULES,
+                measured.get("error"),
+            )
+        )
+    return results
+
+
+def sdk_free_run(args=(), directory=TESTS):
+    """Run the suite in `directory` with SDK_FREE_ARGS plus `args` in a fresh interpreter.
+
+    Return (pytest exit code, heavy stacks loaded, output).
+    """
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            _RUN,
+            json.dumps(HEAVY_STACKS),
+            *SDK_FREE_ARGS,
+            *args,
+            directory.name,
+        ],
+        cwd=directory.parent,
+        capture_output=True,
+        text=True,
+    )
+    prefix = "sdk-free run: "
+    results = [line for line in process.stdout.splitlines() if line.startswith(prefix)]
+    if not results:
+        raise RuntimeError(f"the sdk-free run failed:\n{process.stdout}\n{process.stderr}")
+    result = json.loads(results[-1][len(prefix) :])
+    return result["exit"], result["heavy"], process.stdout
+
+
+def format_report(results):
+    lines = [f"{'module':<30} {'seconds':>8} {'budget':>7}  heavy imports"]
+    for result in results:
+        seconds = "-" if result.seconds is None else f"{result.seconds:.3f}"
+        heavy = ", ".join(result.heavy) or "-"
+        flag = "  !" if result.violations else ""
+        lines.append(f"{result.module:<30} {seconds:>8} {result.budget:>7}  {heavy}{flag}")
+    total = sum(result.seconds or 0 for result in results)
+    lines.append(f"{'total':<30} {total:>8.3f}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--budget", type=float, default=DEFAULT_BUDGET, help="seconds per module without its own"
+    )
+    parser.add_argument(
+        "--run", action="store_true", help='also run the suite with -m "not sdk" and check it'
+    )
+    parser.add_argument("--json", metavar="PATH", help="also write the import times as JSON")
+    args = parser.parse_args(argv)
+
+    results = measure(TESTS, args.budget)
+    print(format_report(results))
+    violations = [problem for result in results for problem in result.violations]
+    if args.run:
+        code, heavy, _ = sdk_free_run()
+        print(f'-m "not sdk" run: pytest exit code {code}, loaded {", ".join(heavy) or "no SDK"}')
+        if heavy:
+            violations.append(f'-m "not sdk" run loaded {", ".join(heavy)}')
+    for problem in violations:
+        print(problem)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+    sys.exit(1 if violations else 0)
+
+
+if __name__ == "__main__":
+    main()
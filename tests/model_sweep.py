@@ -0,0 +1,296 @@
+"""
+Run the suite against several models at once and compare them in one report.
+
+Each model of --models gets its own pytest worker process with LLAMA_MODEL set to it, so
+every test, fixture and the LangChain class see that model; up to --workers of them run
+in parallel, never more than --max-concurrency. The workers share one rate-limit budget:
+--rate-limit and --max-concurrency (by default LLAMA_RATE_LIMIT and LLAMA_MAX_CONCURRENCY,
+as for the suite) are totals that are split evenly between the workers running at the
+same time, each passing its share to its own scheduler (rate limits apply per API key,
+which the workers share). The split is fixed when the sweep starts: once fewer models
+are left than --workers, the idle workers' shares go unused. Every request the suite
+sends goes through that scheduler except each worker's two preflight probes, which must
+see a 429 as it comes.
+
+Every worker writes a junit XML file and a --perf-history JSONL file to --output. From
+them the report gives, per model: passed, failed, errored and skipped tests, p50/p90
+latency, p50 TTFT and p50 tokens per second of the passing tests that got a 200, and
+lists the tests whose outcome differs between models. Arguments after `--` are passed to
+every worker, followed by the tests directory unless they name a test path themselves.
+The exit status is 1 when any model had a failing test, or when a worker produced no
+results or exited with anything but success or "no tests collected".
+
+Examples:
+    python tests/model_sweep.py --models Llama-3.3-8B-Instruct,Llama-3.3-70B-Instruct
+    python tests/model_sweep.py --models a,b,c --workers 3 --rate-limit 6 -- -m "not sdk"
+    python tests/model_sweep.py --fake --models a,b --json sweep.json -- tests/test_streaming.py
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from perf_history import load_history
+from stream_probe import percentile
+
+TESTS = Path(__file__).parent
+# Test outcomes, from least to most severe.
+OUTCOMES = ("skipped", "passed", "failed", "error")
+
+
+@dataclass
+class ModelRun:
+    """The outcome of one model's worker."""
+
+    model: str
+    returncode: int | None = None
+    duration: float = 0.0
+    # Test id -> outcome, one of OUTCOMES.
+    outcomes: dict = field(default_factory=dict)
+    records: list = field(default_factory=list)
+
+    def summary(self):
+        counts = dict.fromkeys(OUTCOMES, 0)
+        for outcome in self.outcomes.values():
+            counts[outcome] += 1
+
+        # Only successful completions: the quirk cases answered with a 400 on purpose, and
+        # failed or skipped tests, would make the percentiles compare outcome mixes. SDK
+        # tests make no raw request, so they have no status.
+        timed = [
+            record
+            for record in self.records
+            if record.get("outcome") == "passed" and record.get("status") in (200, None)
+        ]
+
+        def values(metric):
+            return [record[metric] for record in timed if record.get(metric) is not None]
+
+        return {
+            "model": self.model,
+            "returncode": self.returncode,
+            "duration": round(self.duration, 3),
+            **counts,
+            "latency_p50": percentile(values("latency"), 50),
+            "latency_p90": percentile(values("latency"), 90),
+            "ttft_p50": percentile(values("ttft"), 50),
+            "tokens_per_second_p50": percentile(values("tokens_per_second"), 50),
+        }
+
+
+def slug(model):
+    """Return a file name safe version of a model name."""
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+
+
+def split_budget(total, workers, minimum=None):
+    """Return one worker's share of a `total` budget split between `workers`."""
+    if total is None:
+        return None
+    share = total / max(1, workers)
+    return share if minimum is None else max(minimum, int(share))
+
+
+def read_junit(path):
+    """Return {test id: outcome} of a junit XML file."""
+    outcomes = {}
+    for case in ET.parse(path).getroot().iter("testcase"):
+        test = f"{case.get('classname')}::{case.get('name')}"
+        outcome = "passed"
+        for child in case:
+            if child.tag in ("failure", "error", "skipped"):
+                outcome = "failed" if child.tag == "failure" else child.tag
+                break
+        # A test erroring at teardown after it ran gets two entries; the worst one counts.
+        outcomes[test] = max(outcome, outcomes.get(test, outcome), key=OUTCOMES.index)
+    return outcomes
+
+
+def worker_command(model, output, pytest_args, rate_limit=None, max_concurrency=None):
+    """Return the pytest command line of one model's worker."""
+    command = [
+        sys.executable,
+        "-m",
+        "pytest",
+        "-p",
+        "no:cacheprovider",
+        "-q",
+        f"--junitxml={output / f'{slug(model)}.xml'}",
+        f"--perf-history={output / f'{slug(model)}.perf.jsonl'}",
+    ]
+    if rate_limit is not None:
+        command.append(f"--rate-limit={rate_limit}")
+    if max_concurrency is not None:
+        command.append(f"--max-concurrency={max_concurrency}")
+    pytest_args = list(pytest_args or [])
+    if not any(Path(arg.split("::")[0]).exists() for arg in pytest_args if arg[:1] != "-"):
+        pytest_args.append(str(TESTS))
+    return command + pytest_args
+
+
+def run_model(model, output, pytest_args, rate_limit=None, max_concurrency=None, env=None):
+    """Run the suite for `model` in a worker process and return its ModelRun."""
+    run = ModelRun(model)
+    for suffix in (".xml", ".perf.jsonl"):
+        (output / f"{slug(model)}{suffix}").unlink(missing_ok=True)
+    command = worker_command(model, output, pytest_args, rate_limit, max_concurrency)
+    started = time.perf_counter()
+    with open(output / f"{slug(model)}.log", "w", encoding="utf-8") as log:
+        run.returncode = subprocess.run(
+            command,
+            env={**(env or os.environ), "LLAMA_MODEL": model},
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        ).returncode
+    run.duration = time.perf_counter() - started
+    junit = output / f"{slug(model)}.xml"
+    if junit.exists():
+        run.outcomes = read_junit(junit)
+    history = output / f"{slug(model)}.perf.jsonl"
+    if history.exists():
+        run.records = load_history(history)
+    return run
+
+
+def worker_budget(models, workers=2, rate_limit=None, max_concurrency=None, env=None):
+    """Return (workers, rate limit, max concurrency) of each worker of a sweep.
+
+    The totals default to LLAMA_RATE_LIMIT and LLAMA_MAX_CONCURRENCY of `env`, like the
+    suite's own: left to themselves, every worker's scheduler would take all of them.
+    """
+    env = os.environ if env is None else env
+    if rate_limit is None and env.get("LLAMA_RATE_LIMIT"):
+        rate_limit = float(env["LLAMA_RATE_LIMIT"])
+    if max_concurrency is None:
+        max_concurrency = int(env.get("LLAMA_MAX_CONCURRENCY", 16))
+    # More workers than concurrency slots would have to share a slot they can't split.
+    workers = max(1, min(workers, len(models), max_concurrency))
+    return (
+        workers,
+        split_budget(rate_limit, workers),
+        split_budget(max_concurrency, workers, minimum=1),
+    )
+
+
+def run_sweep(
+    models, output, pytest_args=None, workers=2, rate_limit=None, max_concurrency=None, env=None
+):
+    """Run every model's worker, `workers` at a time; return their ModelRuns in order."""
+    output.mkdir(parents=True, exist_ok=True)
+    workers, rate, concurrency = worker_budget(models, workers, rate_limit, max_concurrency, env)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(
+                lambda model: run_model(model, output, pytest_args, rate, concurrency, env),
+                models,
+            )
+        )
+
+
+def differing_outcomes(runs):
+    """Return {test: {model: outcome}} for the tests whose outcome isn't the same everywhere."""
+    tests = dict.fromkeys(test for run in runs for test in run.outcomes)
+    differing = {}
+    for test in tests:
+        outcomes = {run.model: run.outcomes.get(test, "missing") for run in runs}
+        if len(set(outcomes.values())) > 1:
+            differing[test] = outcomes
+    return differing
+
+
+def format_report(runs):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    width = max([len(run.model) for run in runs] + [5])
+    lines = [
+        f"{'model':<{width}} {'passed':>6} {'failed':>6} {'error':>5} {'skipped':>7} "
+        f"{'p50 ms':>8} {'p90 ms':>8} {'ttft ms':>8} {'tok/s':>7} {'wall s':>7}"
+    ]
+    for run in runs:
+        s = run.summary()
+        tokens = "-" if s["tokens_per_second_p50"] is None else f"{s['tokens_per_second_p50']:.1f}"
+        lines.append(
+            f"{run.model:<{width}} {s['passed']:>6} {s['failed']:>6} {s['error']:>5} "
+            f"{s['skipped']:>7} {ms(s['latency_p50']):>8} {ms(s['latency_p90']):>8} "
+            f"{ms(s['ttft_p50']):>8} {tokens:>7} {s['duration']:>7.1f}"
+        )
+        if not run.outcomes:
+            lines.append(f"  no results, see {slug(run.model)}.log (exit code {run.returncode})")
+    differing = differing_outcomes(runs)
+    if differing:
+        lines.append("")
+        lines.append("tests whose outcome differs between models:")
+        for test, outcomes in differing.items():
+            lines.append(f"  {test}")
+            lines += [f"    {model}: {outcome}" for model, outcome in outcomes.items()]
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    pytest_args = None
+    if "--" in argv:
+        argv, pytest_args = argv[: argv.index("--")], argv[argv.index("--") + 1 :]
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--models", required=True, help="comma-separated models to compare")
+    parser.add_argument("--workers", type=int, default=2, help="models tested at once")
+    parser.add_argument(
+        "--rate-limit",
+        type=float,
+        help="requests per second for all workers (default: LLAMA_RATE_LIMIT)",
+    )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        help="requests in flight for all workers (default: LLAMA_MAX_CONCURRENCY or 16)",
+    )
+    parser.add_argument("--output", default="model-sweep", help="directory for worker results")
+    parser.add_argument("--fake", action="store_true", help="run the workers with --llama-api=fake")
+    parser.add_argument("--json", metavar="PATH", help="also write the per-model summary as JSON")
+    args = parser.parse_args(argv)
+
+    models = [model.strip() for model in args.models.split(",") if model.strip()]
+    if args.fake:
+        pytest_args = ["--llama-api=fake", *(pytest_args or [])]
+    runs = run_sweep(
+        models,
+        Path(args.output),
+        pytest_args,
+        args.workers,
+        args.rate_limit,
+        args.max_concurrency,
+    )
+
+    print(format_report(runs))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "models": [run.summary() for run in runs],
+                    "differing_outcomes": differing_outcomes(runs),
+                },
+                f,
+                indent=2,
+            )
+    failed = any(
+        run.summary()["failed"]
+        or run.summary()["error"]
+        or run.returncode not in (0, 5)
+        or not run.outcomes
+        for run in runs
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Per-request network timing breakdown, as a pytest plugin.
+
+Every HTTP request a test makes is split into phases:
+- dns: name resolution (socket.getaddrinfo on the requesting thread)
+- connect: the TCP handshake
+- tls: the TLS handshake
+- ttfb: from the request being sent to the response headers, the server's think time
+- transfer: from the response headers to the end of the body
+
+dns, connect and tls are None on a reused keep-alive connection. For async httpx clients,
+name resolution runs in an executor, so dns is folded into connect.
+
+requests is instrumented through urllib3 connection pool and connection subclasses
+(installed for every session while the plugin is active); httpx, which the OpenAI SDK and
+ChatOpenAI use, through TimedTransport/AsyncTimedTransport and httpcore's `trace` request
+extension; every httpx transport the suite builds is wrapped through conftest's
+timed_transport(). Requests sent over a bare httpcore pool, which only frame_analysis.py
+does (to count socket reads), are not timed. conftest.py registers the plugin with
+--network-timing: each test's requests
+are attached to its report as the `network_timing` user property (so they land in the
+junit XML), the slowest phases are listed at the end of the session and everything is
+written as JSON next to the --junitxml file, or to --network-timing-json.
+
+Examples:
+    pytest tests/ --network-timing --junitxml=results.xml
+    pytest tests/test_openai_streaming.py --network-timing --network-timing-json=timing.json
+"""
+
+import contextvars
+import json
+import socket
+import threading
+import time
+from dataclasses import dataclass, field
+
+import httpx
+import pytest
+import urllib3
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+PHASES = ("dns", "connect", "tls", "ttfb", "transfer")
+
+# The RequestTiming of the request being made in the current thread or task.
+_current = contextvars.ContextVar("network_timing", default=None)
+# Callables that receive every finished RequestTiming.
+_listeners = []
+_getaddrinfo = socket.getaddrinfo
+
+
+@dataclass
+class RequestTiming:
+    """Timestamps of one HTTP request, from perf_counter()."""
+
+    client: str
+    method: str
+    url: str
+    started: float = field(default_factory=time.perf_counter)
+    dns: float | None = None
+    connect_started: float | None = None
+    connected: float | None = None
+    tls_started: float | None = None
+    tls_done: float | None = None
+    sent: float | None = None
+    headers: float | None = None
+    done: float | None = None
+    error: str | None = None
+
+    def finish(self, error=None):
+        if self.done is not None:
+            return
+        self.done = time.perf_counter()
+        self.error = error
+        for listener in _listeners:
+            listener(self)
+
+    def phases(self):
+        """Return the phase durations in seconds, plus total and whether it reused a connection."""
+
+        def span(start, end):
+            return None if start is None or end is None else round(end - start, 6)
+
+        connect = span(self.connect_started, self.connected)
+        if connect is not None and self.dns is not None:
+            connect = round(max(0.0, connect - self.dns), 6)
+        return {
+            "dns": None if self.dns is None else round(self.dns, 6),
+            "connect": connect,
+            "tls": span(self.tls_started, self.tls_done),
+            "ttfb": span(self.sent or self.started, self.headers),
+            "transfer": span(self.headers, self.done),
+            "total": span(self.started, self.done),
+            "reused": self.connect_started is None,
+        }
+
+    def record(self):
+        return {
+            "client": self.client,
+            "method": self.method,
+            "url": self.url,
+            **self.phases(),
+            "error": self.error,
+        }
+
+    def trace(self, event, info):
+        """httpcore `trace` extension callback."""
+        now = time.perf_counter()
+        if event == "connection.connect_tcp.started":
+            self.connect_started = now
+        elif event == "connection.connect_tcp.complete":
+            self.connected = now
+        elif event == "connection.start_tls.started":
+            self.tls_started = now
+        elif event == "connection.start_tls.complete":
+            self.tls_done = now
+        elif event.endswith(".send_request_body.complete"):
+            self.sent = now
+        elif event.endswith(".receive_response_headers.complete"):
+            self.headers = now
+        elif event.endswith(".receive_response_body.complete"):
+            self.finish()
+        elif event.endswith(".response_closed.complete") or event.endswith(".failed"):
+            self.finish(type(info["exception"]).__name__ if "exception" in info else None)
+
+    async def atrace(self, event, info):
+        self.trace(event, info)
+
+
+def _timed_getaddrinfo(*args, **kwargs):
+    started = time.perf_counter()
+    try:
+        return _getaddrinfo(*args, **kwargs)
+    finally:
+        timing = _current.get()
+        if timing is not None:
+            timing.dns = (timing.dns or 0.0) + time.perf_counter() - started
+
+
+class _TimedConnection:
+    """Marks connect, sent and headers on the current RequestTiming of a urllib3 request."""
+
+    def _new_conn(self):
+        timing = _current.get()
+        if timing is not None:
+            timing.connect_started = time.perf_counter()
+        sock = super()._new_conn()
+        if timing is not None:
+            timing.connected = time.perf_counter()
+        return sock
+
+    def request(self, *args, **kwargs):
+        super().request(*args, **kwargs)
+        timing = _current.get()
+        if timing is not None:
+            timing.sent = time.perf_counter()
+
+    def getresponse(self):
+        response = super().getresponse()
+        timing = _current.get()
+        if timing is None:
+            return response
+        timing.headers = time.perf_counter()
+        release_conn = response.release_conn
+
+        def release_and_finish():
+            # urllib3 releases the connection once the body is read to the end or closed.
+            timing.finish()
+            release_conn()
+
+        response.release_conn = release_and_finish
+        return response
+
+
+class TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    def connect(self):
+        super().connect()
+        timing = _current.get()
+        if timing is not None and timing.connected is not None:
+            timing.tls_started, timing.tls_done = timing.connected, time.perf_counter()
+
+
+class _TimedPool:
+    def urlopen(self, method, url, *args, **kwargs):
+        timing = RequestTiming("requests", method, f"{self.scheme}://{self.host}:{self.port}{url}")
+        token = _current.set(timing)
+        try:
+            return super().urlopen(method, url, *args, **kwargs)
+        except Exception as e:
+            timing.finish(type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+
+
+class TimedHTTPConnectionPool(_TimedPool, HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(_TimedPool, HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+class TimedTransport(httpx.BaseTransport):
+    """httpx transport that times each request through httpcore's trace extension."""
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    def handle_request(self, request):
+        timing = RequestTiming("httpx", request.method, str(request.url))
+        request.extensions = {**request.extensions, "trace": timing.trace}
+        token = _current.set(timing)
+        try:
+            return self._transport.handle_request(request)
+        except httpx.HTTPError as e:
+            timing.finish(type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncTimedTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of TimedTransport."""
+
+    def __init__(self, transport):
+        self._transport = transport
+
+    async def handle_async_request(self, request):
+        timing = RequestTiming("httpx", request.method, str(request.url))
+        request.extensions = {**request.extensions, "trace": timing.atrace}
+        token = _current.set(timing)
+        try:
+            return await self._transport.handle_async_request(request)
+        except httpx.HTTPError as e:
+            timing.finish(type(e).__name__)
+            raise
+        finally:
+            _current.reset(token)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def slowest_phases(tests, top=10):
+    """Return the `top` (seconds, phase, test, record) across every request of every test."""
+    phases = [
+        (record[phase], phase, test, record)
+        for test, records in tests.items()
+        for record in records
+        for phase in PHASES
+        if record[phase] is not None
+    ]
+    return sorted(phases, key=lambda item: item[0], reverse=True)[:top]
+
+
+class NetworkTimingPlugin:
+    """Collects the RequestTimings of each test; see the module docstring."""
+
+    def __init__(self, path=None, top=10):
+        self.path = path
+        self.top = top
+        self.tests = {}
+        self._running = []
+        self._lock = threading.Lock()
+        self._saved = None
+
+    def install(self):
+        self._saved = dict(urllib3.poolmanager.pool_classes_by_scheme), socket.getaddrinfo
+        # PoolManagers share this dict, so existing requests sessions are covered too.
+        urllib3.poolmanager.pool_classes_by_scheme.update(
+            http=TimedHTTPConnectionPool, https=TimedHTTPSConnectionPool
+        )
+        socket.getaddrinfo = _timed_getaddrinfo
+        _listeners.append(self._finished)
+
+    def uninstall(self):
+        if self._saved is not None:
+            pools, socket.getaddrinfo = self._saved
+            urllib3.poolmanager.pool_classes_by_scheme.update(pools)
+            self._saved = None
+        if self._finished in _listeners:
+            _listeners.remove(self._finished)
+
+    def _finished(self, timing):
+        with self._lock:
+            self._running.append(timing.record())
+
+    def pytest_runtest_logstart(self, nodeid, location):
+        with self._lock:
+            self._running = []
+
+    @pytest.hookimpl(hookwrapper=True)
+    def pytest_runtest_makereport(self, item, call):
+        if call.when == "teardown":
+            with self._lock:
+                records, self._running = self._running, []
+            if records:
+                self.tests[item.nodeid] = records
+                item.user_properties.append(("network_timing", json.dumps(records)))
+        yield
+
+    def pytest_sessionfinish(self, session):
+        if self.path and self.tests:
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"phases": PHASES, "tests": self.tests}, f, indent=2)
+
+    def pytest_terminal_summary(self, terminalreporter):
+        records = [record for records in self.tests.values() for record in records]
+        if not records:
+            return
+        totals = ", ".join(
+            f"{phase} {sum(record[phase] or 0 for record in records):.2f}s" for phase in PHASES
+        )
+        reused = sum(record["reused"] for record in records)
+        terminalreporter.write_sep("-", "network timing")
+        terminalreporter.write_line(
+            f"{len(records)} requests in {len(self.tests)} tests ({reused} on reused "
+            f"connections); time by phase: {totals}"
+        )
+        for seconds, phase, test, record in slowest_phases(self.tests, self.top):
+            terminalreporter.write_line(
+                f"{seconds:8.3f}s {phase:<8} {test}  {record['method']} {record['url']}"
+            )
+        if self.path:
+            terminalreporter.write_line(f"network timing written to {self.path}")
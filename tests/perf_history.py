@@ -0,0 +1,282 @@
+"""
+Append-only performance history of test runs and regression detection against it.
+
+With --perf-history PATH (or LLAMA_PERF_HISTORY) every test that ran appends one compact
+record to a JSONL store: run id, mode, model, endpoint, outcome, HTTP status, latency
+and, for streaming tests, TTFT, frame counts, bytes and tokens per second.
+
+`compare` takes the latest run (or --run) and tests each metric against a rolling
+baseline of the previous --window runs. Tests send different workloads, so every value is
+first divided by its own test's baseline median (per status), and the ratios of all tests
+are pooled per mode and model: one run of the suite gives enough of them, where the
+values of any one test or endpoint would not. A one-sided Mann-Whitney U test then
+compares the run's ratios with the baseline's. A metric is flagged when the shift is both
+significant (p < --alpha) and large (median off by more than --min-change); the exit
+status is 1 when anything is flagged.
+
+Examples:
+    pytest tests/ --perf-history=perf-history.jsonl
+    python tests/perf_history.py compare perf-history.jsonl --window 14
+"""
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+
+# Metric name -> whether a higher value is better.
+METRICS = {"latency": False, "ttft": False, "gap_p90": False, "tokens_per_second": True}
+STREAM_FIELDS = ("ttft", "frames", "token_frames", "bytes", "gap_p90", "tokens_per_second")
+
+
+def new_run_id():
+    """Return an id shared by every record of this run: the CI run id, or a timestamp."""
+    return os.environ.get("GITHUB_RUN_ID") or time.strftime("%Y%m%dT%H%M%S")
+
+
+def build_record(run, mode, model, test, outcome, duration, exchanges, stream_metrics):
+    """Return the history record of one test.
+
+    `exchanges` are the (path, status, seconds) of the raw HTTP requests the test made and
+    `stream_metrics` its StreamProbe summary, if any. A streamed response's latency is the
+    time to the end of the stream; otherwise it is the sum of the request latencies.
+    """
+    record = {
+        "run": run,
+        "timestamp": round(time.time(), 3),
+        "mode": mode,
+        "model": model,
+        "test": test,
+        "outcome": outcome,
+        "duration": round(duration, 6),
+        "endpoint": None,
+        "status": None,
+        "requests": len(exchanges),
+        "latency": None,
+    }
+    if exchanges:
+        record["endpoint"] = exchanges[0][0]
+        record["status"] = exchanges[-1][1]
+        record["latency"] = round(sum(seconds for _, _, seconds in exchanges), 6)
+    if stream_metrics:
+        record["endpoint"] = stream_metrics["endpoint"]
+        record["latency"] = stream_metrics["total"]
+        record.update({field: stream_metrics.get(field) for field in STREAM_FIELDS})
+    return record
+
+
+def append_records(path, records):
+    with open(path, "a", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record) + "\n")
+
+
+def load_history(path):
+    """Return the records of a history file, skipping lines cut short by an aborted write."""
+    records = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+def mann_whitney_greater(sample, baseline):
+    """Return the one-sided p-value that `sample` tends to be larger than `baseline`.
+
+    Uses the normal approximation with tie correction, which is adequate from about
+    five values per side.
+    """
+    n1, n2 = len(sample), len(baseline)
+    ranked = sorted([(value, 0) for value in sample] + [(value, 1) for value in baseline])
+    ranks = [0.0] * len(ranked)
+    ties = 0.0
+    start = 0
+    while start < len(ranked):
+        end = start
+        while end + 1 < len(ranked) and ranked[end + 1][0] == ranked[start][0]:
+            end += 1
+        for i in range(start, end + 1):
+            ranks[i] = (start + end) / 2 + 1
+        count = end - start + 1
+        ties += count**3 - count
+        start = end + 1
+    u = sum(rank for rank, (_, side) in zip(ranks, ranked, strict=True) if side == 0)
+    u -= n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+@dataclass
+class Finding:
+    """How one metric of one mode and model compares with its baseline.
+
+    `change` is the shift of the median ratio of each value to its test's baseline median,
+    `worst_test` the test whose own median moved the most in the wrong direction.
+    """
+
+    mode: str
+    model: str
+    metric: str
+    change: float
+    p_value: float
+    samples: int
+    baseline_samples: int
+    tests: int
+    worst_test: str | None
+    worst_change: float
+    regression: bool
+
+
+def compare(records, run=None, window=14, alpha=0.01, min_change=0.1, min_samples=3, min_history=3):
+    """Compare a run with the previous `window` runs and return a Finding per metric.
+
+    Tests send different workloads, so their values can't be pooled as they are: each is
+    divided by the median of the same test, with the same status, over the baseline runs,
+    and those ratios are pooled per (mode, model, metric). Only passing tests count, tests
+    with fewer than `min_history` baseline values are left out, and metrics with fewer than
+    `min_samples` ratios on either side are not judged.
+    """
+    runs = list(dict.fromkeys(record["run"] for record in records))
+    if not runs:
+        return []
+    run = run or runs[-1]
+    if run not in runs:
+        raise ValueError(f"Run {run!r} is not in the history")
+    baseline_runs = set(runs[: runs.index(run)][-window:])
+
+    # (mode, model, metric, test, status) -> the test's values on each side.
+    values = {}
+    for record in records:
+        if record["outcome"] != "passed" or record.get("endpoint") is None:
+            continue
+        if record["run"] == run:
+            side = "current"
+        elif record["run"] in baseline_runs:
+            side = "baseline"
+        else:
+            continue
+        for metric in METRICS:
+            if record.get(metric) is not None:
+                key = (record["mode"], record["model"], metric)
+                key += (record.get("test"), record.get("status"))
+                test = values.setdefault(key, {"current": [], "baseline": []})
+                test[side].append(record[metric])
+
+    groups = {}
+    for (mode, model, metric, test, _), sides in values.items():
+        median = statistics.median(sides["baseline"]) if sides["baseline"] else 0
+        # Tests the run didn't get to don't skew the baseline either.
+        if not sides["current"] or len(sides["baseline"]) < min_history or not median:
+            continue
+        group = groups.setdefault(
+            (mode, model, metric), {"current": [], "baseline": [], "tests": {}}
+        )
+        for side in ("current", "baseline"):
+            group[side] += [value / median for value in sides[side]]
+        group["tests"][test] = statistics.median(sides["current"]) / median - 1
+
+    findings = []
+    for (mode, model, metric), group in sorted(groups.items()):
+        current, baseline = group["current"], group["baseline"]
+        if min(len(current), len(baseline)) < min_samples:
+            continue
+        higher_is_better = METRICS[metric]
+        if higher_is_better:
+            p_value = mann_whitney_greater(baseline, current)
+        else:
+            p_value = mann_whitney_greater(current, baseline)
+        change = statistics.median(current) / statistics.median(baseline) - 1
+        worse = -change if higher_is_better else change
+        tests = group["tests"]
+        worst = (min if higher_is_better else max)(tests, key=tests.get)
+        findings.append(
+            Finding(
+                mode,
+                model,
+                metric,
+                round(change, 4),
+                round(p_value, 6),
+                len(current),
+                len(baseline),
+                len(tests),
+                worst,
+                round(tests[worst], 4),
+                p_value < alpha and worse > min_change,
+            )
+        )
+    return findings
+
+
+def format_findings(findings):
+    lines = [
+        f"{'':2}{'mode':<7} {'model':<24} {'metric':<18} {'change':>8} {'p':>9} "
+        f"{'n':>4} {'tests':>5}  worst test"
+    ]
+    for finding in findings:
+        lines.append(
+            f"{'!!' if finding.regression else '':2}{finding.mode:<7} {finding.model:<24} "
+            f"{finding.metric:<18} {finding.change * 100:>7.1f}% {finding.p_value:>9.4f} "
+            f"{finding.samples:>4} {finding.tests:>5}  {finding.worst_test} "
+            f"({finding.worst_change * 100:+.1f}%)"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    subcommands = parser.add_subparsers(dest="command", required=True)
+    compare_parser = subcommands.add_parser("compare", help="flag regressions in a run")
+    compare_parser.add_argument("history", help="JSONL history written with --perf-history")
+    compare_parser.add_argument("--run", help="run id to check (default: the latest)")
+    compare_parser.add_argument("--window", type=int, default=14, help="baseline runs")
+    compare_parser.add_argument("--alpha", type=float, default=0.01, help="significance level")
+    compare_parser.add_argument(
+        "--min-change", type=float, default=0.1, help="smallest relative change to flag"
+    )
+    compare_parser.add_argument(
+        "--min-samples", type=int, default=3, help="values needed on each side"
+    )
+    compare_parser.add_argument(
+        "--min-history", type=int, default=3, help="baseline values a test needs to count"
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.history):
+        print(f"No history at {args.history} yet")
+        return 0
+    try:
+        findings = compare(
+            load_history(args.history),
+            run=args.run,
+            window=args.window,
+            alpha=args.alpha,
+            min_change=args.min_change,
+            min_samples=args.min_samples,
+            min_history=args.min_history,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    if not findings:
+        print("Not enough history to compare yet")
+        return 0
+    print(format_findings(findings))
+    regressions = [finding for finding in findings if finding.regression]
+    if regressions:
+        print(f"{len(regressions)} significant regression(s)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,193 @@
+"""
+Probe for server-side prompt-prefix caching.
+
+Two kinds of streamed requests are interleaved against one endpoint:
+- shared: the same long system prompt followed by a different short user question
+- randomized: a system prompt of the same length that is different for every request,
+  followed by the same kind of question
+
+If the server caches prompt prefixes, the shared requests skip most of the prefill and
+their TTFT drops below that of the randomized ones. The probe compares the two TTFT
+distributions with a one-sided Mann-Whitney U test (from perf_history.py) and reports the
+median speedup; caching counts as in effect when the difference is significant and at
+least `min_speedup`. A first shared request warms the cache up and is not counted.
+Cached token counts are picked up from the usage too, when the endpoint reports them.
+"""
+
+import json
+import random
+import statistics
+import uuid
+from dataclasses import dataclass, field
+
+import requests
+from perf_history import mann_whitney_greater
+from quirk_matrix import COMPAT
+from sse import iter_events
+from stream_probe import StreamProbe, frame_text
+
+WORDS = (
+    "policy account invoice refund shipment customer order warehouse region tier contract "
+    "renewal discount support ticket escalation priority agent schedule holiday weekend "
+    "currency tax address courier return damaged missing delayed express standard premium"
+).split()
+
+
+def system_prompt(tokens, seed):
+    """Return a deterministic system prompt of `tokens` words."""
+    rng = random.Random(seed)
+    return " ".join(rng.choices(WORDS, k=tokens))
+
+
+def question(index):
+    return f"Question {index}: in one word, which tier is mentioned first?"
+
+
+def shared_prefix_messages(tokens, index, salt):
+    """Return messages whose long system prefix is the same for every index."""
+    return [
+        {"role": "system", "content": system_prompt(tokens, f"{salt}:shared")},
+        {"role": "user", "content": question(index)},
+    ]
+
+
+def randomized_messages(tokens, index, salt):
+    """Return messages of the same size whose system prefix differs for every index."""
+    return [
+        {"role": "system", "content": system_prompt(tokens, f"{salt}:random:{index}")},
+        {"role": "user", "content": question(index)},
+    ]
+
+
+def cached_tokens(event):
+    """Return the cached prompt tokens a final chunk reports, None if it reports none."""
+    usage = event.get("usage") or {}
+    details = usage.get("prompt_tokens_details") or {}
+    if details.get("cached_tokens") is not None:
+        return details["cached_tokens"]
+    for metric in event.get("metrics") or (event.get("event") or {}).get("metrics") or []:
+        if "cache" in metric.get("metric", ""):
+            return metric.get("value")
+    return None
+
+
+@dataclass
+class PrefixCacheReport:
+    """TTFTs of the shared-prefix and randomized requests to one endpoint and model."""
+
+    endpoint: str
+    model: str
+    prefix_tokens: int
+    shared: list = field(default_factory=list)
+    randomized: list = field(default_factory=list)
+    # Cached prompt tokens reported for the shared-prefix requests.
+    cached: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    alpha: float = 0.01
+    min_speedup: float = 0.1
+
+    @property
+    def p_value(self):
+        if len(self.shared) < 2 or len(self.randomized) < 2:
+            return None
+        return mann_whitney_greater(self.randomized, self.shared)
+
+    @property
+    def speedup(self):
+        """Median TTFT saved by a shared prefix, as a fraction of the randomized median."""
+        if not self.shared or not self.randomized:
+            return None
+        return 1 - statistics.median(self.shared) / statistics.median(self.randomized)
+
+    @property
+    def in_effect(self):
+        if self.p_value is None:
+            return None
+        return self.p_value < self.alpha and self.speedup >= self.min_speedup
+
+    def summary(self):
+        def ms(values):
+            return round(statistics.median(values) * 1000, 1) if values else None
+
+        return {
+            "endpoint": self.endpoint,
+            "model": self.model,
+            "prefix_tokens": self.prefix_tokens,
+            "requests": len(self.shared) + len(self.randomized),
+            "shared_ttft_p50_ms": ms(self.shared),
+            "randomized_ttft_p50_ms": ms(self.randomized),
+            "speedup": None if self.speedup is None else round(self.speedup, 3),
+            "p_value": None if self.p_value is None else round(self.p_value, 4),
+            "in_effect": self.in_effect,
+            "cached_tokens": max(self.cached) if self.cached else None,
+            "errors": len(self.errors),
+        }
+
+    def describe(self):
+        s = self.summary()
+        if s["in_effect"] is None:
+            verdict = "inconclusive"
+        elif s["in_effect"]:
+            verdict = f"in effect, TTFT {s['speedup']:.0%} lower"
+        else:
+            verdict = "not detected"
+        cached = "" if s["cached_tokens"] is None else f", {s['cached_tokens']} tokens cached"
+        return (
+            f"prefix cache on {self.endpoint} ({self.model}): {verdict} "
+            f"(shared {s['shared_ttft_p50_ms']} ms vs randomized {s['randomized_ttft_p50_ms']} "
+            f"ms p50 over {s['requests']} requests, p={s['p_value']}{cached})"
+        )
+
+
+def time_to_first_token(session, url, headers, payload):
+    """Stream one request; return (TTFT in seconds, cached tokens or None)."""
+    probe = StreamProbe(url)
+    probe.start(url)
+    cached = None
+    with session.post(url, headers=headers, data=json.dumps(payload), stream=True) as response:
+        probe.headers()
+        response.raise_for_status()
+        for event in iter_events(response.iter_content(chunk_size=None)):
+            if event.is_done:
+                break
+            chunk = event.json()
+            probe.frame(frame_text(chunk))
+            cached = cached_tokens(chunk) if cached is None else cached
+    if probe.first_token_at is None:
+        raise ValueError("The stream carried no text")
+    return probe.first_token_at - probe.request_sent_at, cached
+
+
+def probe_prefix_cache(
+    session, base_url, headers, model, path, pairs=10, prefix_tokens=2000, salt=None
+):
+    """Interleave `pairs` shared-prefix and randomized requests; return the report.
+
+    `salt` keeps prompts from earlier runs, which the server may still have cached, out
+    of this one; a fresh one is picked by default.
+    """
+    salt = salt or uuid.uuid4().hex
+    url = f"{base_url}{path}"
+    headers = {**headers, "Content-Type": "application/json", "Accept": "text/event-stream"}
+    report = PrefixCacheReport("compat" if path == COMPAT else "native", model, prefix_tokens)
+
+    def send(messages):
+        payload = {"model": model, "messages": messages, "stream": True, "max_tokens": 1}
+        if path == COMPAT:
+            payload["stream_options"] = {"include_usage": True}
+        try:
+            return time_to_first_token(session, url, headers, payload)
+        except (requests.RequestException, ValueError) as e:
+            report.errors.append(f"{type(e).__name__}: {e}")
+            return None, None
+
+    send(shared_prefix_messages(prefix_tokens, 0, salt))  # warms the cache up
+    for index in range(1, pairs + 1):
+        kinds = [(report.shared, shared_prefix_messages), (report.randomized, randomized_messages)]
+        for sample, build in kinds if index % 2 else kinds[::-1]:
+            ttft, cached = send(build(prefix_tokens, index, salt))
+            if ttft is not None:
+                sample.append(ttft)
+            if cached is not None and sample is report.shared:
+                report.cached.append(cached)
+    return report
@@ -0,0 +1,127 @@
+"""
+Session-wide preflight check of the Llama API.
+
+Before the first test that talks to the API, one cheap request (a one-token, non-streamed
+completion) is sent to each endpoint, all at once, and its outcome kept as the endpoint's
+Verdict for the rest of the session. An endpoint is unusable when it rejects the API key
+(401/403), rejects the probe itself (any other 4xx but 429, e.g. an unknown model), is
+down (5xx) or can't be reached within the probe's timeout. A 429 counts as usable: the
+API is up, the rate-limit scheduler deals with it.
+
+conftest.py runs the preflight in the modes that send every request to the API (live and
+refresh) and fails, or with `--preflight=skip` skips, the tests that need an unusable
+endpoint with the probe's reason, so a bad key or an outage costs one round trip instead
+of one timeout per test.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import requests
+from benchmark import ENDPOINTS
+
+
+@dataclass
+class Verdict:
+    """The outcome of probing one endpoint; `problem` is None when it is usable."""
+
+    endpoint: str
+    status: int | None
+    elapsed: float
+    problem: str | None = None
+
+    @property
+    def ok(self):
+        return self.problem is None
+
+    def describe(self):
+        status = "no response" if self.status is None else f"HTTP {self.status}"
+        outcome = "ok" if self.ok else self.problem
+        return f"{self.endpoint}: {outcome} ({status} in {self.elapsed:.2f}s)"
+
+
+def classify(status, body=""):
+    """Return what a probe's status says is wrong with the endpoint, None if nothing is."""
+    if status < 400 or status == 429:
+        return None
+    detail = " ".join(body.split())[:200]
+    if status in (401, 403):
+        return f"API key rejected: {detail}"
+    if status < 500:
+        return f"probe request rejected: {detail}"
+    return f"API unavailable: {detail}"
+
+
+def probe(session, base_url, api_key, model, endpoint, timeout=15.0):
+    """Send the probe request to one endpoint and return its Verdict."""
+    started = time.perf_counter()
+    try:
+        response = session.post(
+            f"{base_url}{ENDPOINTS[endpoint]}",
+            headers={"Authorization": f"Bearer {api_key}"},
+            json={
+                "model": model,
+                "messages": [{"role": "user", "content": "Reply with one word."}],
+                "max_tokens": 1,
+            },
+            timeout=timeout,
+        )
+    except requests.RequestException as e:
+        return Verdict(
+            endpoint, None, time.perf_counter() - started, f"API unreachable: {type(e).__name__}"
+        )
+    elapsed = time.perf_counter() - started
+    return Verdict(
+        endpoint, response.status_code, elapsed, classify(response.status_code, response.text)
+    )
+
+
+class Preflight:
+    """Probes every endpoint once, on first use, and keeps the verdicts.
+
+    Args:
+        base_url: The API base URL.
+        api_key: The bearer token the tests use.
+        model: The model the tests use.
+        timeout: Seconds each probe may take.
+    """
+
+    def __init__(self, base_url, api_key, model, timeout=15.0):
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.timeout = timeout
+        self._verdicts = None
+        self._lock = threading.Lock()
+
+    @property
+    def ran(self):
+        return self._verdicts is not None
+
+    @property
+    def verdicts(self):
+        """Return {endpoint: Verdict}, probing the endpoints if not done yet."""
+        with self._lock:
+            if self._verdicts is None:
+                with requests.Session() as session, ThreadPoolExecutor(len(ENDPOINTS)) as pool:
+                    verdicts = pool.map(
+                        lambda endpoint: probe(
+                            session, self.base_url, self.api_key, self.model, endpoint, self.timeout
+                        ),
+                        ENDPOINTS,
+                    )
+                    self._verdicts = {verdict.endpoint: verdict for verdict in verdicts}
+        return self._verdicts
+
+    def problems(self, endpoints=tuple(ENDPOINTS)):
+        """Return the failed Verdicts among `endpoints`."""
+        return [self.verdicts[endpoint] for endpoint in endpoints if not self.verdicts[endpoint].ok]
+
+    def reason(self, endpoints=tuple(ENDPOINTS)):
+        """Return why tests needing `endpoints` can't run, or None if they can."""
+        problems = self.problems(endpoints)
+        if not problems:
+            return None
+        return "Llama API preflight failed: " + "; ".join(v.describe() for v in problems)
@@ -0,0 +1,191 @@
+"""
+Declarative matrix of the request quirks checked by the raw-HTTP tests.
+
+Each QuirkCase is one request (endpoint x stream flag x Accept x Content-Type) and the
+status and Content-Type it should get back. test_streaming.py and test_content_type_header.py
+are generated from this table, and test_streaming_concurrent.py fires the same cases
+concurrently. The basic requests of test_llama_api.py leave the stream flag unset, so they
+are not the same request as any case here and are sent on their own.
+
+send_case() sends a case's request and reads the response to the end, parsing SSE events
+as they arrive; check_response() holds the checks every case's response goes through.
+"""
+
+import json
+import time
+from dataclasses import dataclass, field
+
+from sse import SSEParser, validate_chunk
+from stream_probe import frame_text
+
+NATIVE = "/v1/chat/completions"
+COMPAT = "/compat/v1/chat/completions"
+SSE = "text/event-stream"
+JSON = "application/json"
+FORM = "application/x-www-form-urlencoded"
+
+
+@dataclass(frozen=True)
+class QuirkCase:
+    """One request of the matrix and the response it should get."""
+
+    name: str
+    path: str
+    stream: bool | None
+    accept: str | None
+    expected_status: int
+    expected_content_type: str | None = None
+    content_type: str = JSON
+    expect_error_body: bool = False
+
+    def request(self, api_base_url, auth_headers, model, messages):
+        """Return the (url, headers, body) to send for this case."""
+        payload = {"model": model, "messages": messages}
+        if self.stream is not None:
+            payload["stream"] = self.stream
+        headers = {**auth_headers, "Content-Type": self.content_type}
+        if self.accept:
+            headers["Accept"] = self.accept
+        return f"{api_base_url}{self.path}", headers, json.dumps(payload)
+
+
+STREAMING_CASES = [
+    QuirkCase("streaming_with_accept_header", NATIVE, True, SSE, 200, SSE),
+    QuirkCase("streaming_without_accept_header", NATIVE, True, None, 400),
+    QuirkCase("accept_header_without_streaming", NATIVE, None, SSE, 200, JSON),
+    QuirkCase("no_streaming_without_accept_header", NATIVE, False, None, 200, JSON),
+    QuirkCase("compat_streaming_with_accept_header", COMPAT, True, SSE, 200, SSE),
+    QuirkCase("compat_streaming_without_accept_header", COMPAT, True, None, 400),
+    QuirkCase("compat_accept_header_without_streaming", COMPAT, False, SSE, 200, JSON),
+    QuirkCase("compat_no_streaming_without_accept_header", COMPAT, False, None, 200, JSON),
+]
+
+CONTENT_TYPE_CASES = [
+    QuirkCase("form_urlencoded_content_type_error", NATIVE, None, None, 400, None, FORM, True),
+    QuirkCase(
+        "compat_form_urlencoded_content_type_error", COMPAT, None, None, 400, None, FORM, True
+    ),
+]
+
+QUIRK_MATRIX = {case.name: case for case in STREAMING_CASES + CONTENT_TYPE_CASES}
+
+
+@dataclass
+class CaseResponse:
+    """A response read to the end, with its SSE events parsed if it streamed."""
+
+    status_code: int
+    content_type: str
+    body: bytes
+    events: list = field(default_factory=list)
+    pending_bytes: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def text(self):
+        return self.body.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def read_response(status_code, headers, chunks, probe=None):
+    """Build a CaseResponse from a status, headers and the body's byte chunks.
+
+    SSE bodies are parsed as they arrive and, with a StreamProbe, every event is timed.
+    """
+    content_type = headers.get("Content-Type", "").split(";")[0]
+    if probe is not None:
+        probe.headers()
+    if content_type != SSE:
+        body = b"".join(chunks)
+        if probe is not None:
+            probe.done()
+        return CaseResponse(status_code, content_type, body)
+
+    parser = SSEParser()
+    body = bytearray()
+    events = []
+    for chunk in chunks:
+        body += chunk
+        for event in parser.feed(chunk):
+            events.append(event)
+            if probe is None:
+                continue
+            if event.is_done:
+                probe.done()
+                continue
+            try:
+                probe.frame(frame_text(event.json()), event.size)
+            except json.JSONDecodeError:
+                probe.frame(None, event.size)
+    if probe is not None:
+        probe.done()
+    return CaseResponse(status_code, content_type, bytes(body), events, parser.pending_bytes)
+
+
+def send_case(session, case, api_base_url, auth_headers, model, messages, probe=None):
+    """Send a case's request over a requests session and return its CaseResponse.
+
+    The probe, if given, times the request and, for a stream, every event.
+    """
+    url, headers, body = case.request(api_base_url, auth_headers, model, messages)
+    if probe is not None:
+        probe.start(url)
+    started = time.perf_counter()
+    with session.post(url, headers=headers, data=body, stream=True) as response:
+        result = read_response(
+            response.status_code, response.headers, response.iter_content(chunk_size=None), probe
+        )
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+def check_response(case, response):
+    """Return the list of expectation failures of a case's response."""
+    errors = []
+    if response.status_code != case.expected_status:
+        errors.append(
+            f"Expected status code {case.expected_status}, got {response.status_code} "
+            f"in {response.text}"
+        )
+    if case.expect_error_body:
+        try:
+            body = response.json()
+        except json.JSONDecodeError:
+            body = None
+        if not isinstance(body, dict) or ("error" not in body and "title" not in body):
+            errors.append(f"Response should contain error information, got {response.text}")
+    if case.expected_content_type is None:
+        return errors
+    if response.content_type != case.expected_content_type:
+        errors.append(
+            f"Expected '{case.expected_content_type}' Content-Type, got {response.content_type}"
+        )
+    if case.expected_content_type == SSE:
+        errors += check_events(response)
+    else:
+        try:
+            response.json()
+        except json.JSONDecodeError:
+            errors.append("Failed to parse response as JSON")
+    return errors
+
+
+def check_events(response):
+    """Return the SSE framing and chunk schema errors of a streamed response."""
+    errors = []
+    for number, event in enumerate(response.events, 1):
+        if event.is_done:
+            continue
+        try:
+            chunk = event.json()
+        except json.JSONDecodeError:
+            errors.append(f"Chunk #{number} doesn't carry JSON data: {event}")
+            continue
+        errors += [f"Chunk #{number}: {error}" for error in validate_chunk(chunk)]
+    if response.pending_bytes:
+        errors.append(f"Stream ended with {response.pending_bytes} bytes of an incomplete event")
+    if not response.events:
+        errors.append("No streaming chunks received")
+    return errors
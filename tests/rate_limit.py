@@ -0,0 +1,293 @@
+"""
+Rate-limit-aware scheduling of API requests, shared by every HTTP client of the suite.
+
+A RequestScheduler keeps one Throttle per (API key, endpoint). A Throttle combines:
+- a token bucket, so requests go out at no more than `rate` per second (with bursts of
+  up to `burst`), when a rate is configured;
+- an adaptive concurrency limit that halves on every 429/503 and grows back by one
+  request per window of successes (AIMD);
+- a pause until the Retry-After of the last 429/503 (seconds or HTTP date), or an
+  exponential backoff when the response doesn't say.
+
+A slot is held until the response headers arrive. Rate-limited responses are retried up
+to `max_retries` times; the scheduler counts requests, retries, 429/503 responses and
+the seconds spent waiting for any of the above.
+
+It plugs into the clients as transports: ScheduledAdapter for requests sessions,
+ScheduledTransport and AsyncScheduledTransport for the httpx clients behind the OpenAI
+SDK and ChatOpenAI, ScheduledConnectionPool for the raw httpcore requests of
+frame_analysis.py. All of them share the retry loop of RequestScheduler.send(). The wait
+is computed without holding a lock, so the same scheduler serves threads and asyncio
+tasks.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import httpcore
+import httpx
+import requests
+
+RATE_LIMITED_STATUSES = (429, 503)
+
+# How long to wait before checking again for a free concurrency slot.
+SLOT_POLL_INTERVAL = 0.01
+
+
+def parse_retry_after(value, now=None):
+    """Return the seconds to wait from a Retry-After header value, or None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = time.time() if now is None else now
+    return max(0.0, moment.timestamp() - now)
+
+
+def response_outcome(response):
+    """Return the status and Retry-After header of a requests or httpx response."""
+    return response.status_code, response.headers.get("Retry-After")
+
+
+class Throttle:
+    """Pacing and concurrency state for one API key and endpoint.
+
+    Args:
+        rate: Requests per second, None for no pacing.
+        burst: Requests that may go out back to back before pacing kicks in.
+        max_concurrency: Upper bound of the adaptive concurrency limit.
+        backoff: First pause after a 429/503 without Retry-After; doubles each time.
+    """
+
+    def __init__(self, rate=None, burst=1, max_concurrency=16, backoff=1.0):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_concurrency = max_concurrency
+        self.backoff = backoff
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._paused_until = 0.0
+        self._consecutive_limited = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        """Take a slot and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= int(self.limit):
+                return SLOT_POLL_INTERVAL
+            if self.rate is not None:
+                self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+                self._refilled_at = now
+                if self._tokens < 1:
+                    return (1 - self._tokens) / self.rate
+                self._tokens -= 1
+            self.in_flight += 1
+            return 0.0
+
+    def release(self, status, retry_after=None):
+        """Give the slot back and adapt to the response status (None: no response)."""
+        with self._lock:
+            self.in_flight -= 1
+            if status is None:
+                return
+            if status in RATE_LIMITED_STATUSES:
+                self.limit = max(1.0, self.limit / 2)
+                if retry_after is None:
+                    retry_after = self.backoff * 2**self._consecutive_limited
+                self._consecutive_limited += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            else:
+                self._consecutive_limited = 0
+                self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+
+
+class RequestScheduler:
+    """Hands out a Throttle per (API key, endpoint) and keeps the throttling metrics.
+
+    Args:
+        rate: Requests per second per API key and endpoint, None for no pacing.
+        burst: Token bucket size.
+        max_concurrency: Requests in flight per API key and endpoint.
+        max_retries: Times a 429/503 response is retried before it is returned.
+        backoff: First pause after a 429/503 without Retry-After, in seconds.
+    """
+
+    def __init__(self, rate=None, burst=1, max_concurrency=16, max_retries=3, backoff=1.0):
+        self.rate = rate
+        self.burst = burst
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.throttled_seconds = 0.0
+        self._throttles = {}
+        self._lock = threading.Lock()
+
+    def throttle(self, authorization, url):
+        # The key is only ever kept hashed.
+        key = hashlib.sha256((authorization or "").encode()).hexdigest()[:12]
+        endpoint = urlsplit(str(url)).path
+        with self._lock:
+            if (key, endpoint) not in self._throttles:
+                self._throttles[key, endpoint] = Throttle(
+                    self.rate, self.burst, self.max_concurrency, self.backoff
+                )
+            return self._throttles[key, endpoint]
+
+    def waited(self, seconds):
+        with self._lock:
+            self.throttled_seconds += seconds
+
+    def finished(self, throttle, status, retry_after_header, attempt):
+        """Release a slot; return whether the request should be sent again."""
+        limited = status in RATE_LIMITED_STATUSES
+        throttle.release(status, parse_retry_after(retry_after_header))
+        with self._lock:
+            self.requests += 1
+            self.rate_limited += limited
+            retry = limited and attempt < self.max_retries
+            self.retries += retry
+        return retry
+
+    def summary(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+    def acquire(self, throttle):
+        while (delay := throttle.try_acquire()) > 0:
+            self.waited(delay)
+            time.sleep(delay)
+
+    async def acquire_async(self, throttle):
+        while (delay := throttle.try_acquire()) > 0:
+            self.waited(delay)
+            await asyncio.sleep(delay)
+
+    def send(self, authorization, url, attempt, outcome=response_outcome):
+        """Call attempt() through the throttle of the key and URL, retrying 429/503s.
+
+        `outcome` returns the status and Retry-After header of what attempt() returned.
+        """
+        throttle = self.throttle(authorization, url)
+        for number in range(self.max_retries + 1):
+            self.acquire(throttle)
+            try:
+                response = attempt()
+            except Exception:
+                throttle.release(None)
+                raise
+            if not self.finished(throttle, *outcome(response), number):
+                return response
+            response.close()
+        return response
+
+    async def send_async(self, authorization, url, attempt):
+        """Async counterpart of send(), for httpx responses."""
+        throttle = self.throttle(authorization, url)
+        for number in range(self.max_retries + 1):
+            await self.acquire_async(throttle)
+            try:
+                response = await attempt()
+            except BaseException:
+                throttle.release(None)
+                raise
+            if not self.finished(throttle, *response_outcome(response), number):
+                return response
+            await response.aclose()
+        return response
+
+
+class ScheduledAdapter(requests.adapters.HTTPAdapter):
+    """requests transport adapter that sends through a RequestScheduler."""
+
+    def __init__(self, scheduler, **kwargs):
+        self.scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        return self.scheduler.send(
+            request.headers.get("Authorization"),
+            request.url,
+            lambda: super(ScheduledAdapter, self).send(request, **kwargs),
+        )
+
+
+class ScheduledTransport(httpx.BaseTransport):
+    """httpx transport that sends through a RequestScheduler, wrapping another transport."""
+
+    def __init__(self, scheduler, transport):
+        self.scheduler = scheduler
+        self.transport = transport
+
+    def handle_request(self, request):
+        return self.scheduler.send(
+            request.headers.get("Authorization"),
+            request.url,
+            lambda: self.transport.handle_request(request),
+        )
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncScheduledTransport(httpx.AsyncBaseTransport):
+    """Async counterpart of ScheduledTransport."""
+
+    def __init__(self, scheduler, transport):
+        self.scheduler = scheduler
+        self.transport = transport
+
+    async def handle_async_request(self, request):
+        return await self.scheduler.send_async(
+            request.headers.get("Authorization"),
+            request.url,
+            lambda: self.transport.handle_async_request(request),
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def httpcore_outcome(response):
+    """Return the status and Retry-After header of an httpcore response."""
+    headers = {name.lower(): value for name, value in response.headers}
+    retry_after = headers.get(b"retry-after")
+    return response.status, None if retry_after is None else retry_after.decode()
+
+
+class ScheduledConnectionPool(httpcore.ConnectionPool):
+    """httpcore connection pool that sends through a RequestScheduler, when given one."""
+
+    def __init__(self, scheduler=None, **kwargs):
+        self.scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def handle_request(self, request):
+        if self.scheduler is None:
+            return super().handle_request(request)
+        return self.scheduler.send(
+            dict(request.headers).get(b"Authorization", b"").decode(),
+            bytes(request.url).decode(),
+            lambda: super(ScheduledConnectionPool, self).handle_request(request),
+            httpcore_outcome,
+        )
@@ -0,0 +1,213 @@
+"""
+Incremental Server-Sent Events parser and chat completion chunk validation.
+
+SSEParser is fed raw byte chunks as they come off the socket (e.g. from
+`response.iter_content(chunk_size=None)`) and returns complete events. Events are split
+and fields matched on bytes in a single bytearray buffer; only an event's data is
+decoded, once, when the event is dispatched. It handles `data` (including multi-line
+data), `event`, `id` and `retry` fields and `:` comment heartbeats, with LF or CRLF
+line endings, following https://html.spec.whatwg.org/multipage/server-sent-events.html.
+
+validate_chunk() checks a decoded data payload against the native (`event`) or the
+compat (`chat.completion.chunk`) streaming chunk shape.
+"""
+
+import json
+from dataclasses import dataclass
+
+NATIVE_EVENT_TYPES = {"start", "progress", "complete", "metrics"}
+
+
+@dataclass(slots=True)
+class SSEEvent:
+    """One dispatched event.
+
+    `size` is the number of raw bytes the event took on the wire, including its field
+    names, line endings and any comment lines received since the previous event.
+    """
+
+    data: str
+    type: str = "message"
+    id: str | None = None
+    retry: int | None = None
+    size: int = 0
+    comments: int = 0
+
+    @property
+    def is_done(self):
+        return self.data == "[DONE]"
+
+    def json(self):
+        return json.loads(self.data)
+
+
+class SSEParser:
+    """Turns a stream of byte chunks into SSEEvents, however the chunks are split."""
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._last_id = None
+        self.events = 0
+        self.comments = 0
+        self.bytes_fed = 0
+        self._reset_event()
+
+    def _reset_event(self):
+        self._data = []
+        self._type = None
+        self._retry = None
+        self._size = 0
+        # Bytes of _size ended by a blank line: comments and empty events, not truncation.
+        self._settled = 0
+        self._comments = 0
+
+    @property
+    def pending_bytes(self):
+        """Bytes received after the last complete event; non-zero at EOF means truncation."""
+        return len(self._buffer) + self._size - self._settled
+
+    def feed(self, chunk):
+        """Consume a chunk of bytes and return the events it completed."""
+        self.bytes_fed += len(chunk)
+        self._buffer += chunk
+        if b"\r" in self._buffer:
+            return self._feed_lines()
+        buffer = self._buffer
+        end = buffer.rfind(b"\n\n")
+        if end == -1:
+            return []
+        # Split whole events with one C-level split; the usual single `data:` line event
+        # then needs no per-line work at all.
+        blocks = buffer[:end].split(b"\n\n")
+        del buffer[: end + 2]
+        events = []
+        for block in blocks:
+            self._size += len(block) + 2
+            if block.startswith(b"data: ") and b"\n" not in block:
+                self._data.append(block[6:])
+            else:
+                for line in block.split(b"\n"):
+                    if line:
+                        self._field(line)
+                    elif (event := self._dispatch()) is not None:
+                        events.append(event)
+            if (event := self._dispatch()) is not None:
+                events.append(event)
+        return events
+
+    def _feed_lines(self):
+        # Line by line, for streams using CRLF (or mixed) line endings.
+        buffer = self._buffer
+        last_newline = buffer.rfind(b"\n")
+        if last_newline == -1:
+            return []
+        lines = buffer[:last_newline].split(b"\n")
+        del buffer[: last_newline + 1]
+        events = []
+        for line in lines:
+            self._size += len(line) + 1
+            if line.endswith(b"\r"):
+                line = line[:-1]
+            if line:
+                self._field(line)
+            elif (event := self._dispatch()) is not None:
+                events.append(event)
+        return events
+
+    def _field(self, line):
+        if line.startswith(b":"):  # a comment, used as a heartbeat
+            self._comments += 1
+            self.comments += 1
+            return
+        name, colon, value = line.partition(b":")
+        if colon and value.startswith(b" "):
+            value = value[1:]
+        if name == b"data":
+            self._data.append(value)
+        elif name == b"event":
+            self._type = value.decode("utf-8")
+        elif name == b"id":
+            self._last_id = value.decode("utf-8")
+        elif name == b"retry" and value.isdigit():
+            self._retry = int(value)
+
+    def _dispatch(self):
+        if not self._data:
+            # Blank line after nothing but comments or fields without data: per the spec
+            # nothing is dispatched and the event type is dropped. The bytes still count
+            # towards the next event's size, but they aren't pending.
+            self._type = None
+            self._settled = self._size
+            return None
+        event = SSEEvent(
+            b"\n".join(self._data).decode("utf-8"),
+            self._type or "message",
+            self._last_id,
+            self._retry,
+            self._size,
+            self._comments,
+        )
+        self.events += 1
+        self._reset_event()
+        return event
+
+
+def iter_events(chunks, parser=None):
+    """Yield the SSEEvents of an iterable of byte chunks."""
+    parser = parser or SSEParser()
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+
+
+def _validate_native(payload):
+    event = payload.get("event")
+    if not isinstance(event, dict):
+        return ["'event' should be an object"]
+    errors = []
+    event_type = event.get("event_type")
+    if event_type not in NATIVE_EVENT_TYPES:
+        errors.append(f"Unknown event_type {event_type!r}")
+    delta = event.get("delta")
+    if delta is not None:
+        if not isinstance(delta, dict) or "type" not in delta:
+            errors.append(f"'delta' should be an object with a 'type', got {delta!r}")
+        elif delta["type"] == "text" and not isinstance(delta.get("text"), str):
+            errors.append("Text delta should carry a 'text' string")
+    elif event_type == "progress":
+        errors.append("'progress' event without a delta")
+    if event_type == "metrics" and not isinstance(event.get("metrics"), list):
+        errors.append("'metrics' event should carry a 'metrics' list")
+    return errors
+
+
+def _validate_compat(payload):
+    errors = []
+    if payload.get("object") != "chat.completion.chunk":
+        errors.append(f"'object' should be 'chat.completion.chunk', got {payload.get('object')!r}")
+    choices = payload.get("choices")
+    if not isinstance(choices, list):
+        return errors + ["'choices' should be a list"]
+    if not choices and not isinstance(payload.get("usage"), dict):
+        errors.append("Chunk with empty 'choices' should carry 'usage'")
+    for choice in choices:
+        if not isinstance(choice.get("index"), int):
+            errors.append("Choice should have an integer 'index'")
+        delta = choice.get("delta")
+        if not isinstance(delta, dict):
+            errors.append("Choice should contain a 'delta' object")
+        elif not isinstance(delta.get("content", ""), str | None):
+            errors.append(f"Delta content should be a string, got {delta['content']!r}")
+        if not isinstance(choice.get("finish_reason"), str | None):
+            errors.append(f"Unexpected finish_reason {choice.get('finish_reason')!r}")
+    return errors
+
+
+def validate_chunk(payload):
+    """Return the schema violations of a decoded streaming chunk, in either format."""
+    if not isinstance(payload, dict):
+        return [f"Chunk should be a JSON object, got {type(payload).__name__}"]
+    if "choices" in payload or payload.get("object") == "chat.completion.chunk":
+        return _validate_compat(payload)
+    if "event" in payload:
+        return _validate_native(payload)
+    return [f"Chunk matches neither the native nor the compat format: {payload}"]
@@ -0,0 +1,135 @@
+"""
+Micro-benchmark: SSEParser vs `requests.Response.iter_lines(decode_unicode=True)`.
+
+The input is a large stream recorded from the offline stand-in (or every SSE response in
+a cassette, with --cassette), replayed from memory with its original chunk boundaries so
+only parsing is measured. Each method is timed framing only and framing + JSON decoding
+of every data payload, the way the streaming tests consume them.
+
+Examples:
+    python tests/sse_benchmark.py --tokens 50000
+    python tests/sse_benchmark.py --cassette tests/cassettes/llama_api.jsonl
+"""
+
+import argparse
+import json
+import time
+
+import requests
+from fake_llama_api import COMPAT_PATH, NATIVE_PATH, FakeLlamaAPI
+from sse import SSEParser
+
+
+def record_stream(path, tokens):
+    """Return the byte chunks of a streamed completion of `tokens` tokens from the stand-in."""
+    with FakeLlamaAPI() as server:
+        response = requests.post(
+            f"{server.base_url}{path}",
+            headers={
+                "Authorization": f"Bearer {server.api_key}",
+                "Content-Type": "application/json",
+                "Accept": "text/event-stream",
+            },
+            json={
+                "model": "benchmark",
+                "messages": [{"role": "user", "content": "Tell me a long story."}],
+                "stream": True,
+                "max_tokens": tokens,
+            },
+            stream=True,
+        )
+        return list(response.iter_content(chunk_size=None))
+
+
+def cassette_streams(path):
+    """Return the chunk lists of every recorded SSE response in a cassette file."""
+    streams = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            response = json.loads(line)["response"]
+            if response["content_type"].startswith("text/event-stream"):
+                streams.append([
+                    text.encode("utf-8", "surrogateescape") for _, text in response["chunks"]
+                ])
+    return streams
+
+
+class RecordedRaw:
+    """Stands in for urllib3's response so iter_content() sees the recorded chunks."""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def stream(self, chunk_size, decode_content=True):
+        yield from self.chunks
+
+
+def with_iter_lines(chunks, decode_json):
+    response = requests.Response()
+    response.raw = RecordedRaw(chunks)
+    response.encoding = "utf-8"
+    events = 0
+    for line in response.iter_lines(decode_unicode=True):
+        if line.startswith("data: "):
+            events += 1
+            data = line[len("data: ") :]
+            if decode_json and data != "[DONE]":
+                json.loads(data)
+    return events
+
+
+def with_sse_parser(chunks, decode_json):
+    parser = SSEParser()
+    events = 0
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            events += 1
+            if decode_json and not event.is_done:
+                event.json()
+    return events
+
+
+METHODS = {"iter_lines": with_iter_lines, "SSEParser": with_sse_parser}
+
+
+def run(streams, repeats=5):
+    """Time every method on `streams`; return {(method, decode_json): (seconds, events)}."""
+    results = {}
+    for decode_json in (False, True):
+        for name, method in METHODS.items():
+            best = float("inf")
+            for _ in range(repeats):
+                started = time.perf_counter()
+                events = sum(method(chunks, decode_json) for chunks in streams)
+                best = min(best, time.perf_counter() - started)
+            results[name, decode_json] = (best, events)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--tokens", type=int, default=20000, help="tokens per recorded stream")
+    parser.add_argument("--cassette", help="benchmark the SSE responses of this cassette")
+    parser.add_argument("--repeats", type=int, default=5, help="best of N runs")
+    args = parser.parse_args()
+
+    if args.cassette:
+        streams = cassette_streams(args.cassette)
+    else:
+        streams = [record_stream(path, args.tokens) for path in (NATIVE_PATH, COMPAT_PATH)]
+    total_bytes = sum(len(chunk) for chunks in streams for chunk in chunks)
+    total_chunks = sum(len(chunks) for chunks in streams)
+    print(f"{len(streams)} streams, {total_bytes / 1e6:.1f} MB in {total_chunks} chunks")
+
+    for (name, decode_json), (seconds, events) in run(streams, args.repeats).items():
+        mode = "framing + JSON" if decode_json else "framing only"
+        print(
+            f"{name:<11} {mode:<15} {total_bytes / seconds / 1e6:8.1f} MB/s "
+            f"{events / seconds:12,.0f} events/s ({events} events)"
+        )
+
+
+if __name__ == "__main__":
+    main()
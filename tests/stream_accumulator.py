@@ -0,0 +1,90 @@
+"""
+Memory-bounded accumulation of streamed completion text.
+
+`text += delta` copies everything received so far on every chunk, which is quadratic for
+long generations. StreamAccumulator keeps the deltas in a list and joins them once; with
+`max_memory` set, whatever is buffered is spilled to a temporary file whenever it grows
+past that many bytes, so a generation of any length holds at most `max_memory` in memory.
+Running chunk, token and byte counts are kept either way.
+"""
+
+import tempfile
+
+
+class StreamAccumulator:
+    """Collects streamed text deltas.
+
+    Args:
+        max_memory: Bytes of text kept in memory before spilling to disk, None to never
+            spill.
+        spill_dir: Directory for the spill file (default: the system temp directory).
+    """
+
+    def __init__(self, max_memory=None, spill_dir=None):
+        self.max_memory = max_memory
+        self.spill_dir = spill_dir
+        self.chunks = 0
+        self.tokens = 0
+        self.bytes = 0
+        self._buffer = []
+        self._buffered = 0
+        self._spill = None
+
+    @property
+    def spilled(self):
+        return self._spill is not None
+
+    def append(self, text):
+        """Add one delta; empty or None deltas count as chunks without text."""
+        self.chunks += 1
+        if not text:
+            return
+        size = len(text.encode("utf-8"))
+        self.tokens += 1
+        self.bytes += size
+        self._buffer.append(text)
+        self._buffered += size
+        if self.max_memory is not None and self._buffered > self.max_memory:
+            self._flush()
+
+    def _flush(self):
+        if self._spill is None:
+            self._spill = tempfile.TemporaryFile(
+                "w+", encoding="utf-8", dir=self.spill_dir, prefix="stream-"
+            )
+        self._spill.write("".join(self._buffer))
+        self._buffer.clear()
+        self._buffered = 0
+
+    def text(self):
+        """Return everything received. Reads a spilled stream back into memory."""
+        if self._spill is None:
+            return "".join(self._buffer)
+        self._spill.seek(0)
+        spilled = self._spill.read()
+        self._spill.seek(0, 2)
+        return spilled + "".join(self._buffer)
+
+    def preview(self, limit=50):
+        """Return the first `limit` characters, without reading a spilled stream back."""
+        if self._spill is None:
+            head = "".join(self._buffer)
+        else:
+            self._spill.seek(0)
+            # One character past the limit tells whether there is more to elide
+            head = self._spill.read(limit + 1)
+            self._spill.seek(0, 2)
+            head += "".join(self._buffer)
+        return head[:limit] + ("..." if len(head) > limit else "")
+
+    def close(self):
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._buffer.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
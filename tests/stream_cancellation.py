@@ -0,0 +1,463 @@
+"""
+Early stream cancellation: does abandoning a stream free its connection and stop the server?
+
+Each client path opens a long streamed completion, reads --frames text frames and then
+closes the stream the way an application would:
+- requests: Response.close() on a keep-alive session, as the raw-HTTP tests stream
+- openai: Stream.close() on `chat.completions.create(stream=True)`
+- langchain: closing the `ChatOpenAI.stream()` generator, which is what `break` does
+
+or, with --drop, by just dropping it unclosed, as code that stops reading does. It then
+measures
+- close: how long the abort call took
+- release: time from the abort until the client's pool has no connection in use, None
+  if the connection is still pinned after --release-timeout
+- follow_up: latency of a short request on the same client afterwards, and whether it
+  went over a pooled connection or had to open a new one
+- against the stand-in (--fake), server_stop: time from the abort until the server
+  stopped writing, and how many frames it wrote after the client stopped reading
+
+The OpenAI SDK and ChatOpenAI only speak the compat endpoint. Given a RequestScheduler, as
+the tests pass in the suite's, every client sends through it; the tests also pass
+conftest's timed_transport() as `wrap_transport` for the httpx clients.
+
+Examples:
+    python tests/stream_cancellation.py --fake --frames 5 --trials 20
+    python tests/stream_cancellation.py --fake --drop
+    python tests/stream_cancellation.py --client requests --endpoint native --max-tokens 2000
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+
+import httpx
+import requests
+from benchmark import ENDPOINTS
+from fake_llama_api import FakeLlamaAPI
+from rate_limit import ScheduledAdapter, ScheduledTransport
+from sse import iter_events
+from stream_probe import frame_text, percentile
+
+MESSAGES = [{"role": "user", "content": "Tell me a very long story."}]
+
+
+class RequestsClient:
+    """Streams over a requests session and aborts with Response.close()."""
+
+    name = "requests"
+
+    def __init__(
+        self,
+        base_url,
+        api_key,
+        model,
+        endpoint="compat",
+        max_tokens=2000,
+        scheduler=None,
+        timeout=600.0,
+        wrap_transport=None,
+    ):
+        # wrap_transport is for httpx clients; requests sessions are timed without it.
+        self.url = f"{base_url}{ENDPOINTS[endpoint]}"
+        self.headers = {"Authorization": f"Bearer {api_key}", "Accept": "text/event-stream"}
+        self.model = model
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.session = requests.Session()
+        if scheduler is not None:
+            adapter = ScheduledAdapter(scheduler)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+        # Sockets seen, one per connection: how many were opened so far. urllib3 reconnects
+        # a dropped connection object in place, so its own counters miss reconnections.
+        self._sockets = []
+        self.session.hooks["response"].append(self._note_connection)
+
+    def _note_connection(self, response, *args, **kwargs):
+        connection = response.raw.connection
+        sock = connection.sock if connection is not None else None
+        if sock is not None and all(sock is not seen for seen in self._sockets):
+            self._sockets.append(sock)
+
+    def in_use(self):
+        pool = self.session.get_adapter(self.url).poolmanager.connection_from_url(self.url).pool
+        return pool.maxsize - pool.qsize()
+
+    def connections(self):
+        return len(self._sockets)
+
+    def stream_and_abort(self, frames, drop=False):
+        payload = {
+            "model": self.model,
+            "messages": MESSAGES,
+            "stream": True,
+            "max_tokens": self.max_tokens,
+        }
+        response = self.session.post(
+            self.url, headers=self.headers, json=payload, stream=True, timeout=self.timeout
+        )
+        response.raise_for_status()
+        read = 0
+        for event in iter_events(response.iter_content(chunk_size=None)):
+            if not event.is_done and frame_text(event.json()):
+                read += 1
+            if read >= frames:
+                break
+        aborted = time.perf_counter()
+        if not drop:
+            response.close()
+        return read, aborted
+
+    def follow_up(self):
+        payload = {"model": self.model, "messages": MESSAGES, "max_tokens": 1}
+        response = self.session.post(
+            self.url, headers=self.headers, json=payload, timeout=self.timeout
+        )
+        response.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+class HTTPXClient:
+    """Shared plumbing of the clients built on an httpx.Client we own."""
+
+    def __init__(
+        self,
+        base_url,
+        api_key,
+        model,
+        endpoint="compat",
+        max_tokens=2000,
+        scheduler=None,
+        timeout=600.0,
+        wrap_transport=None,
+    ):
+        if endpoint != "compat":
+            raise ValueError(f"{self.name} only speaks the compat endpoint")
+        self.url = f"{base_url}{ENDPOINTS['compat']}"
+        self.base_url = f"{base_url}/compat/v1"
+        self.api_key = api_key
+        self.model = model
+        self.max_tokens = max_tokens
+        self.transport = httpx.HTTPTransport()
+        # Network streams seen, one per connection: how many were opened so far.
+        self._streams = []
+        transport = self.transport if wrap_transport is None else wrap_transport(self.transport)
+        if scheduler is not None:
+            transport = ScheduledTransport(scheduler, transport)
+        self.http = httpx.Client(
+            transport=transport,
+            timeout=httpx.Timeout(timeout, connect=10),
+            event_hooks={"response": [self._note_connection]},
+        )
+
+    def _note_connection(self, response):
+        stream = response.extensions.get("network_stream")
+        if stream is not None and all(stream is not seen for seen in self._streams):
+            self._streams.append(stream)
+
+    def in_use(self):
+        # httpx has no public pool statistics; httpcore's pool lists its connections.
+        connections = self.transport._pool.connections
+        return sum(
+            not (connection.is_idle() or connection.is_closed()) for connection in connections
+        )
+
+    def connections(self):
+        return len(self._streams)
+
+    def follow_up(self):
+        payload = {"model": self.model, "messages": MESSAGES, "max_tokens": 1}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        self.http.post(self.url, headers=headers, json=payload).raise_for_status()
+
+    def close(self):
+        self.http.close()
+
+
+class OpenAIClient(HTTPXClient):
+    """Streams with the OpenAI SDK and aborts with Stream.close()."""
+
+    name = "openai"
+
+    def stream_and_abort(self, frames, drop=False):
+        from openai import OpenAI
+
+        client = OpenAI(
+            api_key=self.api_key, base_url=self.base_url, http_client=self.http, max_retries=0
+        )
+        stream = client.chat.completions.create(
+            model=self.model, messages=MESSAGES, stream=True, max_tokens=self.max_tokens
+        )
+        read = 0
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                read += 1
+            if read >= frames:
+                break
+        aborted = time.perf_counter()
+        if not drop:
+            stream.close()
+        return read, aborted
+
+
+class LangChainClient(HTTPXClient):
+    """Streams with ChatOpenAI and aborts by closing the stream() generator."""
+
+    name = "langchain"
+
+    def stream_and_abort(self, frames, drop=False):
+        from langchain_openai import ChatOpenAI
+
+        chat = ChatOpenAI(
+            model=self.model,
+            api_key=self.api_key,
+            base_url=self.base_url,
+            http_client=self.http,
+            max_tokens=self.max_tokens,
+            max_retries=0,
+        )
+        stream = chat.stream(MESSAGES)
+        read = 0
+        for chunk in stream:
+            if chunk.content:
+                read += 1
+            if read >= frames:
+                break
+        aborted = time.perf_counter()
+        if not drop:
+            stream.close()
+        return read, aborted
+
+
+CLIENTS = {client.name: client for client in (RequestsClient, OpenAIClient, LangChainClient)}
+
+
+@dataclass
+class CancellationResult:
+    """One abandoned stream, times in seconds."""
+
+    client: str
+    endpoint: str
+    dropped: bool
+    frames_read: int
+    close: float
+    release: float | None
+    follow_up: float
+    follow_up_reused: bool
+    server_stop: float | None = None
+    server_frames_after: int | None = None
+    server_finished: bool | None = None
+
+
+def wait_for(condition, timeout, poll=0.001):
+    """Return the perf_counter() time `condition()` first held, None after `timeout`."""
+    deadline = time.perf_counter() + timeout
+    while True:
+        now = time.perf_counter()
+        if condition():
+            return now
+        if now > deadline:
+            return None
+        time.sleep(poll)
+
+
+def measure_cancellation(client, endpoint, frames, drop=False, server=None, release_timeout=2.0):
+    """Abandon one stream after `frames` text frames and measure what happens next.
+
+    With `drop` the stream is not closed, only dropped. `server` is the FakeLlamaAPI the
+    client talks to, if any, for the server-side view.
+    """
+    streams = len(server.streams) if server else 0
+    in_use = client.in_use()
+    read, aborted = client.stream_and_abort(frames, drop)
+    closed = time.perf_counter()
+    record = server.streams[streams] if server and len(server.streams) > streams else None
+    frames_at_abort = record.frames if record else None
+
+    # Connections pinned by earlier trials stay pinned; only this stream's counts.
+    released = wait_for(lambda: client.in_use() <= in_use, release_timeout)
+    stopped = None
+    if record is not None:
+        stopped = wait_for(lambda: record.ended_at is not None, release_timeout)
+        stopped = record.ended_at if stopped is not None else None
+
+    connections = client.connections()
+    started = time.perf_counter()
+    client.follow_up()
+    follow_up = time.perf_counter() - started
+
+    return CancellationResult(
+        client=client.name,
+        endpoint=endpoint,
+        dropped=drop,
+        frames_read=read,
+        close=round(closed - aborted, 6),
+        release=None if released is None else round(max(0.0, released - aborted), 6),
+        follow_up=round(follow_up, 6),
+        follow_up_reused=client.connections() == connections,
+        server_stop=None if stopped is None else round(stopped - aborted, 6),
+        server_frames_after=None if record is None else record.frames - frames_at_abort,
+        server_finished=None if record is None else record.finished,
+    )
+
+
+def run_trials(
+    name,
+    base_url,
+    api_key,
+    model,
+    endpoint="compat",
+    frames=5,
+    trials=10,
+    max_tokens=2000,
+    drop=False,
+    server=None,
+    release_timeout=2.0,
+    scheduler=None,
+    timeout=600.0,
+    wrap_transport=None,
+):
+    """Abandon `trials` streams with one client; return their CancellationResults.
+
+    `wrap_transport` wraps the httpx transport of the SDK clients, e.g. to time it.
+    """
+    client = CLIENTS[name](
+        base_url, api_key, model, endpoint, max_tokens, scheduler, timeout, wrap_transport
+    )
+    try:
+        return [
+            measure_cancellation(client, endpoint, frames, drop, server, release_timeout)
+            for _ in range(trials)
+        ]
+    finally:
+        client.close()
+
+
+def summarize(results):
+    """Aggregate CancellationResults per client and endpoint into report rows."""
+    groups = {}
+    for result in results:
+        how = "drop" if result.dropped else "close"
+        groups.setdefault(f"{result.client}/{result.endpoint}/{how}", []).append(result)
+
+    rows = {}
+    for name, group in groups.items():
+        released = [result.release for result in group if result.release is not None]
+        stops = [result.server_stop for result in group if result.server_stop is not None]
+        after = [r.server_frames_after for r in group if r.server_frames_after is not None]
+        rows[name] = {
+            "trials": len(group),
+            "close_p50": percentile([result.close for result in group], 50),
+            "release_p50": percentile(released, 50),
+            "release_max": max(released, default=None),
+            "pinned": len(group) - len(released),
+            "follow_up_p50": percentile([result.follow_up for result in group], 50),
+            "follow_up_reused": sum(result.follow_up_reused for result in group),
+            "server_stop_p50": percentile(stops, 50),
+            "server_frames_after_max": max(after, default=None),
+            "server_finished": sum(bool(result.server_finished) for result in group),
+        }
+    return rows
+
+
+def format_report(rows):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.1f}"
+
+    lines = [
+        f"{'client':<24} {'trials':>6} {'close ms':>9} {'release ms':>11} {'pinned':>7} "
+        f"{'follow-up ms':>12} {'reused':>7} {'server stop ms':>15} {'frames after':>13}"
+    ]
+    for name, row in rows.items():
+        after = row["server_frames_after_max"]
+        lines.append(
+            f"{name:<24} {row['trials']:>6} {ms(row['close_p50']):>9} "
+            f"{ms(row['release_p50']):>11} {row['pinned']:>7} {ms(row['follow_up_p50']):>12} "
+            f"{row['follow_up_reused']:>7} {ms(row['server_stop_p50']):>15} "
+            f"{'-' if after is None else after:>13}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--client", action="append", choices=tuple(CLIENTS), help="clients to run (default: all)"
+    )
+    parser.add_argument("--endpoint", choices=tuple(ENDPOINTS), default="compat")
+    parser.add_argument("--frames", type=int, default=5, help="text frames read before aborting")
+    parser.add_argument("--trials", type=int, default=10, help="streams abandoned per client")
+    parser.add_argument("--max-tokens", type=int, default=2000, help="length of each stream")
+    parser.add_argument(
+        "--drop",
+        action="store_true",
+        help="abandon streams by dropping them unclosed, as code that just stops reading does",
+    )
+    parser.add_argument(
+        "--release-timeout",
+        type=float,
+        default=2.0,
+        help="seconds before a connection counts as pinned",
+    )
+    parser.add_argument(
+        "--request-timeout", type=float, default=600.0, help="read timeout of every request"
+    )
+    parser.add_argument("--model", default=os.environ.get("LLAMA_MODEL", "Llama-3.3-8B-Instruct"))
+    parser.add_argument(
+        "--base-url", default=os.environ.get("LLAMA_API_BASE_URL", "https://api.llama.com")
+    )
+    parser.add_argument("--fake", action="store_true", help="spin up and target the stand-in")
+    parser.add_argument(
+        "--fake-chunk-delay", type=float, default=0.005, help="stand-in delay between frames"
+    )
+    parser.add_argument("--json", metavar="PATH", help="also write every result as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    fake = FakeLlamaAPI(chunk_delay=args.fake_chunk_delay).start() if args.fake else None
+    api_key = fake.api_key if fake else os.environ.get("LLAMA_API_KEY")
+    if api_key is None:
+        sys.exit("LLAMA_API_KEY environment variable not set (or use --fake)")
+
+    clients = args.client or tuple(CLIENTS)
+    if args.endpoint == "native":
+        clients = [name for name in clients if name == "requests"]
+    results = []
+    try:
+        for name in clients:
+            results += run_trials(
+                name,
+                fake.base_url if fake else args.base_url,
+                api_key,
+                args.model,
+                args.endpoint,
+                args.frames,
+                args.trials,
+                max_tokens=args.max_tokens,
+                drop=args.drop,
+                server=fake,
+                release_timeout=args.release_timeout,
+                timeout=args.request_timeout,
+            )
+    finally:
+        if fake:
+            fake.stop()
+
+    rows = summarize(results)
+    print(format_report(rows))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, indent=2)
+    return 1 if any(row["pinned"] for row in rows.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
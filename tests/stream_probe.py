@@ -0,0 +1,130 @@
+"""
+Timing probe for streamed chat completions.
+
+A StreamProbe is told when the request went out, when the response headers arrived and
+when each SSE frame was read, and turns that into TTFT, inter-chunk gap percentiles and
+tokens per second. It understands both the native (`event.delta.text`) and the compat
+(`choices[0].delta.content`) chunk formats. The `stream_probe` fixture in conftest.py
+hands one to each test and writes its summary to the --stream-metrics JSONL file.
+"""
+
+import json
+import math
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, q):
+    """Return the q-th percentile (0-100) of values, linearly interpolated."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return round(ordered[low] + (ordered[high] - ordered[low]) * (rank - low), 6)
+
+
+def frame_text(event):
+    """Return the generated text carried by a parsed native or compat streaming chunk."""
+    if "choices" in event:
+        if not event["choices"]:
+            return ""
+        return (event["choices"][0].get("delta") or {}).get("content") or ""
+    if "event" in event:
+        return ((event["event"].get("delta") or {}).get("text")) or ""
+    return ""
+
+
+class StreamProbe:
+    """Collects the timestamps of one streamed response.
+
+    Call start() right before sending the request, headers() once the response object is
+    available, then frame() (or sse_line() for raw SSE lines) for every frame and done()
+    when the stream ends.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.endpoint = None
+        self.request_sent_at = None
+        self.headers_at = None
+        self.frame_times = []
+        self.first_token_at = None
+        self.token_frames = 0
+        self.frame_bytes = 0
+        self.done_at = None
+
+    @property
+    def started(self):
+        return self.request_sent_at is not None
+
+    def start(self, url, at=None):
+        """Mark the request as sent, now or at an earlier perf_counter() time `at`."""
+        self.endpoint = urlsplit(url).path
+        self.request_sent_at = time.perf_counter() if at is None else at
+
+    def headers(self):
+        self.headers_at = time.perf_counter()
+
+    def frame(self, text=None, size=0):
+        now = time.perf_counter()
+        self.frame_times.append(now)
+        self.frame_bytes += size
+        if text:
+            self.token_frames += 1
+            if self.first_token_at is None:
+                self.first_token_at = now
+
+    def sse_line(self, line):
+        """Record one raw SSE line; only `data:` lines count as frames."""
+        if not line.startswith("data:"):
+            return
+        data = line[len("data:") :].strip()
+        if data == "[DONE]":
+            self.done()
+            return
+        try:
+            text = frame_text(json.loads(data))
+        except json.JSONDecodeError:
+            text = None
+        self.frame(text)
+
+    def done(self):
+        if self.done_at is None:
+            self.done_at = time.perf_counter()
+
+    def summary(self):
+        """Return the metrics as a JSON-serializable dict, times in seconds."""
+        sent = self.request_sent_at
+        end = self.done_at or (self.frame_times[-1] if self.frame_times else None)
+
+        def since_sent(moment):
+            return None if moment is None else round(moment - sent, 6)
+
+        gaps = [
+            round(later - earlier, 6)
+            for earlier, later in zip(self.frame_times, self.frame_times[1:], strict=False)
+        ]
+        generating = (
+            self.frame_times[-1] - self.first_token_at if self.first_token_at is not None else None
+        )
+        return {
+            "endpoint": self.endpoint,
+            "headers_received": since_sent(self.headers_at),
+            "first_frame": since_sent(self.frame_times[0] if self.frame_times else None),
+            "ttft": since_sent(self.first_token_at),
+            "done": since_sent(self.done_at),
+            "total": since_sent(end),
+            "frames": len(self.frame_times),
+            "token_frames": self.token_frames,
+            "bytes": self.frame_bytes,
+            "gap_p50": percentile(gaps, 50),
+            "gap_p90": percentile(gaps, 90),
+            "gap_p99": percentile(gaps, 99),
+            "gap_max": max(gaps, default=None),
+            # Tokens after the first one, over the time it took to stream them.
+            "tokens_per_second": (
+                round((self.token_frames - 1) / generating, 2) if generating else None
+            ),
+            "frame_offsets": [round(moment - sent, 6) for moment in self.frame_times],
+        }
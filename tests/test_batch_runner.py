@@ -0,0 +1,94 @@
+"""
+Tests for the bulk prompt runner in batch_runner.py, run against the offline stand-in.
+"""
+
+import json
+
+import httpx
+import pytest
+from batch_runner import BatchConfig, run_batch, send
+from fake_llama_api import REPLY_TEXT
+
+
+@pytest.fixture
+def prompts(tmp_path):
+    """Fixture to provide an input file of 20 chat requests and one broken line."""
+    path = tmp_path / "prompts.jsonl"
+    lines = [
+        json.dumps({"id": f"p{n}", "messages": [{"role": "user", "content": f"Prompt {n}"}]})
+        for n in range(20)
+    ]
+    lines.insert(5, "{not json")
+    path.write_text("\n".join(lines) + "\n")
+    return path
+
+
+def read_results(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+@pytest.mark.parametrize("endpoint", ["native", "compat"])
+@pytest.mark.parametrize("stream", [False, True], ids=["json", "sse"])
+async def test_batch_runs_every_line(fake_api, model, prompts, tmp_path, endpoint, stream):
+    """Test that every line gets exactly one result, with timings, in either mode."""
+    output = tmp_path / "results.jsonl"
+    config = BatchConfig(
+        fake_api.base_url, fake_api.api_key, model, endpoint, stream=stream, concurrency=3
+    )
+    assert await run_batch(config, prompts, output) == (21, 1, 0)
+
+    results = read_results(output)
+    assert sorted(result["line"] for result in results) == list(range(1, 22))
+    for result in results:
+        if result["line"] == 6:
+            assert result["error"].startswith("Invalid input line")
+            continue
+        assert result["error"] is None, result
+        assert result["text"] == REPLY_TEXT
+        assert result["tokens"] > 0
+        assert result["latency"] > 0
+        assert (result["ttft"] is not None) == stream
+    assert {result["id"] for result in results} >= {"p0", "p19"}
+
+
+async def test_batch_resumes_after_interruption(fake_api, model, prompts, tmp_path):
+    """Test that completed lines are skipped and a truncated last result is dropped."""
+    output = tmp_path / "results.jsonl"
+    config = BatchConfig(fake_api.base_url, fake_api.api_key, model, concurrency=4)
+    await run_batch(config, prompts, output)
+    results = output.read_text().splitlines()
+    # Keep 10 results and half of the 11th, as if the run had been killed mid-write.
+    output.write_text("\n".join(results[:10]) + "\n" + results[10][:15])
+    served = fake_api.requests_served
+
+    completed, failed, skipped = await run_batch(config, prompts, output)
+
+    assert (completed, skipped) == (11, 10)
+    assert fake_api.requests_served - served == completed - failed
+    assert sorted(result["line"] for result in read_results(output)) == list(range(1, 22))
+
+    config.retry_errors = True
+    assert await run_batch(config, prompts, output) == (1, 1, 20)
+
+
+async def test_batch_prompt_field(fake_api, model, tmp_path):
+    """Test that --prompt-field turns any JSONL of texts into prompts."""
+    prompts = tmp_path / "backlog.jsonl"
+    prompts.write_text('{"request_id": "a", "body": "Say hi"}\n{"request_id": "b"}\n')
+    output = tmp_path / "results.jsonl"
+    config = BatchConfig(fake_api.base_url, fake_api.api_key, model, "compat", prompt_field="body")
+    assert await run_batch(config, prompts, output) == (2, 1, 0)
+    results = {result["line"]: result for result in read_results(output)}
+    assert results[1]["text"] == REPLY_TEXT
+    assert results[2]["error"] == "Invalid input line: No 'body' field"
+
+
+@pytest.mark.parametrize("body", [{"choices": []}, {"choices": [{"text": "hi"}]}, []])
+async def test_batch_unexpected_body_fails_the_line(model, body):
+    """Test that a 200 response of an unexpected shape is recorded as a failed line."""
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=body))
+    config = BatchConfig("http://llama.invalid", "key", model, "compat")
+    async with httpx.AsyncClient(transport=transport) as client:
+        result = await send(client, config, 1, '{"messages": []}')
+    assert result["status"] == 200
+    assert result["error"].startswith("Unexpected response body:"), result
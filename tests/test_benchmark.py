@@ -0,0 +1,56 @@
+"""
+Smoke tests for the load generator in benchmark.py, run against the offline stand-in.
+"""
+
+import pytest
+from benchmark import BenchmarkConfig, format_report, run_benchmark, summarize
+from rate_limit import RequestScheduler
+
+
+@pytest.mark.parametrize("rate", [None, 40.0], ids=["closed_loop", "open_loop"])
+@pytest.mark.parametrize("stream", [False, True], ids=["json", "sse"])
+async def test_benchmark_reports_both_endpoints(fake_api, model, rate, stream):
+    """Test that a short run hits both endpoints without errors and fills in the report."""
+    config = BenchmarkConfig(
+        base_url=fake_api.base_url,
+        api_key=fake_api.api_key,
+        model=model,
+        stream=stream,
+        concurrency=2,
+        rate=rate,
+        duration=0.3,
+    )
+    results = await run_benchmark(config)
+    rows = summarize(results, config.duration)
+
+    assert set(rows) == {"all", "native", "compat"}
+    for name, row in rows.items():
+        assert row["requests"] > 0, f"No requests recorded for {name}"
+        assert row["error_rate"] == 0, f"Unexpected errors for {name}: {row}"
+        assert row["latency_p50"] <= row["latency_p99"]
+        assert row["tokens_per_second"] > 0
+        assert (row["ttft_p50"] is not None) == stream
+    print(format_report(rows))
+
+
+async def test_benchmark_counts_errors(fake_api, model):
+    """Test that rejected requests are counted as errors rather than latency samples."""
+    config = BenchmarkConfig(
+        base_url=fake_api.base_url, api_key="wrong-key", model=model, duration=0.1
+    )
+    rows = summarize(await run_benchmark(config), config.duration)
+
+    assert rows["all"]["error_rate"] == 1
+    assert rows["all"]["latency_p50"] is None
+
+
+async def test_benchmark_sends_through_scheduler(fake_api, model):
+    """Test that every request goes through the scheduler when one is given."""
+    config = BenchmarkConfig(
+        base_url=fake_api.base_url, api_key=fake_api.api_key, model=model, duration=0.1
+    )
+    scheduler = RequestScheduler(max_concurrency=2)
+    results = await run_benchmark(config, scheduler)
+
+    assert results
+    assert scheduler.requests == len(results) == fake_api.requests_served
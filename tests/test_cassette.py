@@ -0,0 +1,154 @@
+"""
+Tests for the record/replay cassette proxy, using the offline stand-in as upstream.
+"""
+
+import json
+import time
+
+import pytest
+import requests
+from cassette import Cassette, CassetteProxy, request_key
+from fake_llama_api import COMPAT_PATH, FAKE_API_KEY, FakeLlamaAPI
+from http_server import LocalHTTPServer
+
+HEADERS = {
+    "Authorization": f"Bearer {FAKE_API_KEY}",
+    "Content-Type": "application/json",
+    "Accept": "text/event-stream",
+}
+
+
+class FailingServer(LocalHTTPServer):
+    """Answers `status` to the first request and 200 to the others."""
+
+    def __init__(self, status):
+        super().__init__()
+        self.status = status
+        self.served = 0
+
+    async def _dispatch(self, request, writer):
+        self.served += 1
+        status = self.status if self.served == 1 else 200
+        body = json.dumps({"served": self.served}).encode()
+        await self._send(writer, request, status, "application/json", body)
+
+
+@pytest.fixture
+def upstream():
+    """Fixture to provide a stand-in API to record from."""
+    with FakeLlamaAPI(chunk_delay=0.01) as server:
+        yield server
+
+
+@pytest.fixture
+def payload(model, basic_messages):
+    """Fixture to provide a streaming chat completion payload."""
+    return {"model": model, "messages": basic_messages, "stream": True}
+
+
+def stream_frames(base_url, payload):
+    response = requests.post(f"{base_url}{COMPAT_PATH}", headers=HEADERS, json=payload, stream=True)
+    assert response.status_code == 200, f"Expected status code 200, got {response.status_code}"
+    return [line for line in response.iter_lines() if line]
+
+
+def test_replay_serves_recorded_stream_without_upstream(tmp_path, upstream, payload):
+    """Test that a recorded SSE stream replays frame for frame once upstream is gone."""
+    cassette_path = tmp_path / "cassette.jsonl"
+    with CassetteProxy(Cassette(cassette_path), upstream.base_url, "record") as proxy:
+        recorded = stream_frames(proxy.base_url, payload)
+        assert proxy.recorded == 1
+    upstream.stop()
+
+    with CassetteProxy(Cassette(cassette_path), upstream.base_url, "replay") as proxy:
+        replayed = stream_frames(proxy.base_url, payload)
+        assert proxy.hits == 1
+
+    assert replayed == recorded
+
+
+def test_replay_keeps_inter_chunk_timing(tmp_path, upstream, payload):
+    """Test that replay reproduces the recorded gaps, and that speed=0 drops them."""
+    cassette = Cassette(tmp_path / "cassette.jsonl")
+    with CassetteProxy(cassette, upstream.base_url, "record") as proxy:
+        stream_frames(proxy.base_url, payload)
+
+    (entry,) = cassette.entries.values()
+    recorded_duration = entry["response"]["chunks"][-1][0]
+    assert recorded_duration >= 0.1, "Stand-in chunk delay should show up in the offsets"
+
+    durations = {}
+    for speed in (1.0, 0):
+        with CassetteProxy(cassette, upstream.base_url, "replay", speed=speed) as proxy:
+            started = time.perf_counter()
+            stream_frames(proxy.base_url, payload)
+            durations[speed] = time.perf_counter() - started
+
+    assert durations[1.0] >= 0.8 * recorded_duration, (
+        f"Replay took {durations[1.0]:.3f}s for a {recorded_duration:.3f}s recording"
+    )
+    assert durations[0] < durations[1.0]
+
+
+def test_replay_miss_is_reported(tmp_path, payload):
+    """Test that replay mode answers unknown requests with 502 instead of going upstream."""
+    with CassetteProxy(Cassette(tmp_path / "empty.jsonl"), "http://127.0.0.1:9", "replay") as proxy:
+        response = requests.post(f"{proxy.base_url}{COMPAT_PATH}", headers=HEADERS, json=payload)
+
+    assert response.status_code == 502
+    assert response.json()["error"]["type"] == "cassette_miss"
+    assert not (tmp_path / "empty.jsonl").exists(), "Replay mode must not write the cassette"
+
+
+@pytest.mark.parametrize("status", [429, 503])
+def test_transient_errors_are_not_recorded(tmp_path, payload, status):
+    """Test that a 429 or 5xx is passed on but not recorded, so the next run asks again."""
+    cassette = Cassette(tmp_path / "cassette.jsonl")
+    with (
+        FailingServer(status) as upstream,
+        CassetteProxy(cassette, upstream.base_url, "record") as proxy,
+    ):
+        url = f"{proxy.base_url}{COMPAT_PATH}"
+        first = requests.post(url, headers=HEADERS, json=payload)
+        assert (first.status_code, proxy.recorded) == (status, 0)
+        second = requests.post(url, headers=HEADERS, json=payload)
+        assert (second.status_code, proxy.recorded) == (200, 1)
+
+    assert second.json() == {"served": 2}
+    assert [entry["response"]["status"] for entry in cassette.entries.values()] == [200]
+
+
+def test_request_key_ignores_credentials_and_json_layout(payload):
+    """Test that the key depends on what the API sees, not on auth or JSON formatting."""
+    body = json.dumps(payload).encode()
+    reordered = json.dumps(dict(reversed(payload.items())), indent=2).encode()
+    headers = {"content-type": "application/json", "accept": "text/event-stream"}
+
+    key = request_key("POST", COMPAT_PATH, {**headers, "authorization": "Bearer a"}, body)
+    assert key == request_key("post", COMPAT_PATH, {**headers, "authorization": "Bearer b"}, body)
+    assert key == request_key("POST", COMPAT_PATH, headers, reordered)
+    assert key != request_key("POST", COMPAT_PATH, {**headers, "accept": "*/*"}, body)
+    assert key != request_key("POST", "/v1/chat/completions", headers, body)
+
+
+def test_expired_entries_are_rerecorded_and_compacted(tmp_path, upstream, payload):
+    """Test that record mode refreshes expired entries and compaction keeps one per key."""
+    cassette_path = tmp_path / "cassette.jsonl"
+    with CassetteProxy(Cassette(cassette_path), upstream.base_url, "record") as proxy:
+        stream_frames(proxy.base_url, payload)
+
+    # Age the recording by an hour.
+    cassette = Cassette(cassette_path)
+    for entry in cassette.entries.values():
+        entry["recorded_at"] -= 3600
+    cassette.compact()
+
+    with CassetteProxy(Cassette(cassette_path, max_age=60), upstream.base_url, "record") as proxy:
+        stream_frames(proxy.base_url, payload)
+        assert (proxy.hits, proxy.recorded) == (0, 1)
+        assert len(cassette_path.read_text().splitlines()) == 2
+    assert len(cassette_path.read_text().splitlines()) == 1
+
+    with CassetteProxy(Cassette(cassette_path, max_age=60), upstream.base_url, "record") as proxy:
+        stream_frames(proxy.base_url, payload)
+        assert (proxy.hits, proxy.recorded) == (1, 0)
@@ -0,0 +1,29 @@
+"""
+Smoke test for the client-stack overhead benchmark in client_benchmark.py.
+"""
+
+import pytest
+from client_benchmark import STACKS, format_report, recorded_compat_stream, report, run_benchmark
+from fake_llama_api import REPLY_TEXT
+
+
+@pytest.mark.sdk
+@pytest.mark.openai
+@pytest.mark.langchain
+def test_client_benchmark_measures_every_stack():
+    """Test that all stacks read the same replayed text and get a full report row."""
+    chunks = recorded_compat_stream(tokens=30)
+    results = run_benchmark(chunks, requests=3, traced=1)
+
+    assert set(results) == set(STACKS)
+    for name, result in results.items():
+        assert result.text.startswith(REPLY_TEXT), f"{name} read {result.text!r}"
+    assert len({result.text for result in results.values()}) == 1
+
+    rows = report(results, rate=10)
+    assert rows["requests"]["added_latency"] == 0
+    for name, row in rows.items():
+        assert row["cpu_per_request"] > 0, name
+        assert row["cpu_per_chunk"] < row["cpu_per_request"], name
+        assert row["peak_kib"] > 0, name
+    print(format_report(rows, 10))
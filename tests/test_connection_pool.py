@@ -0,0 +1,51 @@
+"""
+Measures what the shared keep-alive session saves compared to a bare `requests.post`,
+which opens (and for https, TLS-handshakes) a fresh connection for every request.
+
+The probe is the form-urlencoded request the API rejects with 400 before generating
+anything, so the timings are dominated by connection setup and round trips.
+"""
+
+import json
+import statistics
+import time
+
+import requests
+from conftest import new_http_session
+
+ROUNDS = 5
+
+
+def test_pooled_session_saves_connection_setup(api_base_url, auth_headers, model, basic_messages):
+    """Test that a pooled session reuses one connection, and report the setup time saved."""
+    url = f"{api_base_url}/v1/chat/completions"
+    payload = json.dumps({"model": model, "messages": basic_messages})
+    headers = {**auth_headers, "Content-Type": "application/x-www-form-urlencoded"}
+
+    def timed(post):
+        started = time.perf_counter()
+        response = post(url, headers=headers, data=payload)
+        elapsed = time.perf_counter() - started
+        assert response.status_code == 400, (
+            f"Expected status code 400, got {response.status_code} in {response.text}"
+        )
+        return elapsed
+
+    fresh = [timed(requests.post) for _ in range(ROUNDS)]
+
+    with new_http_session(pool_size=1) as session:
+        timed(session.post)  # pays the one connection setup
+        pooled = [timed(session.post) for _ in range(ROUNDS)]
+        pools = session.get_adapter(url).poolmanager.pools
+        connections_opened = sum(pools[key].num_connections for key in pools.keys())
+
+    assert connections_opened == 1, (
+        f"Expected the session to reuse 1 connection, it opened {connections_opened}"
+    )
+
+    saved = statistics.median(fresh) - statistics.median(pooled)
+    print(
+        f"Connection setup saved per request: {saved * 1000:.1f} ms "
+        f"(fresh median {statistics.median(fresh) * 1000:.1f} ms, "
+        f"pooled median {statistics.median(pooled) * 1000:.1f} ms)"
+    )
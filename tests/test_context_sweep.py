@@ -0,0 +1,47 @@
+"""
+Tests for the context-length sweep in context_sweep.py, run against the offline stand-in.
+"""
+
+import pytest
+from benchmark import BenchmarkConfig
+from context_sweep import format_report, run_sweep, scaling, synthetic_conversation
+from fake_llama_api import count_prompt_tokens
+
+
+@pytest.mark.parametrize("tokens, turns", [(1, 1), (100, 1), (1000, 8), (999, 7), (3, 8)])
+def test_synthetic_conversation(tokens, turns):
+    """Test that conversations have the requested size, alternate and end with the user."""
+    messages = synthetic_conversation(tokens, turns)
+
+    assert count_prompt_tokens(messages) == tokens
+    assert len(messages) == min(tokens, turns)
+    assert messages[-1]["role"] == "user"
+    roles = [message["role"] for message in messages]
+    assert all(a != b for a, b in zip(roles, roles[1:], strict=False)), "Roles should alternate"
+    assert synthetic_conversation(tokens, turns) == messages, "Should be deterministic"
+
+
+@pytest.mark.parametrize("stream", [False, True], ids=["json", "sse"])
+async def test_sweep_against_stand_in(fake_api, model, stream):
+    """Test that a short sweep fills in every point and fits a slope per endpoint."""
+    config = BenchmarkConfig(
+        base_url=fake_api.base_url,
+        api_key=fake_api.api_key,
+        model=model,
+        stream=stream,
+        max_tokens=4,
+    )
+    rows = await run_sweep(config, sizes=(10, 5000), turns=(1, 4), repeats=2)
+
+    assert [(row["tokens"], row["turns"], row["endpoint"]) for row in rows] == [
+        (tokens, turns, endpoint)
+        for tokens in (10, 5000)
+        for turns in (1, 4)
+        for endpoint in ("native", "compat")
+    ]
+    for row in rows:
+        assert (row["requests"], row["ok"]) == (2, 2), row["errors"]
+        assert (row["ttft_p50"] is not None) == stream
+    assert rows[-1]["payload_bytes"] > 100 * rows[0]["payload_bytes"]
+    assert set(scaling(rows, "latency_p50")) == {"native", "compat"}
+    print(format_report(rows))
@@ -0,0 +1,63 @@
+"""
+Tests for the paired native/compat comparison in endpoint_comparison.py.
+"""
+
+import asyncio
+import random
+
+import pytest
+from benchmark import BenchmarkConfig, RequestResult
+from endpoint_comparison import bootstrap_interval, compare_pairs, run_pairs
+from rate_limit import RequestScheduler
+
+
+def test_bootstrap_interval():
+    """Test that the interval covers the true mean and excludes zero for a clear shift."""
+    rng = random.Random(1)
+    differences = [rng.gauss(0.05, 0.02) for _ in range(100)]
+    low, high = bootstrap_interval(differences)
+    assert 0 < low < 0.05 < high
+
+    noise = [rng.gauss(0, 0.02) for _ in range(100)]
+    low, high = bootstrap_interval(noise)
+    assert low < 0 < high
+
+
+def test_compare_pairs():
+    """Test that paired differences are summarised per metric."""
+    pairs = [
+        (
+            RequestResult("native", 200, None, 1.0 + n / 100, None, 10, bytes=400),
+            RequestResult("compat", 200, None, 1.1 + n / 100, None, 10, bytes=350),
+        )
+        for n in range(20)
+    ]
+    comparisons = {c.metric: c for c in compare_pairs(pairs)}
+
+    assert "ttft" not in comparisons, "No TTFT without streaming"
+    latency = comparisons["latency"]
+    assert latency.pairs == 20
+    assert latency.difference == pytest.approx(0.1)
+    assert latency.significant
+    assert comparisons["bytes"].difference == -50
+    assert comparisons["bytes"].relative == pytest.approx(-0.125)
+
+
+@pytest.mark.parametrize("stream", [False, True])
+def test_run_pairs_against_stand_in(fake_api, stream):
+    """Test that run_pairs alternates endpoints and measures every metric."""
+    config = BenchmarkConfig(
+        base_url=fake_api.base_url, api_key=fake_api.api_key, model="m", stream=stream
+    )
+    served = fake_api.requests_served
+    scheduler = RequestScheduler()
+    pairs, failed = asyncio.run(run_pairs(config, 6, scheduler))
+
+    assert (len(pairs), failed) == (6, 0)
+    assert fake_api.requests_served - served == 14, "2 warm-up requests and 6 pairs"
+    assert scheduler.requests == 14
+    assert all(n.endpoint == "native" and c.endpoint == "compat" for n, c in pairs)
+    comparisons = {c.metric: c for c in compare_pairs(pairs)}
+    assert ("ttft" in comparisons) == stream
+    assert comparisons["bytes"].difference != 0, "Native and compat bodies differ in size"
+    assert all(c.native > 0 and c.compat > 0 for c in comparisons.values())
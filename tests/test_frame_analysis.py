@@ -0,0 +1,115 @@
+"""
+Tests for the SSE frame-size and coalescing analysis in frame_analysis.py.
+"""
+
+import json
+
+import pytest
+from conftest import get_request_scheduler, get_request_timeout, use_cassette
+from frame_analysis import (
+    Frame,
+    FrameReport,
+    StreamFrames,
+    analyze_chunks,
+    estimate_tokens,
+    format_report,
+    histogram,
+    run_analysis,
+)
+
+
+def frame(text):
+    return b"data: " + json.dumps({"choices": [{"index": 0, "delta": {"content": text}}]}).encode()
+
+
+def test_analyze_chunks_counts_frames_per_read():
+    """Test that frames are attributed to the read that completed them."""
+    split = frame(" there") + b"\n\n"
+    chunks = [frame("Hi") + b"\n\n" + frame(" you") + b"\n\n", split[:10], split[10:]]
+
+    stream = analyze_chunks("compat", chunks)
+
+    assert [f.read for f in stream.frames] == [0, 0, 2]
+    assert stream.frames_per_read == [2, 0, 1]
+    assert [f.tokens for f in stream.frames] == [1, 1, 1]
+    first = stream.frames[0]
+    assert first.wire == len(frame("Hi")) + 2
+    assert first.payload == len(frame("Hi")) - len("data: ")
+    assert first.overhead == pytest.approx(8 / first.wire)
+    assert stream.error is None
+
+
+def test_truncated_stream_is_an_error():
+    """Test that a body ending inside a frame is reported instead of silently dropped."""
+    stream = analyze_chunks("compat", [frame("Hi") + b"\n\n" + frame(" th")])
+
+    assert len(stream.frames) == 1
+    assert stream.error == f"stream ended inside a frame, {len(frame(' th'))} bytes unparsed"
+
+
+def test_estimate_tokens():
+    """Test that words and punctuation marks are counted as tokens."""
+    assert estimate_tokens("") == 0
+    assert estimate_tokens(" Hello") == 1
+    assert estimate_tokens("Hello, world!") == 4
+
+
+def test_histogram_buckets():
+    """Test that values land in the first bucket whose upper bound they don't exceed."""
+    assert histogram([0, 1, 1, 2, 3, 100], (0, 1, 2, 4)) == [
+        ("<=0", 1),
+        ("<=1", 2),
+        ("<=2", 1),
+        ("<=4", 1),
+        (">4", 1),
+    ]
+
+
+def test_coalescing_advice():
+    """Test that per-token frames are flagged, and advised against only when not coalesced."""
+    per_token = [Frame(100, 108, 1, read) for read in range(4)]
+    alone = FrameReport("compat", [StreamFrames("compat", per_token, [1, 1, 1, 1])])
+    coalesced = FrameReport("compat", [StreamFrames("compat", per_token, [4])])
+    batched = FrameReport("compat", [StreamFrames("compat", [Frame(300, 308, 12, 0)], [1])])
+
+    assert alone.per_token_frames and alone.coalescing_advised
+    assert coalesced.per_token_frames and not coalesced.coalescing_advised
+    assert not batched.per_token_frames and not batched.coalescing_advised
+    assert "coalescing advised" in alone.describe()
+    assert FrameReport("native").per_token_frames is None
+
+
+def test_frame_analysis_of_both_endpoints(api_base_url, api_key, model):
+    """Test that every frame and read of a stream from each endpoint is analyzed."""
+    if use_cassette():
+        pytest.skip("Reads through the cassette proxy show its framing, not the API's")
+
+    reports = run_analysis(
+        api_base_url,
+        api_key,
+        model,
+        ("native", "compat"),
+        1,
+        50,
+        "Count from 1 to 20.",
+        scheduler=get_request_scheduler(),
+        timeout=get_request_timeout(),
+    )
+
+    errors = []
+    for report in reports:
+        summary = report.summary()
+        if summary["ok"] != 1:
+            errors.append(f"{report.endpoint}: {summary['errors']}")
+            continue
+        histograms = summary["histograms"]
+        if sum(count for _, count in histograms["payload_bytes"]) != summary["frames"]:
+            errors.append(f"{report.endpoint}: payload histogram doesn't cover every frame")
+        if sum(count for _, count in histograms["frames_per_read"]) < 1:
+            errors.append(f"{report.endpoint}: no reads recorded")
+        if sum(report.frames_per_read) != summary["frames"]:
+            errors.append(f"{report.endpoint}: frames per read don't add up to the frames")
+        if not 0 < summary["overhead"] < 1:
+            errors.append(f"{report.endpoint}: framing overhead {summary['overhead']}")
+    if errors:
+        pytest.fail("\n".join(errors) + "\n\n" + format_report(reports))
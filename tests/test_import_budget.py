@@ -0,0 +1,54 @@
+"""
+Tests that collecting the suite stays fast: see import_budget.py.
+"""
+
+import pytest
+from import_budget import ImportTime, format_report, measure, module_names, sdk_free_run
+
+
+def test_test_modules_import_within_budget():
+    """Test that no module is over its import budget or loads a client SDK stack it shouldn't."""
+    results = measure()
+    errors = [problem for result in results for problem in result.violations]
+    if errors:
+        pytest.fail("\n".join(errors) + "\n\n" + format_report(results))
+
+
+def test_sdk_modules_are_imported_last(tmp_path):
+    """Test that the SDK modules come last, so that other modules can't hide their imports."""
+    for name in ("test_a", "test_sdk", "test_z"):
+        (tmp_path / f"{name}.py").touch()
+    (tmp_path / "helper.py").touch()
+    assert module_names(tmp_path, {"test_sdk.py": ("sdk",)}) == [
+        "conftest",
+        "test_a",
+        "test_z",
+        "test_sdk",
+    ]
+
+
+def test_violations():
+    """Test that slow imports, stray heavy imports and failed imports are violations."""
+    assert ImportTime("test_a", 0.1, 0.5, [], False).violations == []
+    assert ImportTime("test_sdk", 2.0, 5.0, ["openai"], True).violations == []
+    assert ImportTime("test_a", 0.7, 0.5, [], False).violations == [
+        "test_a took 0.700s to import, over its 0.5s budget"
+    ]
+    assert ImportTime("test_a", 0.1, 0.5, ["openai"], False).violations == [
+        "test_a imports openai at import time"
+    ]
+    failed = ImportTime("test_a", None, 0.5, [], False, "ImportError: no")
+    assert failed.violations == ["test_a failed to import: ImportError: no"]
+    assert "-" in format_report([failed]).splitlines()[1]
+
+
+def test_sdk_free_run_loads_no_sdk(pytestconfig):
+    """Test that running the suite with -m "not sdk" never imports a client SDK stack."""
+    if not pytestconfig.getoption("--sdk-free-run"):
+        pytest.skip("Runs the whole suite again, use --sdk-free-run")
+
+    # The nested run doesn't get --sdk-free-run, so this test skips itself there.
+    code, heavy, output = sdk_free_run()
+
+    assert code == 0, output
+    assert heavy == [], f"{', '.join(heavy)} loaded by tests not marked sdk"
@@ -4,10 +4,14 @@ This file verifies that the Llama API's compatibility endpoint works with LangCh
 standard test classes.
 """
 
+import pytest
 from langchain_core.language_models import BaseChatModel
 from langchain_openai import ChatOpenAI
 from langchain_tests.integration_tests import ChatModelIntegrationTests
 
+# Listed in conftest.SDK_MODULES too, so that -m can skip importing this module.
+pytestmark = [pytest.mark.sdk, pytest.mark.langchain]
+
 
 class TestLangChainStandard(ChatModelIntegrationTests):
     """
@@ -23,10 +27,32 @@ class TestLangChainStandard(ChatModelIntegrationTests):
     @property
     def chat_model_params(self) -> dict:
         # Using relative import for conftest functions
-        from conftest import get_llama_api_key, get_llama_model
+        from conftest import (
+            get_langchain_http_clients,
+            get_llama_api_base_url,
+            get_llama_api_key,
+            get_llama_model,
+        )
 
+        http_client, http_async_client = get_langchain_http_clients()
         return {
             "model": get_llama_model(),
-            "base_url": "https://api.llama.com/compat/v1",
+            "base_url": f"{get_llama_api_base_url()}/compat/v1",
             "api_key": get_llama_api_key(),
+            # Paced and retried on 429/503 by the suite's shared rate-limit scheduler.
+            "http_client": http_client,
+            "http_async_client": http_async_client,
         }
+
+    @property
+    def has_tool_calling(self) -> bool:
+        # The offline stand-in only produces canned text, it never calls tools.
+        from conftest import use_fake_llama_api
+
+        return not use_fake_llama_api()
+
+    @property
+    def has_structured_output(self) -> bool:
+        from conftest import use_fake_llama_api
+
+        return not use_fake_llama_api()
@@ -1,10 +1,11 @@
 import json
 
 import pytest
-import requests
 
 
-def test_chat_completions_basic_request(api_base_url, auth_headers, model, basic_messages):
+def test_chat_completions_basic_request(
+    api_base_url, auth_headers, model, basic_messages, http_session
+):
     """Test basic chat completion functionality with the Llama API."""
     # Set up the request
     url = f"{api_base_url}/v1/chat/completions"
@@ -16,7 +17,7 @@ def test_chat_completions_basic_request(api_base_url, auth_headers, model, basic
 
     # Make the API request
     headers = {**auth_headers, "Content-Type": "application/json"}
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
+    response = http_session.post(url, headers=headers, data=json.dumps(payload))
 
     # Assertions
     assert response.status_code == 200, (
@@ -43,7 +44,9 @@ def test_chat_completions_basic_request(api_base_url, auth_headers, model, basic
         pytest.fail(f"Unexpected response format: {response_body}")
 
 
-def test_compat_chat_completions_basic_request(api_base_url, auth_headers, model, basic_messages):
+def test_compat_chat_completions_basic_request(
+    api_base_url, auth_headers, model, basic_messages, http_session
+):
     """Test basic chat completion functionality with the Llama API."""
     # Set up the request
     url = f"{api_base_url}/compat/v1/chat/completions"
@@ -55,7 +58,7 @@ def test_compat_chat_completions_basic_request(api_base_url, auth_headers, model
 
     # Make the API request
     headers = {**auth_headers, "Content-Type": "application/json"}
-    response = requests.post(url, headers=headers, data=json.dumps(payload))
+    response = http_session.post(url, headers=headers, data=json.dumps(payload))
 
     # Assertions
     assert response.status_code == 200, (
@@ -0,0 +1,116 @@
+"""
+Tests for the multi-model sweep in model_sweep.py.
+"""
+
+from model_sweep import (
+    TESTS,
+    ModelRun,
+    differing_outcomes,
+    format_report,
+    main,
+    read_junit,
+    run_sweep,
+    split_budget,
+    worker_budget,
+    worker_command,
+)
+from quirk_matrix import STREAMING_CASES
+
+JUNIT = """\
+<?xml version="1.0" encoding="utf-8"?>
+<testsuites><testsuite name="pytest">
+<testcase classname="test_a" name="test_pass" time="0.1" />
+<testcase classname="test_a" name="test_fail" time="0.1"><failure message="no" /></testcase>
+<testcase classname="test_a" name="test_skip" time="0"><skipped message="later" /></testcase>
+<testcase classname="test_a" name="test_teardown" time="0.1" />
+<testcase classname="test_a" name="test_teardown" time="0.1"><error message="oops" /></testcase>
+</testsuite></testsuites>
+"""
+
+
+def test_read_junit(tmp_path):
+    """Test that each test gets its worst outcome from the junit XML."""
+    path = tmp_path / "results.xml"
+    path.write_text(JUNIT)
+
+    assert read_junit(path) == {
+        "test_a::test_pass": "passed",
+        "test_a::test_fail": "failed",
+        "test_a::test_skip": "skipped",
+        "test_a::test_teardown": "error",
+    }
+
+
+def test_budget_is_split_between_workers(tmp_path):
+    """Test that each worker gets its share of the rate and concurrency budget."""
+    assert split_budget(None, 3) is None
+    assert split_budget(6.0, 4) == 1.5
+    assert split_budget(16, 3, minimum=1) == 5
+    assert split_budget(2, 3, minimum=1) == 1
+
+    # Without totals the workers split the suite's environment defaults.
+    env = {"LLAMA_RATE_LIMIT": "6", "LLAMA_MAX_CONCURRENCY": "8"}
+    assert worker_budget(["a", "b", "c"], 3, env=env) == (3, 2.0, 2)
+    assert worker_budget(["a", "b", "c"], 3, env={}) == (3, None, 5)
+    assert worker_budget(["a", "b", "c"], 3, 1.5, 2, env=env) == (2, 0.75, 1)
+
+    test_sse = str(TESTS / "test_sse.py")
+    command = worker_command("Llama 3/8B", tmp_path, [test_sse], 1.5, 5)
+    assert f"--junitxml={tmp_path / 'Llama_3_8B.xml'}" in command
+    assert command[-3:] == ["--rate-limit=1.5", "--max-concurrency=5", test_sse]
+
+
+def test_workers_always_run_the_tests_directory(tmp_path):
+    """Test that worker arguments without a test path still run the suite, not the cwd."""
+    assert worker_command("m", tmp_path, None)[-1] == str(TESTS)
+    assert worker_command("m", tmp_path, ["-m", "not sdk"])[-3:] == ["-m", "not sdk", str(TESTS)]
+    test_sse = f"{TESTS / 'test_sse.py'}::test_parser_reports_truncated_event"
+    assert worker_command("m", tmp_path, ["-x", test_sse])[-1] == test_sse
+
+
+def test_sweep_fails_when_a_worker_has_no_results(tmp_path, capsys):
+    """Test that a worker that ran nothing fails the sweep instead of passing it."""
+    missing = str(TESTS / "test_missing.py")
+    assert main(["--fake", "--models", "m", "--output", str(tmp_path), "--", missing]) == 1
+    assert "no results" in capsys.readouterr().out
+
+
+def test_report_lists_differing_outcomes():
+    """Test that the report compares models and lists tests whose outcome differs."""
+    passed = {"outcome": "passed", "status": 200}
+    records = [
+        {**passed, "latency": 0.2, "ttft": 0.05, "tokens_per_second": 40.0},
+        {**passed, "latency": 0.4},
+        # A deliberate 400 quirk case and a failed test don't count towards the latencies.
+        {"outcome": "passed", "status": 400, "latency": 0.01},
+        {"outcome": "failed", "status": 200, "latency": 9.0},
+    ]
+    runs = [
+        ModelRun("small", 0, 1.0, {"t::a": "passed", "t::b": "passed"}, records),
+        ModelRun("large", 1, 2.0, {"t::a": "passed", "t::b": "failed"}),
+    ]
+
+    assert differing_outcomes(runs) == {"t::b": {"small": "passed", "large": "failed"}}
+    assert runs[0].summary()["latency_p50"] == 0.3
+    report = format_report(runs)
+    assert report.splitlines()[1].split()[:5] == ["small", "2", "0", "0", "0"]
+    assert "    large: failed" in report
+
+
+def test_sweep_runs_each_model(tmp_path):
+    """Test that every model gets its own worker and its results are aggregated."""
+    runs = run_sweep(
+        ["model-a", "model-b"],
+        tmp_path,
+        ["--llama-api=fake", str(TESTS / "test_streaming.py")],
+        workers=2,
+        rate_limit=20,
+    )
+
+    for run in runs:
+        summary = run.summary()
+        log = (tmp_path / f"{run.model}.log").read_text()
+        assert summary["passed"] == len(STREAMING_CASES), log
+        assert summary["failed"] == summary["error"] == 0
+        assert {record["model"] for record in run.records} == {run.model}
+        assert summary["latency_p50"] is not None
@@ -0,0 +1,155 @@
+"""
+Tests for the network timing plugin in network_timing.py, run against the offline stand-in.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import httpx
+import pytest
+import requests
+from fake_llama_api import COMPAT_PATH, FAKE_API_KEY, FakeLlamaAPI
+from network_timing import (
+    PHASES,
+    AsyncTimedTransport,
+    NetworkTimingPlugin,
+    TimedTransport,
+    slowest_phases,
+)
+
+HEADERS = {"Authorization": f"Bearer {FAKE_API_KEY}", "Accept": "text/event-stream"}
+PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "Hi"}], "stream": True}
+
+
+@pytest.fixture
+def fake_api():
+    """Fixture to provide a stand-in API with a small delay between streamed frames."""
+    with FakeLlamaAPI(chunk_delay=0.005) as server:
+        yield server
+
+
+@pytest.fixture
+def plugin():
+    """Fixture to provide an installed NetworkTimingPlugin collecting into `_running`."""
+    plugin = NetworkTimingPlugin()
+    plugin.install()
+    yield plugin
+    plugin.uninstall()
+
+
+def check_records(records, client):
+    """Check one new connection then one reused one, both streamed to the end."""
+    assert [record["client"] for record in records] == [client, client]
+    first, second = records
+    assert not first["reused"] and second["reused"]
+    assert first["connect"] is not None and second["connect"] is None
+    for record in records:
+        assert record["error"] is None
+        assert record["tls"] is None, "Plain HTTP has no TLS handshake"
+        assert record["transfer"] > 0.05, "17 frames 5 ms apart should take a while"
+        phases = sum(record[phase] or 0 for phase in PHASES)
+        assert phases <= record["total"] + 1e-6
+        assert record["url"].endswith(COMPAT_PATH)
+
+
+def test_requests_breakdown(fake_api, plugin):
+    """Test that requests sessions are timed phase by phase, reuse included."""
+    with requests.Session() as session:
+        for _ in range(2):
+            with session.post(
+                f"{fake_api.base_url}{COMPAT_PATH}", headers=HEADERS, json=PAYLOAD, stream=True
+            ) as response:
+                assert response.status_code == 200
+                for _ in response.iter_content(chunk_size=None):
+                    pass
+    check_records(plugin._running, "requests")
+    assert plugin._running[0]["dns"] is not None
+
+
+def test_httpx_breakdown(fake_api, plugin):
+    """Test that TimedTransport times sync httpx requests through the trace extension."""
+    with httpx.Client(transport=TimedTransport(httpx.HTTPTransport())) as client:
+        for _ in range(2):
+            response = client.post(
+                f"{fake_api.base_url}{COMPAT_PATH}", headers=HEADERS, json=PAYLOAD
+            )
+            assert response.status_code == 200
+    check_records(plugin._running, "httpx")
+
+
+async def test_async_httpx_breakdown(fake_api, plugin):
+    """Test that AsyncTimedTransport times async httpx requests."""
+    transport = AsyncTimedTransport(httpx.AsyncHTTPTransport())
+    async with httpx.AsyncClient(transport=transport) as client:
+        for _ in range(2):
+            response = await client.post(
+                f"{fake_api.base_url}{COMPAT_PATH}", headers=HEADERS, json=PAYLOAD
+            )
+            assert response.status_code == 200
+    check_records(plugin._running, "httpx")
+
+
+def test_uninstall_restores_plain_pools(fake_api):
+    """Test that nothing is recorded once the plugin is uninstalled."""
+    plugin = NetworkTimingPlugin()
+    plugin.install()
+    plugin.uninstall()
+    requests.post(f"{fake_api.base_url}{COMPAT_PATH}", headers=HEADERS, json=PAYLOAD).close()
+    assert plugin._running == []
+
+
+def test_report_and_json(tmp_path):
+    """Test that the plugin attaches timings to reports, lists them and writes JSON."""
+    (tmp_path / "conftest.py").write_text(
+        textwrap.dedent(
+            """
+            from network_timing import NetworkTimingPlugin
+
+            def pytest_configure(config):
+                plugin = NetworkTimingPlugin("timing.json", top=3)
+                plugin.install()
+                config.pluginmanager.register(plugin, "network_timing")
+            """
+        )
+    )
+    (tmp_path / "test_one.py").write_text(
+        textwrap.dedent(
+            """
+            import requests
+            from fake_llama_api import FakeLlamaAPI
+
+            def test_one_request():
+                with FakeLlamaAPI() as server:
+                    requests.get(f"{server.base_url}/v1/models").close()
+            """
+        )
+    )
+    result = subprocess.run(
+        [sys.executable, "-m", "pytest", "-p", "no:cacheprovider", "--junitxml=results.xml"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": str(Path(__file__).parent)},
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.returncode == 0, result.stdout
+    assert "network timing" in result.stdout
+    assert "1 requests in 1 tests" in result.stdout
+    tests = json.loads((tmp_path / "timing.json").read_text())["tests"]
+    assert list(tests) == ["test_one.py::test_one_request"]
+    assert 'name="network_timing"' in (tmp_path / "results.xml").read_text()
+
+
+def test_slowest_phases():
+    """Test that the slowest phases are ranked across tests and requests."""
+    record = dict.fromkeys(PHASES)
+    tests = {
+        "a": [{**record, "ttfb": 0.5, "transfer": 0.1}],
+        "b": [{**record, "connect": 0.3}, {**record, "transfer": 0.9}],
+    }
+    ranked = [(seconds, phase, test) for seconds, phase, test, _ in slowest_phases(tests, 3)]
+    assert ranked == [(0.9, "transfer", "b"), (0.5, "ttfb", "a"), (0.3, "connect", "b")]
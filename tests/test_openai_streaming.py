@@ -1,42 +1,52 @@
 import pytest
-from openai import OpenAI
+from stream_accumulator import StreamAccumulator
 
+pytestmark = [pytest.mark.sdk, pytest.mark.openai]
 
-def test_compat_openai_sdk_streaming(api_base_url, api_key, model, basic_messages):
+
+def test_compat_openai_sdk_streaming(
+    api_base_url, api_key, model, basic_messages, http_client, stream_probe
+):
     """Test streaming functionality using the OpenAI Python SDK with compat endpoint."""
+    # Imported here so that collecting the suite doesn't load the SDK (see import_budget.py).
+    from openai import OpenAI
+
     # Create OpenAI client with compatibility endpoint URL
-    client = OpenAI(api_key=api_key, base_url=f"{api_base_url}/compat/v1")
+    client = OpenAI(api_key=api_key, base_url=f"{api_base_url}/compat/v1", http_client=http_client)
 
     errors = []
     chunks_received = 0
 
     try:
         # Request streaming response
+        stream_probe.start(f"{api_base_url}/compat/v1/chat/completions")
         stream = client.chat.completions.create(model=model, messages=basic_messages, stream=True)
+        stream_probe.headers()
+
+        # Process the stream; the spill file, if any, is closed however the stream ends
+        with StreamAccumulator(max_memory=1 << 20) as all_content:
+            for chunk in stream:
+                chunks_received += 1
+                stream_probe.frame(chunk.choices[0].delta.content if chunk.choices else None)
+
+                # Validate chunk structure
+                if not hasattr(chunk, "choices") or len(chunk.choices) == 0:
+                    errors.append(f"Chunk #{chunks_received}: Missing or empty choices array")
+                    continue
+
+                # Check if delta exists and contains content
+                if not hasattr(chunk.choices[0], "delta"):
+                    errors.append(f"Chunk #{chunks_received}: Choice doesn't contain delta")
+
+                # Accumulate content if available
+                if hasattr(chunk.choices[0].delta, "content") and chunk.choices[0].delta.content:
+                    all_content.append(chunk.choices[0].delta.content)
+
+            stream_probe.done()
 
-        # Process the stream
-        all_content = ""
-        for chunk in stream:
-            chunks_received += 1
-
-            # Validate chunk structure
-            if not hasattr(chunk, "choices") or len(chunk.choices) == 0:
-                errors.append(f"Chunk #{chunks_received}: Missing or empty choices array")
-                continue
-
-            # Check if delta exists and contains content
-            if not hasattr(chunk.choices[0], "delta"):
-                errors.append(f"Chunk #{chunks_received}: Choice doesn't contain delta")
-
-            # Accumulate content if available
-            if hasattr(chunk.choices[0].delta, "content") and chunk.choices[0].delta.content:
-                all_content += chunk.choices[0].delta.content
-
-        # Print summary of received content
-        if all_content:
-            print(
-                f"Received content: {all_content[:50]}..." if len(all_content) > 50 else all_content
-            )
+            # Print summary of received content
+            if all_content.bytes:
+                print(f"Received content: {all_content.preview(50)}")
 
     except Exception as e:
         errors.append(f"Exception during streaming: {str(e)}")
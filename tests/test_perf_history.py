@@ -0,0 +1,178 @@
+"""
+Tests for the performance history store and regression detection in perf_history.py.
+"""
+
+import random
+
+import pytest
+from perf_history import (
+    append_records,
+    build_record,
+    compare,
+    load_history,
+    main,
+    mann_whitney_greater,
+)
+
+NATIVE = "/v1/chat/completions"
+COMPAT = "/compat/v1/chat/completions"
+
+
+def history(latencies_per_run, endpoint=NATIVE, outcome="passed"):
+    """Build records for runs r0, r1, ... with the given latencies for each run."""
+    return [
+        {
+            "run": f"r{run}",
+            "mode": "live",
+            "model": "Llama-3.3-8B-Instruct",
+            "endpoint": endpoint,
+            "outcome": outcome,
+            "latency": latency,
+        }
+        for run, latencies in enumerate(latencies_per_run)
+        for latency in latencies
+    ]
+
+
+def noisy_runs(count, center, seed=0):
+    rng = random.Random(seed)
+    return [[center * rng.uniform(0.8, 1.2) for _ in range(8)] for _ in range(count)]
+
+
+def test_mann_whitney_greater():
+    """Test that the U test separates shifted samples and not identical ones."""
+    assert mann_whitney_greater([10, 11, 12, 13, 14], [1, 2, 3, 4, 5]) < 0.01
+    assert mann_whitney_greater([1, 2, 3, 4, 5], [10, 11, 12, 13, 14]) > 0.99
+    assert mann_whitney_greater([1, 1, 1], [1, 1, 1]) == 1.0
+
+
+def test_compare_flags_slower_run():
+    """Test that a run 50% slower than its baseline is flagged."""
+    records = history(noisy_runs(10, 1.0) + noisy_runs(1, 1.5, seed=1))
+    [finding] = compare(records)
+
+    assert finding.regression, finding
+    assert finding.metric == "latency"
+    assert finding.change > 0.3
+    assert (finding.samples, finding.baseline_samples) == (8, 80)
+
+
+def test_compare_ignores_noise_and_improvements():
+    """Test that neither run-to-run noise nor a faster run is flagged."""
+    assert not compare(history(noisy_runs(11, 1.0)))[0].regression
+    assert not compare(history(noisy_runs(10, 1.0) + noisy_runs(1, 0.5, seed=1)))[0].regression
+
+
+def test_compare_uses_rolling_window():
+    """Test that runs older than the window do not count towards the baseline."""
+    records = history(noisy_runs(5, 3.0) + noisy_runs(5, 1.0, seed=1) + noisy_runs(1, 1.0, seed=2))
+    [finding] = compare(records, window=5)
+
+    assert finding.baseline_samples == 40
+    assert not finding.regression
+
+
+def test_compare_skips_failed_tests_and_small_samples():
+    """Test that failing tests are left out and sparse groups are not judged."""
+    records = history(noisy_runs(10, 1.0)) + history([[]] * 10 + [[5.0] * 8], outcome="failed")
+    assert compare(records) == []
+    assert compare(history([[1.0, 1.1]] * 10 + [[5.0, 5.0]])) == []
+
+
+def test_compare_normalizes_each_test_and_status():
+    """Test that tests of different workloads and statuses are pooled without mixing them."""
+    errors = [
+        {**record, "test": "error", "status": 400, "latency": record["latency"] / 10}
+        for record in history(noisy_runs(11, 1.0, seed=1))
+    ]
+    completions = [
+        {**record, "test": "ok", "status": 200} for record in history(noisy_runs(11, 1.0))
+    ]
+    [finding] = compare(errors + completions)
+    assert (finding.samples, finding.tests) == (16, 2)
+    assert abs(finding.change) < 0.1 and not finding.regression
+
+    dropped = [{**record, "test": "slow", "latency": 5.0} for record in history([[1.0] * 8] * 10)]
+    kept = [{**record, "test": "fast"} for record in history(noisy_runs(11, 1.0, seed=2))]
+    [finding] = compare(dropped + kept)
+    assert (finding.baseline_samples, finding.tests) == (80, 1)
+
+
+# The records one suite run writes, as (test, endpoint, status, latency, streamed).
+SUITE_RUN = [
+    ("test_content_type_quirk[form]", NATIVE, 400, 0.2, False),
+    ("test_content_type_quirk[compat_form]", COMPAT, 400, 0.2, False),
+    ("test_chat_completions_basic_request", NATIVE, 200, 0.8, False),
+    ("test_compat_chat_completions_basic_request", COMPAT, 200, 0.8, False),
+    ("test_compat_openai_sdk_streaming", COMPAT, None, 1.2, True),
+    ("test_streaming_quirk[streaming_with_accept_header]", NATIVE, 200, 1.0, True),
+    ("test_streaming_quirk[streaming_without_accept_header]", NATIVE, 400, 0.2, False),
+    ("test_streaming_quirk[accept_header_without_streaming]", NATIVE, 200, 0.8, False),
+    ("test_streaming_quirk[compat_streaming_with_accept_header]", COMPAT, 200, 1.0, True),
+    ("test_streaming_quirk[compat_no_streaming_without_accept_header]", COMPAT, 200, 0.8, False),
+]
+
+
+def suite_history(slowdowns, seed=0):
+    """Build the records of one suite run per slowdown factor, with 10% noise."""
+    rng = random.Random(seed)
+    records = []
+    for run, slowdown in enumerate(slowdowns):
+        for test, endpoint, status, latency, streamed in SUITE_RUN:
+            latency *= slowdown * rng.uniform(0.9, 1.1)
+            exchanges = [] if status is None else [(endpoint, status, latency)]
+            stream = None
+            if streamed:
+                ttft = latency / 4
+                stream = {"endpoint": endpoint, "total": latency, "ttft": ttft, "frames": 20}
+            records.append(
+                build_record(f"r{run}", "live", "m", test, "passed", latency, exchanges, stream)
+            )
+    return records
+
+
+def test_compare_judges_a_real_suite_run():
+    """Test that one run of the suite is enough to compare, and that a slowdown is flagged."""
+    findings = compare(suite_history([1.0] * 8))
+    assert {finding.metric for finding in findings} == {"latency", "ttft"}
+    assert not any(finding.regression for finding in findings)
+
+    findings = compare(suite_history([1.0] * 7 + [1.5]))
+    assert {finding.metric for finding in findings if finding.regression} == {"latency", "ttft"}
+
+
+def test_history_round_trip_and_cli(tmp_path, capsys):
+    """Test that records built from test results are appended, read back and compared."""
+    path = tmp_path / "history.jsonl"
+    stream = {"endpoint": NATIVE, "total": 2.0, "ttft": 0.5, "frames": 10, "bytes": 800}
+    for run, latency in enumerate([1.0] * 6 + [2.0]):
+        records = [
+            build_record(
+                f"r{run}", "live", "m", f"t{i}", "passed", 1.0, [(NATIVE, 200, latency)], None
+            )
+            for i in range(6)
+        ]
+        records.append(build_record(f"r{run}", "live", "m", "s", "passed", 2.0, [], stream))
+        append_records(path, records)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"run": "truncat')
+
+    records = load_history(path)
+    assert len(records) == 7 * 7
+    assert records[-1]["ttft"] == 0.5 and records[-1]["latency"] == 2.0
+    assert records[0]["status"] == 200 and records[0]["requests"] == 1
+
+    assert main(["compare", str(path)]) == 1
+    assert "1 significant regression(s)" in capsys.readouterr().out
+    assert main(["compare", str(path), "--run", "r5"]) == 0
+
+
+@pytest.mark.parametrize("run", ["r0", "missing"])
+def test_compare_without_baseline(run):
+    """Test that comparing a run without enough history reports nothing."""
+    records = history(noisy_runs(1, 1.0))
+    if run == "missing":
+        with pytest.raises(ValueError, match="not in the history"):
+            compare(records, run=run)
+    else:
+        assert compare(records, run=run) == []
@@ -0,0 +1,86 @@
+"""
+Probes whether the API caches long shared prompt prefixes.
+
+With `--prefix-cache-probe N` each endpoint gets N streamed requests that share a long
+system prompt and N whose system prompt of the same length is randomized, interleaved.
+Their TTFT distributions are compared (see prefix_cache.py) and the verdict for each
+endpoint and model is printed in the terminal summary. The probe reports rather than
+asserts: the suite fails only if requests fail. Without the option it is skipped; under
+the cassette modes it is skipped too, as replayed timings say nothing about the server.
+"""
+
+import random
+
+import pytest
+from conftest import use_cassette
+from prefix_cache import (
+    PrefixCacheReport,
+    cached_tokens,
+    probe_prefix_cache,
+    randomized_messages,
+    shared_prefix_messages,
+)
+from quirk_matrix import COMPAT, NATIVE
+
+PREFIX_TOKENS = 2000
+
+
+def test_prompts_share_only_the_shared_prefix():
+    """Test that shared prompts differ only in the question and randomized ones throughout."""
+    first, second = (shared_prefix_messages(500, index, "salt") for index in (1, 2))
+    assert first[0] == second[0]
+    assert first[1] != second[1]
+    assert len(first[0]["content"].split()) == 500
+
+    first, second = (randomized_messages(500, index, "salt") for index in (1, 2))
+    assert first[0] != second[0]
+    assert len(first[0]["content"].split()) == 500
+    assert randomized_messages(500, 1, "salt") == first, "Should be deterministic"
+    assert shared_prefix_messages(500, 1, "other")[0] != shared_prefix_messages(500, 1, "salt")[0]
+
+
+def test_cached_tokens():
+    """Test that cached token counts are read from compat usage and native metrics."""
+    assert cached_tokens({"usage": {"prompt_tokens_details": {"cached_tokens": 1536}}}) == 1536
+    native = {"event": {"metrics": [{"metric": "num_cached_prompt_tokens", "value": 7}]}}
+    assert cached_tokens(native) == 7
+    assert cached_tokens({"usage": {"prompt_tokens": 10}}) is None
+
+
+def test_report_verdict():
+    """Test that a clear TTFT drop counts as caching and equal distributions do not."""
+    rng = random.Random(3)
+    cached = PrefixCacheReport("native", "m", 2000)
+    cached.shared = [rng.gauss(0.2, 0.02) for _ in range(10)]
+    cached.randomized = [rng.gauss(0.5, 0.05) for _ in range(10)]
+    assert cached.in_effect
+    assert cached.speedup == pytest.approx(0.6, abs=0.1)
+    assert "in effect" in cached.describe()
+
+    uncached = PrefixCacheReport("compat", "m", 2000)
+    uncached.shared = [rng.gauss(0.5, 0.05) for _ in range(10)]
+    uncached.randomized = [rng.gauss(0.5, 0.05) for _ in range(10)]
+    assert not uncached.in_effect
+    assert PrefixCacheReport("compat", "m", 2000).in_effect is None
+
+
+@pytest.mark.parametrize("path", [NATIVE, COMPAT], ids=["native", "compat"])
+def test_prefix_cache(
+    pytestconfig, path, http_session, api_base_url, auth_headers, model, prefix_cache_reports
+):
+    """Test that the prefix cache probe completes and record its verdict."""
+    pairs = pytestconfig.getoption("--prefix-cache-probe")
+    if not pairs:
+        pytest.skip("Prefix cache probe not requested, use --prefix-cache-probe N")
+    if use_cassette():
+        pytest.skip("Replayed timings say nothing about the server's prefix cache")
+
+    report = probe_prefix_cache(
+        http_session, api_base_url, auth_headers, model, path, pairs, PREFIX_TOKENS
+    )
+    prefix_cache_reports.append(report)
+    print(report.describe())
+
+    if report.errors:
+        pytest.fail("\n".join(report.errors))
+    assert len(report.shared) == len(report.randomized) == pairs
@@ -0,0 +1,103 @@
+"""
+Tests for the session-wide API preflight in preflight.py, run against the offline stand-in.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from fake_llama_api import FakeLlamaAPI
+from preflight import Preflight, classify
+from quirk_matrix import STREAMING_CASES
+
+TESTS = Path(__file__).parent
+
+
+@pytest.fixture(scope="module")
+def fake_api():
+    """Fixture to provide an offline stand-in API."""
+    with FakeLlamaAPI() as server:
+        yield server
+
+
+def test_classify():
+    """Test that auth failures, rejected probes and outages are told apart, and 429 is fine."""
+    assert classify(200) is None
+    assert classify(429, "slow down") is None
+    assert classify(401, '{"detail": "bad key"}') == 'API key rejected: {"detail": "bad key"}'
+    assert classify(404, "no such\nmodel").startswith("probe request rejected: no such model")
+    assert classify(503, "").startswith("API unavailable")
+
+
+def test_preflight_passes_and_is_cached(fake_api):
+    """Test that a healthy API passes and that the endpoints are only probed once."""
+    preflight = Preflight(fake_api.base_url, fake_api.api_key, "test-model")
+    assert not preflight.ran
+
+    assert preflight.reason() is None
+    served = fake_api.requests_served
+    assert preflight.reason(("compat",)) is None
+    assert fake_api.requests_served == served
+    assert {v.status for v in preflight.verdicts.values()} == {200}
+
+
+def test_preflight_rejects_bad_key(fake_api):
+    """Test that a rejected key fails every endpoint with the API's reason."""
+    preflight = Preflight(fake_api.base_url, "wrong-key", "test-model")
+
+    assert [v.endpoint for v in preflight.problems()] == ["native", "compat"]
+    reason = preflight.reason(("compat",))
+    assert reason.startswith("Llama API preflight failed: compat: API key rejected")
+    assert "HTTP 401" in reason
+
+
+def test_preflight_reports_unreachable_api():
+    """Test that an API nobody listens on fails without waiting for the timeout."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    preflight = Preflight(f"http://127.0.0.1:{port}", "key", "test-model", timeout=5)
+
+    verdict = preflight.verdicts["native"]
+    assert verdict.problem == "API unreachable: ConnectionError"
+    assert verdict.elapsed < 5
+
+
+@pytest.mark.parametrize("mode, outcome", [("fail", "errors"), ("skip", "skipped")])
+def test_suite_short_circuits_on_bad_key(fake_api, mode, outcome):
+    """Test that with a rejected key the API tests end at once and the others still run."""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-p",
+            "no:cacheprovider",
+            "-q",
+            "-rfs",
+            "--llama-api=live",
+            f"--preflight={mode}",
+            "test_streaming.py",
+            "test_perf_history.py",
+        ],
+        cwd=TESTS,
+        env={
+            **os.environ,
+            "LLAMA_API_BASE_URL": fake_api.base_url,
+            "LLAMA_API_KEY": "wrong-key",
+            "LLAMA_PERF_HISTORY": "",
+        },
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+
+    # Every test of test_streaming.py needs the API, none of test_perf_history.py does.
+    summary = result.stdout.strip().splitlines()[-1]
+    assert f"{len(STREAMING_CASES)} {outcome}" in summary, result.stdout
+    assert "passed" in summary, result.stdout
+    assert "Llama API preflight failed: native: API key rejected" in result.stdout
+    assert "preflight compat: API key rejected" in result.stdout
@@ -0,0 +1,17 @@
+"""
+Tests for the quirk matrix in quirk_matrix.py, run against the offline stand-in.
+"""
+
+from conftest import new_http_session
+from quirk_matrix import QUIRK_MATRIX, check_response, send_case
+
+
+def test_every_case_passes_against_the_stand_in(fake_api, model, basic_messages):
+    """Test that every matrix case gets its own call and passes its checks."""
+    session = new_http_session(1)
+    auth_headers = {"Authorization": f"Bearer {fake_api.api_key}"}
+    for case in QUIRK_MATRIX.values():
+        response = send_case(session, case, fake_api.base_url, auth_headers, model, basic_messages)
+        assert check_response(case, response) == [], case.name
+
+    assert fake_api.requests_served == len(QUIRK_MATRIX)
@@ -0,0 +1,143 @@
+"""
+Tests for the rate-limit scheduler in rate_limit.py, run against a scripted local server.
+"""
+
+import json
+import time
+from email.utils import formatdate
+
+import httpx
+import pytest
+from conftest import new_http_session
+from http_server import LocalHTTPServer
+from rate_limit import (
+    AsyncScheduledTransport,
+    RequestScheduler,
+    ScheduledConnectionPool,
+    ScheduledTransport,
+    Throttle,
+    parse_retry_after,
+)
+
+
+class RateLimitedServer(LocalHTTPServer):
+    """Answers 429 to the first `limited` requests, with `retry_after` if given, then 200."""
+
+    def __init__(self, limited, retry_after=None):
+        super().__init__()
+        self.limited = limited
+        self.retry_after = retry_after
+        self.served_at = []
+
+    async def _dispatch(self, request, writer):
+        self.served_at.append(time.monotonic())
+        if len(self.served_at) <= self.limited:
+            status, body = 429, {"error": {"message": "Too many requests"}}
+        else:
+            status, body = 200, {"ok": True}
+        data = json.dumps(body).encode()
+        headers = {"Content-Type": "application/json", "Content-Length": str(len(data))}
+        if status == 429 and self.retry_after is not None:
+            headers["Retry-After"] = self.retry_after
+        writer.write(self._head(status, headers, request.keep_alive) + data)
+        await writer.drain()
+
+
+def post_with_requests(scheduler, url):
+    return new_http_session(2, scheduler).post(url, json={}).status_code
+
+
+def post_with_httpx(scheduler, url):
+    transport = ScheduledTransport(scheduler, httpx.HTTPTransport())
+    with httpx.Client(transport=transport) as client:
+        return client.post(url, json={}).status_code
+
+
+def post_with_httpcore(scheduler, url):
+    with ScheduledConnectionPool(scheduler) as pool:
+        return pool.request("POST", url, content=b"{}").status
+
+
+def test_parse_retry_after():
+    """Test that both Retry-After forms are understood and garbage is ignored."""
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after(formatdate(1000.0 + 5, usegmt=True), now=1000.0) == 5.0
+    assert parse_retry_after(formatdate(1000.0 - 5, usegmt=True), now=1000.0) == 0.0
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+@pytest.mark.parametrize(
+    "post",
+    [post_with_requests, post_with_httpx, post_with_httpcore],
+    ids=["requests", "httpx", "httpcore"],
+)
+def test_rate_limited_request_is_retried_after_retry_after(post):
+    """Test that a 429 is retried once the Retry-After has passed, and counted."""
+    scheduler = RequestScheduler()
+    with RateLimitedServer(limited=1, retry_after="1") as server:
+        assert post(scheduler, server.base_url + "/v1/chat/completions") == 200
+        first, second = server.served_at
+
+    assert second - first >= 0.95
+    assert scheduler.summary() == {
+        "requests": 2,
+        "retries": 1,
+        "rate_limited": 1,
+        "throttled_seconds": pytest.approx(1.0, abs=0.1),
+    }
+
+
+async def test_async_transport_backs_off_exponentially():
+    """Test that without Retry-After the async transport backs off 0.05s, then 0.1s."""
+    scheduler = RequestScheduler(backoff=0.05)
+    transport = AsyncScheduledTransport(scheduler, httpx.AsyncHTTPTransport())
+    with RateLimitedServer(limited=2) as server:
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.post(server.base_url + "/v1/chat/completions", json={})
+        served_at = server.served_at
+
+    assert response.status_code == 200
+    assert served_at[1] - served_at[0] >= 0.05
+    assert served_at[2] - served_at[1] >= 0.1
+    assert scheduler.retries == 2
+
+
+def test_gives_up_after_max_retries():
+    """Test that the last 429 is returned once the retries are used up."""
+    scheduler = RequestScheduler(max_retries=2, backoff=0.01)
+    with RateLimitedServer(limited=10) as server:
+        assert post_with_requests(scheduler, server.base_url + "/v1/chat/completions") == 429
+        assert len(server.served_at) == 3
+
+
+def test_token_bucket_paces_requests():
+    """Test that a configured rate spaces requests out, per endpoint."""
+    scheduler = RequestScheduler(rate=20)
+    with RateLimitedServer(limited=0) as server:
+        session = new_http_session(2, scheduler)
+        started = time.monotonic()
+        for _ in range(5):
+            session.post(server.base_url + "/v1/chat/completions", json={})
+        session.post(server.base_url + "/compat/v1/chat/completions", json={})
+        elapsed = time.monotonic() - started
+
+    # One token to start with, then one every 1/20s; the other endpoint has its own bucket.
+    assert 0.2 <= elapsed < 0.5
+    assert scheduler.throttled_seconds > 0.1
+
+
+def test_concurrency_limit_adapts():
+    """Test that the concurrency limit halves on a 429 and creeps back on successes."""
+    throttle = Throttle(max_concurrency=8, backoff=0)
+    assert throttle.try_acquire() == 0
+    throttle.release(429)
+    assert throttle.limit == 4
+
+    for _ in range(4):
+        assert throttle.try_acquire() == 0
+    assert throttle.try_acquire() > 0, "A fifth request should wait for a slot"
+    for _ in range(4):
+        throttle.release(200)
+    assert 4 < throttle.limit < 6
+    assert throttle.in_flight == 0
@@ -0,0 +1,121 @@
+"""
+Tests for the incremental SSE parser and chunk validation in sse.py.
+"""
+
+import json
+
+import pytest
+from fake_llama_api import COMPAT_PATH, NATIVE_PATH
+from sse import SSEParser, iter_events, validate_chunk
+from sse_benchmark import record_stream, run
+
+STREAM = (
+    b": keep-alive\n\n"
+    b'data: {"n": 1}\n\n'
+    b"event: progress\nid: 7\nretry: 1500\ndata: first\ndata: second\n\n"
+    b"data: [DONE]\n\n"
+)
+
+
+def split_every(data, size):
+    return [data[i : i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 13, len(STREAM)])
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"], ids=["lf", "crlf"])
+def test_parser_is_independent_of_chunk_boundaries(size, newline):
+    """Test that events, fields and sizes come out the same however the bytes are split."""
+    stream = STREAM.replace(b"\n", newline)
+    parser = SSEParser()
+    events = list(iter_events(split_every(stream, size), parser))
+
+    assert [event.data for event in events] == ['{"n": 1}', "first\nsecond", "[DONE]"]
+    assert events[0].json() == {"n": 1}
+    assert events[0].comments == 1
+    assert [event.type for event in events] == ["message", "progress", "message"]
+    assert (events[1].id, events[1].retry) == ("7", 1500)
+    assert events[2].id == "7", "The last event id should carry over to later events"
+    assert events[2].is_done
+    assert sum(event.size for event in events) == len(stream)
+    assert (parser.events, parser.comments, parser.bytes_fed) == (3, 1, len(stream))
+    assert parser.pending_bytes == 0
+
+
+def test_parser_reports_truncated_event():
+    """Test that an event cut off before its blank line stays pending rather than dispatched."""
+    parser = SSEParser()
+    assert parser.feed(b'data: {"n": 1}\n\ndata: {"n"') != []
+    assert parser.feed(b": 2}\n") == []
+    assert parser.pending_bytes == len(b'data: {"n": 2}\n')
+
+
+@pytest.mark.parametrize("newline", [b"\n", b"\r\n"], ids=["lf", "crlf"])
+def test_parser_settles_events_without_data(newline):
+    """Test that a trailing heartbeat isn't pending and an event without data isn't dispatched."""
+    stream = b"data: x\n\n: ping\n\nevent: progress\n\ndata: y\n\n: ping\n\n"
+    parser = SSEParser()
+    events = parser.feed(stream.replace(b"\n", newline))
+
+    assert [(event.data, event.type) for event in events] == [("x", "message"), ("y", "message")]
+    assert events[1].comments == 1
+    assert parser.pending_bytes == 0
+
+
+def test_parser_handles_multibyte_characters_split_across_chunks():
+    """Test that UTF-8 sequences split between chunks are decoded only once complete."""
+    stream = "data: héllo 🦙\n\n".encode()
+    assert [event.data for event in iter_events(split_every(stream, 1))] == ["héllo 🦙"]
+
+
+@pytest.mark.parametrize(
+    "payload, expected",
+    [
+        ({"event": {"event_type": "progress", "delta": {"type": "text", "text": "hi"}}}, []),
+        ({"event": {"event_type": "metrics", "metrics": []}}, []),
+        ({"event": {"event_type": "bogus"}}, ["Unknown event_type 'bogus'"]),
+        ({"event": {"event_type": "progress"}}, ["'progress' event without a delta"]),
+        (
+            {"event": {"event_type": "progress", "delta": {"type": "text", "text": 1}}},
+            ["Text delta should carry a 'text' string"],
+        ),
+        (
+            {
+                "object": "chat.completion.chunk",
+                "choices": [{"index": 0, "delta": {"content": "hi"}, "finish_reason": None}],
+            },
+            [],
+        ),
+        ({"object": "chat.completion.chunk", "choices": [], "usage": {}}, []),
+        (
+            {"object": "chat.completion.chunk", "choices": []},
+            ["Chunk with empty 'choices' should carry 'usage'"],
+        ),
+        (
+            {"object": "chat.completion", "choices": [{"index": 0, "delta": {"content": 3}}]},
+            [
+                "'object' should be 'chat.completion.chunk', got 'chat.completion'",
+                "Delta content should be a string, got 3",
+            ],
+        ),
+        ([], ["Chunk should be a JSON object, got list"]),
+    ],
+)
+def test_validate_chunk(payload, expected):
+    """Test that chunk validation accepts both formats and names what is wrong."""
+    assert validate_chunk(payload) == expected
+
+
+@pytest.mark.parametrize("path", [NATIVE_PATH, COMPAT_PATH], ids=["native", "compat"])
+def test_stand_in_stream_is_valid_and_benchmark_agrees(path):
+    """Test that the stand-in's stream validates and both benchmark methods see every event."""
+    chunks = record_stream(path, tokens=50)
+    errors = []
+    for event in iter_events(chunks):
+        if not event.is_done:
+            errors.extend(validate_chunk(json.loads(event.data)))
+    if errors:
+        pytest.fail("\n".join(errors))
+
+    results = run([chunks], repeats=1)
+    counts = {events for _, events in results.values()}
+    assert len(counts) == 1, f"Methods disagree on the number of events: {results}"
@@ -0,0 +1,111 @@
+"""
+Tests for StreamAccumulator, including a peak-memory stress test on long generations.
+"""
+
+import re
+import subprocess
+import sys
+import tracemalloc
+from pathlib import Path
+
+import pytest
+import requests
+from fake_llama_api import COMPAT_PATH, FAKE_API_KEY, REPLY_TEXT
+from sse import iter_events
+from stream_accumulator import StreamAccumulator
+from stream_probe import frame_text
+
+
+@pytest.fixture(scope="module")
+def stand_in_url():
+    """Fixture to provide the URL of a stand-in API served from a separate process.
+
+    Out of process, so tracemalloc only sees the client side of the stream.
+    """
+    server = Path(__file__).parent / "fake_llama_api.py"
+    process = subprocess.Popen(
+        [sys.executable, str(server), "--port", "0"], stdout=subprocess.PIPE, text=True
+    )
+    try:
+        url = re.search(r"http://\S+", process.stdout.readline()).group()
+        yield url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+
+
+def stream_completion(url, max_tokens, accumulator):
+    """Stream a compat completion of max_tokens tokens into accumulator; return peak bytes."""
+    tracemalloc.start()
+    try:
+        response = requests.post(
+            f"{url}{COMPAT_PATH}",
+            headers={"Authorization": f"Bearer {FAKE_API_KEY}", "Accept": "text/event-stream"},
+            json={
+                "model": "stress",
+                "messages": [{"role": "user", "content": "Go on and on."}],
+                "stream": True,
+                "max_tokens": max_tokens,
+            },
+            stream=True,
+        )
+        for event in iter_events(response.iter_content(chunk_size=None)):
+            if not event.is_done:
+                accumulator.append(frame_text(event.json()))
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def test_accumulator_counts_and_spills(tmp_path):
+    """Test that text, counts and preview survive spilling to disk."""
+    deltas = ["Hello", None, " wörld", "", "!"] * 100
+    with StreamAccumulator(max_memory=64, spill_dir=tmp_path) as accumulator:
+        for delta in deltas:
+            accumulator.append(delta)
+
+        assert accumulator.spilled
+        assert accumulator.text() == "Hello wörld!" * 100
+        assert accumulator.text() == "Hello wörld!" * 100, "Reading back should not consume"
+        assert (accumulator.chunks, accumulator.tokens) == (500, 300)
+        assert accumulator.bytes == len(("Hello wörld!" * 100).encode())
+        assert accumulator.preview(8) == "Hello wö..."
+
+
+def test_accumulator_in_memory():
+    """Test that without max_memory nothing is spilled."""
+    accumulator = StreamAccumulator()
+    for delta in ["a"] * 10_000:
+        accumulator.append(delta)
+    assert not accumulator.spilled
+    assert accumulator.text() == "a" * 10_000
+    assert StreamAccumulator().preview() == ""
+
+
+@pytest.mark.parametrize("max_memory", [None, 1], ids=["in_memory", "spilled"])
+def test_preview_elides_only_what_is_cut(max_memory, tmp_path):
+    """Test that the ellipsis follows characters cut off, not bytes received."""
+    with StreamAccumulator(max_memory=max_memory, spill_dir=tmp_path) as accumulator:
+        for delta in ["wö", "rld"]:
+            accumulator.append(delta)
+        assert accumulator.preview(5) == "wörld"
+        assert accumulator.preview(4) == "wörl..."
+
+
+def test_long_generation_memory_is_bounded(stand_in_url):
+    """Test that peak memory stays flat when a streamed generation gets 3x longer."""
+    stream_completion(stand_in_url, 100, StreamAccumulator())  # warm up imports and pools
+
+    short_peak = stream_completion(stand_in_url, 5_000, StreamAccumulator(max_memory=16_384))
+    with StreamAccumulator(max_memory=16_384) as long:
+        long_peak = stream_completion(stand_in_url, 15_000, long)
+        assert long.tokens == 15_000
+        assert long.text().startswith(REPLY_TEXT)
+    unbounded_peak = stream_completion(stand_in_url, 15_000, StreamAccumulator())
+
+    print(
+        f"peak memory: 5k tokens {short_peak / 1024:.0f} KiB, 15k tokens "
+        f"{long_peak / 1024:.0f} KiB, 15k tokens without spilling {unbounded_peak / 1024:.0f} KiB"
+    )
+    assert long_peak < short_peak * 1.25 + 32_768, "Peak memory grew with the output length"
+    assert unbounded_peak > long_peak + long.bytes, "Spilling should have saved memory"
@@ -0,0 +1,100 @@
+"""
+Tests that abandoning a stream mid-flight frees its connection and stops the generation.
+
+Every client path (raw requests, the OpenAI SDK, ChatOpenAI) reads a few frames of a long
+stream and closes it, then must have its pooled connection back and be able to send the
+next request. Against a slow stand-in the server side is checked too: it must stop
+writing within a few frames of the abort. See stream_cancellation.py for the benchmark.
+"""
+
+import pytest
+from conftest import get_request_scheduler, get_request_timeout, timed_transport, use_cassette
+from fake_llama_api import FakeLlamaAPI
+from stream_cancellation import (
+    RequestsClient,
+    format_report,
+    measure_cancellation,
+    run_trials,
+    summarize,
+)
+
+FRAMES = 3
+CLIENT_PATHS = [
+    ("requests", "native"),
+    ("requests", "compat"),
+    pytest.param("openai", "compat", marks=[pytest.mark.sdk, pytest.mark.openai]),
+    pytest.param("langchain", "compat", marks=[pytest.mark.sdk, pytest.mark.langchain]),
+]
+
+
+@pytest.fixture(scope="module")
+def slow_api():
+    """Fixture to provide a stand-in API streaming a frame every 5 ms."""
+    with FakeLlamaAPI(chunk_delay=0.005) as server:
+        yield server
+
+
+@pytest.mark.parametrize("name, endpoint", CLIENT_PATHS, ids=lambda value: value)
+def test_server_stops_when_stream_is_closed(slow_api, name, endpoint):
+    """Test that closing a stream stops the server and releases the pooled connection."""
+    results = run_trials(
+        name,
+        slow_api.base_url,
+        slow_api.api_key,
+        "m",
+        endpoint,
+        FRAMES,
+        trials=3,
+        server=slow_api,
+        release_timeout=1.0,
+    )
+    print(format_report(summarize(results)))
+
+    errors = []
+    for result in results:
+        if result.frames_read != FRAMES:
+            errors.append(f"Read {result.frames_read} frames instead of {FRAMES}")
+        if result.release is None:
+            errors.append("The connection was still in use a second after the abort")
+        if result.server_finished or result.server_stop is None:
+            errors.append("The server streamed to the end instead of stopping")
+        elif result.server_frames_after > 5:
+            errors.append(f"The server wrote {result.server_frames_after} frames after the abort")
+    if errors:
+        pytest.fail("\n".join(errors))
+
+
+@pytest.mark.parametrize("name, endpoint", CLIENT_PATHS, ids=lambda value: value)
+def test_abandoned_stream_releases_connection(api_base_url, api_key, model, name, endpoint):
+    """Test that a stream closed after a few frames frees its connection for the next request."""
+    if use_cassette():
+        pytest.skip("The cassette proxy replays whole streams")
+
+    results = run_trials(
+        name,
+        api_base_url,
+        api_key,
+        model,
+        endpoint,
+        FRAMES,
+        trials=2,
+        max_tokens=500,
+        scheduler=get_request_scheduler(),
+        timeout=get_request_timeout(),
+        wrap_transport=timed_transport,
+    )
+
+    for result in results:
+        assert result.release is not None, f"{name} kept the connection after closing the stream"
+        assert result.follow_up > 0
+
+
+def test_measure_without_server(slow_api):
+    """Test that the server-side fields stay empty when the server cannot be observed."""
+    client = RequestsClient(slow_api.base_url, slow_api.api_key, "m")
+    try:
+        result = measure_cancellation(client, "compat", FRAMES)
+    finally:
+        client.close()
+    assert result.server_stop is None and result.server_finished is None
+    assert not result.follow_up_reused, "An HTTP/1.1 stream closed mid-flight can't be reused"
@@ -0,0 +1,70 @@
+"""
+Runs the streaming quirk matrix of test_streaming.py concurrently.
+
+With `--concurrent-matrix N` the endpoint x stream x Accept cases of quirk_matrix.py are
+fired at once through an async httpx client, at most N in flight (fewer if the suite's
+rate-limit scheduler holds some back), and each result is then checked against its
+expected status, Content-Type and chunk schema. Identical requests are sent once.
+Wall-clock time for the matrix approaches the slowest single request instead of the sum
+of all of them. Without the option this test is skipped and the serial tests in
+test_streaming.py run instead.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from conftest import get_request_scheduler, get_request_timeout, timed_transport
+from quirk_matrix import STREAMING_CASES, check_response, read_response
+from rate_limit import AsyncScheduledTransport
+
+
+async def run_case(client, semaphore, url, headers, body):
+    """Issue one matrix request once a semaphore slot is free and read it to the end."""
+    async with semaphore:
+        started = time.perf_counter()
+        async with client.stream("POST", url, headers=headers, content=body) as response:
+            chunks = [chunk async for chunk in response.aiter_bytes()]
+        result = read_response(response.status_code, response.headers, chunks)
+        result.elapsed = time.perf_counter() - started
+        return result
+
+
+async def test_streaming_matrix_concurrently(
+    pytestconfig, api_base_url, auth_headers, model, basic_messages
+):
+    """Test every streaming matrix case with the requests in flight concurrently."""
+    concurrency = pytestconfig.getoption("--concurrent-matrix")
+    if not concurrency:
+        pytest.skip("Concurrent matrix not requested, use --concurrent-matrix N")
+
+    requests = [
+        case.request(api_base_url, auth_headers, model, basic_messages) for case in STREAMING_CASES
+    ]
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency)
+    transport = timed_transport(httpx.AsyncHTTPTransport(limits=limits))
+    async with httpx.AsyncClient(
+        transport=AsyncScheduledTransport(get_request_scheduler(), transport),
+        timeout=httpx.Timeout(get_request_timeout(), connect=10),
+    ) as client:
+        started = time.perf_counter()
+        responses = await asyncio.gather(
+            *(run_case(client, semaphore, *request) for request in requests)
+        )
+        wall_clock = time.perf_counter() - started
+
+    errors = []
+    for case, result in zip(STREAMING_CASES, responses, strict=True):
+        errors += [f"{case.name}: {error}" for error in check_response(case, result)]
+
+    print(
+        f"Streaming matrix: {len(STREAMING_CASES)} cases in {wall_clock:.2f}s wall clock "
+        f"(serial sum {sum(result.elapsed for result in responses):.2f}s, "
+        f"slowest {max(result.elapsed for result in responses):.2f}s, concurrency {concurrency})"
+    )
+
+    # Report all errors at once
+    if errors:
+        pytest.fail("\n".join(errors))